@@ -0,0 +1,160 @@
+"""
+Hot/cold archival of conversation messages
+
+Only open sessions are read on the /api/chat hot path, so messages of
+sessions that closed (or went idle) more than N days ago are moved out of
+`conversation_messages` into `conversation_archives`: one zlib-compressed
+JSON blob per session. `load_messages()` reads transparently from both tiers.
+
+Usage:
+    python archive.py                 # archive sessions older than ARCHIVE_AFTER_DAYS (30)
+    python archive.py --days 7 --batch-size 200
+"""
+
+import argparse
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import List
+
+import orjson
+from sqlalchemy import and_, func, or_
+
+from models import ChatSession, ConversationArchive, ConversationMessage
+from partitions import message_time_filter
+from message_writer import pending_messages, merge_pending
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = 500
+
+
+def pack_messages(messages: List[dict]) -> bytes:
+    """Compress a list of {role, content, timestamp} dicts"""
+    data = [
+        {
+            "role": m["role"],
+            "content": m["content"],
+            "timestamp": m["timestamp"].isoformat() if m["timestamp"] else None,
+        }
+        for m in messages
+    ]
+    return zlib.compress(orjson.dumps(data))
+
+
+def unpack_messages(payload: bytes) -> List[dict]:
+    """Inverse of pack_messages (timestamps come back as datetimes)"""
+    data = orjson.loads(zlib.decompress(payload))
+    for m in data:
+        m["timestamp"] = datetime.fromisoformat(m["timestamp"]) if m["timestamp"] else None
+    return data
+
+
+def load_messages(db, session: ChatSession) -> List[dict]:
+    """All messages of a session in order: archived, then hot, then still-buffered ones"""
+    pending = pending_messages(session.id)
+    messages = []
+
+    archive = db.query(ConversationArchive.payload).filter(
+        ConversationArchive.session_id == session.id
+    ).first()
+    if archive:
+        messages.extend(unpack_messages(archive.payload))
+
+    hot = db.query(
+        ConversationMessage.role, ConversationMessage.content, ConversationMessage.timestamp
+    ).filter(
+        ConversationMessage.session_id == session.id,
+        *message_time_filter(session)
+    ).order_by(ConversationMessage.timestamp, ConversationMessage.id).all()
+    messages.extend({"role": m.role, "content": m.content, "timestamp": m.timestamp} for m in hot)
+
+    return merge_pending(messages, pending)
+
+
+def archivable_session_ids(db, cutoff: datetime, limit: int) -> List[int]:
+    """Sessions with hot messages that closed, or saw no activity, before `cutoff`"""
+    last_message = func.max(ConversationMessage.timestamp)
+    rows = db.query(ConversationMessage.session_id).join(
+        ChatSession, ChatSession.id == ConversationMessage.session_id
+    ).group_by(
+        ConversationMessage.session_id, ChatSession.deal_closed, ChatSession.ended_at
+    ).having(
+        or_(
+            and_(ChatSession.deal_closed == True, ChatSession.ended_at < cutoff),
+            last_message < cutoff
+        )
+    ).limit(limit).all()
+    return [row.session_id for row in rows]
+
+
+def archive_session(db, session_pk: int) -> int:
+    """Move one session's hot messages into its archive blob. Returns messages moved."""
+    hot = db.query(ConversationMessage).filter(
+        ConversationMessage.session_id == session_pk
+    ).order_by(ConversationMessage.timestamp, ConversationMessage.id).all()
+    if not hot:
+        return 0
+
+    archive = db.query(ConversationArchive).filter(
+        ConversationArchive.session_id == session_pk
+    ).with_for_update().first()
+
+    # A session can come back to life after archival - append to its blob
+    messages = unpack_messages(archive.payload) if archive else []
+    messages.extend({"role": m.role, "content": m.content, "timestamp": m.timestamp} for m in hot)
+
+    if archive:
+        archive.payload = pack_messages(messages)
+        archive.message_count = len(messages)
+        archive.archived_at = datetime.utcnow()
+    else:
+        db.add(ConversationArchive(
+            session_id=session_pk,
+            message_count=len(messages),
+            payload=pack_messages(messages)
+        ))
+
+    db.query(ConversationMessage).filter(
+        ConversationMessage.id.in_([m.id for m in hot])
+    ).delete(synchronize_session=False)
+    db.commit()
+    return len(hot)
+
+
+def archive_old_sessions(db, days: int = ARCHIVE_AFTER_DAYS,
+                         batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """Archive every eligible session, one small transaction per session"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    sessions = 0
+    messages = 0
+    while True:
+        session_ids = archivable_session_ids(db, cutoff, batch_size)
+        if not session_ids:
+            break
+        for session_pk in session_ids:
+            messages += archive_session(db, session_pk)
+            sessions += 1
+    return {"sessions": sessions, "messages": messages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive messages of closed/idle sessions")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="Archive sessions closed or idle for more than this many days")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        result = archive_old_sessions(db, days=args.days, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"✅ Archived {result['messages']} messages from {result['sessions']} sessions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Benchmark: product catalog size vs. chat turn latency
+
+For each catalog size (--products, default 1 1000 5000) the scratch database
+is filled with that many products, then:
+1. In-process catalog costs: cold load, warm lookup (what every turn pays), the
+   once-per-TTL version check, and the reload after one product changes.
+2. End to end: /api/chat turns under gunicorn against mock_llm.py with zero
+   LLM latency, each buyer on a random product, so what's left is our own
+   per-turn overhead. p50/p95 should not move with the catalog size.
+
+Usage:
+    python bench_catalog.py
+    python bench_catalog.py --products 1 10000 --buyers 32 --turns 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("TRACE_EXPORTER", "none")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+if "--use-env-db" not in sys.argv:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import httpx
+
+from bench_workers import wait_until_ready
+from catalog import Catalog
+from database import SessionLocal, engine, init_db
+from models import Product
+
+OFFERS = ["what's your best price?", "I can pay {low}", "okay {mid}", "deal"]
+
+
+def seed_products(total: int):
+    """Add bench products until the table holds `total` of them"""
+    db = SessionLocal()
+    try:
+        existing = db.query(Product).count()
+        rows = []
+        for i in range(existing, total):
+            starting = random.randint(100, 2000)
+            floor = round(starting * 0.7)
+            rows.append({
+                "slug": f"bench-{i:06d}", "name": f"Bench Product {i}", "starting_price": starting,
+                "floor_price": floor, "session_minimum_low": floor, "session_minimum_high": round(starting * 0.85),
+                "features": json.dumps(["Brand new", "Warranty"]), "active": True, "updated_at": datetime.utcnow(),
+            })
+        if rows:
+            db.execute(Product.__table__.insert(), rows)
+            db.commit()
+        return [slug for (slug,) in db.query(Product.slug).all()]
+    finally:
+        db.close()
+
+
+def time_catalog(repeat: int) -> dict:
+    catalog = Catalog()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        catalog.all(db)
+        cold = time.perf_counter() - started
+        ids = [entry.id for entry in catalog.all(db)]
+
+        lookups = 100_000
+        started = time.perf_counter()
+        for _ in range(lookups):
+            catalog.get(db, random.choice(ids))
+        warm = (time.perf_counter() - started) / lookups
+
+        checks = []
+        for _ in range(repeat):
+            catalog._checked_at = 0.0  # TTL expired, nothing changed
+            started = time.perf_counter()
+            catalog.get(db, ids[0])
+            checks.append(time.perf_counter() - started)
+
+        db.query(Product).filter(Product.id == ids[-1]).update({"updated_at": datetime.utcnow()})
+        db.commit()
+        catalog._checked_at = 0.0
+        started = time.perf_counter()
+        catalog.get(db, ids[0])
+        reload = time.perf_counter() - started
+        return {"cold_load": cold, "warm_lookup": warm, "version_check": min(checks), "reload_one_changed": reload}
+    finally:
+        db.close()
+
+
+def start_processes(args, env):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    mock = subprocess.Popen(
+        [sys.executable, "mock_llm.py", "--port", str(args.mock_port),
+         "--intent-latency", "0", "--reply-latency", "0", "--jitter", "0"],
+        cwd=cwd, env=env
+    )
+    env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+         "--workers", str(args.workers), "--bind", f"127.0.0.1:{args.port}", "--log-level", "warning"],
+        cwd=cwd, env=env
+    )
+    return [server, mock]
+
+
+async def drive(base_url, slugs, buyers: int, turns: int) -> list:
+    """Every buyer negotiates `turns` messages over a random product; returns turn latencies"""
+    latencies = []
+
+    async def buyer(client):
+        session_id = f"bench-{uuid.uuid4().hex}"
+        r = await client.post("/api/chat", json={
+            "session_id": session_id, "user_message": "INIT_GREETING", "product": random.choice(slugs)
+        })
+        r.raise_for_status()
+        for template in OFFERS[:turns]:
+            started = time.perf_counter()
+            r = await client.post("/api/chat", json={
+                "session_id": session_id, "user_message": template.format(low=100, mid=500)
+            })
+            latencies.append(time.perf_counter() - started)
+            r.raise_for_status()
+            if r.json()["deal_closed"]:
+                break
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        for _ in range(2):
+            await asyncio.gather(*(buyer(client) for _ in range(buyers)))
+    return latencies
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog size vs. chat turn latency")
+    parser.add_argument("--products", type=int, nargs="+", default=[1, 1000, 5000])
+    parser.add_argument("--buyers", type=int, default=16, help="Concurrent buyers per round")
+    parser.add_argument("--turns", type=int, default=len(OFFERS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--mock-port", type=int, default=8199)
+    parser.add_argument("--skip-e2e", action="store_true", help="Only time the in-process catalog")
+    parser.add_argument("--use-env-db", action="store_true")
+    args = parser.parse_args()
+
+    init_db()
+    print(f"[*] Catalog sizes {args.products}, {args.buyers} buyers x {args.turns} turns, LLM latency 0\n")
+    print(f"  {'products':>8}{'cold load':>12}{'lookup':>10}{'ttl check':>11}{'reload':>10}"
+          f"{'turn p50':>11}{'turn p95':>11}")
+    for total in sorted(args.products):
+        slugs = seed_products(total)
+        catalog_times = time_catalog(args.repeat)
+        line = (f"  {len(slugs):>8}{catalog_times['cold_load'] * 1e3:10.1f}ms"
+                f"{catalog_times['warm_lookup'] * 1e6:8.2f}us{catalog_times['version_check'] * 1e3:9.2f}ms"
+                f"{catalog_times['reload_one_changed'] * 1e3:8.1f}ms")
+        if not args.skip_e2e:
+            env = dict(os.environ)
+            env.pop("SKIP_INIT_DB", None)
+            processes = start_processes(args, env)
+            try:
+                asyncio.run(wait_until_ready(f"http://127.0.0.1:{args.port}"))
+                latencies = asyncio.run(drive(f"http://127.0.0.1:{args.port}", slugs, args.buyers, args.turns))
+            finally:
+                for process in processes:
+                    process.send_signal(signal.SIGTERM)
+                for process in processes:
+                    process.wait(timeout=60)
+            line += f"{percentile(latencies, 0.5) * 1e3:9.1f}ms{percentile(latencies, 0.95) * 1e3:9.1f}ms"
+        print(line)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
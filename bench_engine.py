@@ -0,0 +1,255 @@
+"""
+Benchmark: the negotiation engine's deterministic core
+
+Times the pure-Python work NegotiationEngine does on every turn, over a fixed
+corpus of realistic buyer messages:
+- extract_price_from_message, extract_quantity
+- the keyword scans (is_asking_for_offer, has_acceptance_keyword)
+- the counter-offer ladder (plan_counter_offer) at each conversation stage
+- floor enforcement (finalize)
+- a templated reply (reply_templates.render), what scripted turns cost instead
+  of the generation LLM call
+- negotiate() end to end with the OpenAI client stubbed out (instant canned
+  responses), i.e. everything but the network
+
+Each timing is the best of --repeat runs over the whole corpus, reported per
+call. Results are compared with bench_engine_baseline.json; --save-baseline
+overwrites it. Baselines are machine specific: re-save after changing hardware
+or Python version rather than comparing across machines.
+
+Usage:
+    python bench_engine.py
+    python bench_engine.py --save-baseline
+    python bench_engine.py --threshold 0.15 --repeat 9
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("TRACE_EXPORTER", "none")
+# Time the full reply path on every turn, as when the baseline was recorded
+os.environ.setdefault("REPLY_TEMPLATES", "off")
+os.environ.setdefault("REPLY_CACHE_VARIANTS", "0")
+os.environ.setdefault("SPECULATIVE_REPLY", "0")
+
+from negotiation_engine import NegotiationEngine
+from reply_templates import render
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_engine_baseline.json")
+
+PRODUCT_CONFIG = {"name": "Premium Apple Watch", "starting_price": 450, "minimum_price": 380}
+
+# Messages as buyers actually type them: offers, acceptances, questions, bulk
+# orders, Pidgin, typos and messages with no number at all
+CORPUS = [
+    "300 GHS",
+    "I can pay 250",
+    "what about 350",
+    "can you do 320 cedis?",
+    "GHS 380 final",
+    "okay 400",
+    "395 is okay for me",
+    "fine, 380",
+    "alright 420, deal",
+    "deal",
+    "yes",
+    "I'll take it",
+    "let's do it!!",
+    "What's your best price?",
+    "whats your price for this watch",
+    "make me an offer I can't refuse",
+    "give me a price for 2 pieces",
+    "I want to buy 3 watches at 370 each",
+    "5 units of this, how much?",
+    "Chale the price too cost, 280 no?",
+    "Boss abeg reduce am small, 340",
+    "my sister make e 360 i go pay now now",
+    "hmm",
+    "is it original?",
+    "Does it come with warranty and charger?",
+    "too expensive my guy",
+    "I saw the same watch for 300 at Kantamanto",
+    "last last 375",
+    "How about we meet in the middle? You say 450, I say 350, so 400",
+    "50",
+    "99 cedis and I take it now",
+    "ok",
+    "agreed at 410",
+    "Hello, I'm interested in the Apple Watch you're selling. It looks great but the price "
+    "is a bit high for me. I was hoping we could work something out around 330 GHS since "
+    "I'm a student and I'll pay cash today. Let me know what you think!",
+    "sold!",
+    "Can you accept mobile money? 390",
+]
+
+# (offered_price, asking_for_offer, message_count, current_price) covering every ladder branch
+LADDER_CASES = [
+    (None, True, 0, 450.0), (None, True, 2, 420.0), (None, True, 4, 400.0), (None, True, 6, 380.0),
+    (320.0, False, 1, 450.0), (80.0, False, 1, 450.0), (250.0, False, 1, 450.0), (352.0, False, 0, 450.0),
+    (360.0, False, 0, 450.0), (400.0, False, 0, 450.0), (440.0, False, 0, 450.0), (380.0, False, 1, 420.0),
+    (400.0, False, 2, 410.0), (355.0, False, 2, 360.0), (370.0, False, 3, 400.0), (390.0, False, 3, 400.0),
+    (380.0, False, 4, 400.0), (380.0, False, 7, 390.0), (None, False, 3, 400.0),
+]
+
+# (ai_message, offered_price, user_accepted, counter_offer, current_price) for finalize()
+FINALIZE_CASES = [
+    ("Deal! 👑", 400.0, True, 400.0, 400.0),
+    ("Alright my friend", 420.0, True, 420.0, 420.0),
+    ("Hmm", 340.0, True, 365.0, 450.0),
+    ("I can do 410", 380.0, False, 410.0, 450.0),
+    ("Take it for 400", 405.0, False, 400.0, 450.0),
+    ("Still 450", 250.0, False, 450.0, 450.0),
+    ("How about 365", None, False, 365.0, 400.0),
+]
+
+
+class _StubCompletions:
+    """Answers like the OpenAI client, instantly: JSON intent or a one-line reply"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def create(self, model, messages, response_format=None, **kwargs):
+        if response_format:
+            text = messages[-1]["content"]
+            price = self.engine.extract_price_from_message(text)
+            content = json.dumps({"offered_price": price, "accepted_deal": "ok" in text.lower(), "quantity": 1})
+        else:
+            content = "Chale, this watch is original 🔥"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def stub_engine() -> NegotiationEngine:
+    engine = NegotiationEngine(PRODUCT_CONFIG)
+    engine._client = SimpleNamespace(chat=SimpleNamespace(completions=_StubCompletions(engine)))
+    return engine
+
+
+def history_for(turns: int):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"what about {350 + i * 10}"})
+        history.append({"role": "assistant", "content": "I can do a little better"})
+    return history
+
+
+def best_time(function, calls_per_run: int, repeat: int) -> float:
+    """Best seconds per call over `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, (time.perf_counter() - started) / calls_per_run)
+    return best
+
+
+def run_benchmarks(repeat: int, rounds: int) -> dict:
+    engine = stub_engine()
+    results = {}
+
+    def over_corpus(method):
+        def run():
+            for _ in range(rounds):
+                for message in CORPUS:
+                    method(message)
+        return run
+
+    for name in ("extract_price_from_message", "extract_quantity", "is_asking_for_offer", "has_acceptance_keyword"):
+        results[name] = best_time(over_corpus(getattr(engine, name)), rounds * len(CORPUS), repeat)
+
+    def ladder():
+        for _ in range(rounds):
+            for case in LADDER_CASES:
+                engine.plan_counter_offer(*case)
+    results["plan_counter_offer"] = best_time(ladder, rounds * len(LADDER_CASES), repeat)
+
+    def finalize():
+        for _ in range(rounds):
+            for case in FINALIZE_CASES:
+                engine.finalize(*case)
+    results["finalize"] = best_time(finalize, rounds * len(FINALIZE_CASES), repeat)
+
+    def templates():
+        for _ in range(rounds):
+            render("below_floor", offer=250.0, counter=410.0)
+    results["reply_templates.render"] = best_time(templates, rounds, repeat)
+
+    # Conversations at several stages, so every ladder rung is reached
+    histories = [history_for(turns) for turns in (0, 1, 3, 6)]
+    negotiate_rounds = max(1, rounds // 10)
+
+    async def negotiate_all():
+        for _ in range(negotiate_rounds):
+            for history in histories:
+                for message in CORPUS:
+                    await engine.negotiate(message, history, 450.0, 380.0)
+
+    loop = asyncio.new_event_loop()
+    try:
+        results["negotiate (LLM stubbed)"] = best_time(
+            lambda: loop.run_until_complete(negotiate_all()),
+            negotiate_rounds * len(histories) * len(CORPUS), repeat
+        )
+    finally:
+        loop.close()
+    return results
+
+
+def machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NegotiationEngine deterministic core benchmark")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--rounds", type=int, default=200, help="Passes over the corpus per run")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="Slowdown vs baseline reported as a regression (0.20 = 20%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    print(f"[*] {len(CORPUS)} messages, {len(LADDER_CASES)} ladder cases, best of {args.repeat}\n")
+    results = run_benchmarks(args.repeat, args.rounds)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["machine"] != machine():
+            print(f"[INFO] Baseline was recorded on {baseline['machine']['platform']} "
+                  f"(Python {baseline['machine']['python']}) - comparison is indicative only\n")
+
+    regressions = []
+    print(f"  {'function':<28}{'per call':>12}{'baseline':>12}{'change':>10}")
+    for name, seconds in results.items():
+        line = f"  {name:<28}{seconds * 1e6:10.2f}us"
+        old = baseline["results"].get(name) if baseline else None
+        if old:
+            change = seconds / old - 1
+            flag = "  <-- regression" if change > args.threshold else ""
+            if flag:
+                regressions.append(name)
+            line += f"{old * 1e6:10.2f}us{change:+9.0%}{flag}"
+        print(line)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=2)
+        print(f"\n[INFO] Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    elif baseline:
+        print(f"\n✅ No regressions over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
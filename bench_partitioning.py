@@ -0,0 +1,168 @@
+"""
+Benchmark: plain vs monthly-partitioned conversation_messages on PostgreSQL
+
+Builds two scratch tables with the same synthetic data (messages spread over
+N months), then compares single-row insert latency, per-session history
+lookup latency (the query chat() and get_session run) and the cost of
+removing the oldest month (DELETE vs DETACH + DROP).
+
+Usage:
+    DATABASE_URL=postgresql://... python bench_partitioning.py --rows 2000000 --months 24
+
+The scratch tables (bench_messages_*) are dropped at the end.
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import create_engine, text
+
+from database import DATABASE_URL
+from partitions import add_months, month_start
+
+PLAIN = "bench_messages_plain"
+PARTED = "bench_messages_parted"
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def report(label, timings):
+    ms = [t * 1000 for t in timings]
+    print(f"  {label:<28} p50={percentile(ms, 50):7.3f}ms  p95={percentile(ms, 95):7.3f}ms  "
+          f"mean={statistics.mean(ms):7.3f}ms")
+
+
+def setup(conn, rows, months, sessions):
+    first = add_months(month_start(datetime.utcnow()), -(months - 1))
+    conn.execute(text(f"DROP TABLE IF EXISTS {PLAIN}, {PARTED} CASCADE"))
+
+    columns = """
+        id BIGINT NOT NULL,
+        session_id INTEGER NOT NULL,
+        role VARCHAR NOT NULL,
+        content TEXT NOT NULL,
+        timestamp TIMESTAMP NOT NULL
+    """
+    conn.execute(text(f"CREATE TABLE {PLAIN} ({columns}, PRIMARY KEY (id))"))
+    conn.execute(text(f"CREATE TABLE {PARTED} ({columns}, PRIMARY KEY (id, timestamp)) PARTITION BY RANGE (timestamp)"))
+    for i in range(months + 1):
+        start = add_months(first, i)
+        conn.execute(text(
+            f"CREATE TABLE {PARTED}_{start:%Y%m} PARTITION OF {PARTED} "
+            f"FOR VALUES FROM ('{start}') TO ('{add_months(start, 1)}')"
+        ))
+
+    # Each session lives inside one month, like real negotiations
+    span_seconds = (add_months(first, months) - first).days * 86400
+    generate = f"""
+        SELECT g AS id,
+               (g % {sessions}) + 1 AS session_id,
+               CASE WHEN g % 2 = 0 THEN 'user' ELSE 'assistant' END AS role,
+               'synthetic negotiation message ' || g AS content,
+               TIMESTAMP '{first}' + ((((g % {sessions}) + 1)::float / {sessions}) * {span_seconds} + (g / {sessions})) * INTERVAL '1 second' AS timestamp
+        FROM generate_series(1, {rows}) AS g
+    """
+    for table in (PLAIN, PARTED):
+        started = time.perf_counter()
+        conn.execute(text(f"INSERT INTO {table} {generate}"))
+        conn.execute(text(f"CREATE INDEX ON {table} (session_id, timestamp)"))
+        conn.execute(text(f"ANALYZE {table}"))
+        print(f"  loaded {table} in {time.perf_counter() - started:.1f}s")
+    return first
+
+
+def session_start(conn, table, session_id):
+    return conn.execute(text(f"SELECT MIN(timestamp) FROM {table} WHERE session_id = :s"),
+                        {"s": session_id}).scalar()
+
+
+def bench_lookups(conn, table, sessions, samples, pruned):
+    starts = {}
+    picks = [random.randint(1, sessions) for _ in range(samples)]
+    for s in set(picks):
+        starts[s] = session_start(conn, table, s)
+
+    timings = []
+    for s in picks:
+        sql = f"SELECT role, content, timestamp FROM {table} WHERE session_id = :s"
+        params = {"s": s}
+        if pruned:
+            # Same bound chat()/get_session add: timestamp >= session.created_at
+            sql += " AND timestamp >= :created"
+            params["created"] = starts[s]
+        started = time.perf_counter()
+        conn.execute(text(sql + " ORDER BY timestamp"), params).all()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def bench_inserts(conn, table, count, start_id):
+    timings = []
+    now = datetime.utcnow()
+    for i in range(count):
+        started = time.perf_counter()
+        conn.execute(text(
+            f"INSERT INTO {table} (id, session_id, role, content, timestamp) "
+            f"VALUES (:id, :s, 'user', 'hello', :ts)"
+        ), {"id": start_id + i, "s": random.randint(1, 1000), "ts": now})
+        conn.commit()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partitioned vs plain conversation_messages benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch tables")
+    args = parser.parse_args()
+
+    if not DATABASE_URL.startswith("postgresql"):
+        print("[ERROR] This benchmark needs DATABASE_URL pointing at PostgreSQL")
+        return
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        print(f"[*] Loading {args.rows:,} messages over {args.months} months...")
+        first = setup(conn, args.rows, args.months, args.sessions)
+        conn.commit()
+
+        print("\n[*] History lookups (session_id + ORDER BY timestamp)")
+        report("plain", bench_lookups(conn, PLAIN, args.sessions, args.samples, pruned=False))
+        report("partitioned, no bound", bench_lookups(conn, PARTED, args.sessions, args.samples, pruned=False))
+        report("partitioned, pruned", bench_lookups(conn, PARTED, args.sessions, args.samples, pruned=True))
+
+        print("\n[*] Single-row inserts with commit")
+        report("plain", bench_inserts(conn, PLAIN, args.samples, args.rows + 1))
+        report("partitioned", bench_inserts(conn, PARTED, args.samples, args.rows + 1))
+
+        print("\n[*] Removing the oldest month")
+        end = add_months(first, 1)
+        started = time.perf_counter()
+        deleted = conn.execute(text(f"DELETE FROM {PLAIN} WHERE timestamp < :end"), {"end": end}).rowcount
+        conn.commit()
+        print(f"  plain DELETE ({deleted:,} rows)     {time.perf_counter() - started:8.3f}s")
+        started = time.perf_counter()
+        conn.execute(text(f"ALTER TABLE {PARTED} DETACH PARTITION {PARTED}_{first:%Y%m}"))
+        conn.execute(text(f"DROP TABLE {PARTED}_{first:%Y%m}"))
+        conn.commit()
+        print(f"  partitioned DETACH + DROP      {time.perf_counter() - started:8.3f}s")
+
+        if not args.keep:
+            conn.execute(text(f"DROP TABLE IF EXISTS {PLAIN}, {PARTED} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
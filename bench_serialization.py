@@ -0,0 +1,126 @@
+"""
+Benchmark: JSON encoding and compression of the largest admin payloads
+
+Builds synthetic /api/sessions/all and /api/waitlist/all payloads of the same
+shape the endpoints return, then compares:
+  - FastAPI default path: jsonable_encoder + stdlib json (JSONResponse)
+  - ORJSONResponse as default response class (jsonable_encoder + orjson)
+  - ORJSONResponse returned directly (orjson only, as the endpoints now do)
+and the bytes on the wire raw, gzipped and brotli-compressed.
+
+Usage:
+    python bench_serialization.py --sessions 20000 --waitlist 50000
+"""
+
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def sessions_payload(count):
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        created = now - timedelta(minutes=random.randint(0, 60 * 24 * 90))
+        closed = random.random() < 0.3
+        rows.append({
+            "session_id": f"session_{i}_{random.getrandbits(48):012x}",
+            "username": random.choice([None, f"player{i}"]),
+            "product_name": "Premium Apple Watch",
+            "starting_price": 450.0,
+            "current_price": round(random.uniform(380, 450), 2),
+            "minimum_price": 380.0,
+            "deal_closed": closed,
+            "final_price": round(random.uniform(380, 420), 2) if closed else None,
+            "created_at": created.isoformat(),
+            "ended_at": (created + timedelta(minutes=7)).isoformat() if closed else None,
+            "message_count": random.randint(2, 40),
+        })
+    return rows
+
+
+def waitlist_payload(count):
+    now = datetime.utcnow()
+    return [
+        {
+            "id": i,
+            "contact_type": "email",
+            "contact_value": f"user{i}@example.com",
+            "source": random.choice(["landing", "deal_closed", "import"]),
+            "referral_code": f"{random.getrandbits(40):010x}",
+            "referral_count": random.randint(0, 5),
+            "created_at": (now - timedelta(seconds=i * 37)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def stdlib_default(payload):
+    # What JSONResponse does: jsonable_encoder, then json.dumps with its render() options
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def orjson_default(payload):
+    # ORJSONResponse as default_response_class still runs jsonable_encoder first
+    return orjson.dumps(jsonable_encoder(payload))
+
+
+def orjson_direct(payload):
+    return orjson.dumps(payload)
+
+
+def time_it(fn, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(payload)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def report(name, payload, repeat):
+    print(f"\n[*] {name} ({len(payload):,} rows)")
+    baseline = time_it(stdlib_default, payload, repeat)
+    for label, fn in (("jsonable_encoder + json", stdlib_default),
+                      ("jsonable_encoder + orjson", orjson_default),
+                      ("orjson direct", orjson_direct)):
+        ms = baseline if fn is stdlib_default else time_it(fn, payload, repeat)
+        print(f"  {label:<26} {ms:9.1f}ms  ({baseline / ms:4.1f}x)")
+
+    body = orjson_direct(payload)
+    print(f"  {'raw':<26} {len(body):>11,} bytes")
+    gz = gzip.compress(body, compresslevel=9)
+    print(f"  {'gzip':<26} {len(gz):>11,} bytes  ({len(gz) / len(body) * 100:.1f}%)")
+    if brotli is not None:
+        # brotli-asgi's default quality
+        br = brotli.compress(body, quality=4)
+        print(f"  {'brotli':<26} {len(br):>11,} bytes  ({len(br) / len(body) * 100:.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization/compression benchmark")
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--waitlist", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    report("/api/sessions/all", sessions_payload(args.sessions), args.repeat)
+    report("/api/waitlist/all", waitlist_payload(args.waitlist), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: cold start, from process start to first successful request
+
+Launches the server (uvicorn main:app by default) repeatedly and measures how
+long it takes until a given endpoint first answers 200. Runs against a scratch
+SQLite database: the first boot creates the schema, the rest find it current.
+Also reports the in-process import time of main.py.
+
+Usage:
+    python bench_startup.py --runs 5
+    python bench_startup.py --path /admin --command "gunicorn main:app -c gunicorn.conf.py"
+
+To compare against an older revision, check it out in a separate worktree and
+run this script there with the same options.
+"""
+
+import argparse
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def boot_time(command, port, path, env, timeout=60):
+    started = time.perf_counter()
+    server = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get(path).status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"no 200 from {path} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def import_time(env):
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process start to first request benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--path", default="/api/sessions/stats")
+    parser.add_argument("--command", default=None,
+                        help="Server command (default: uvicorn main:app on --port)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    env["PORT"] = str(args.port)
+    env.pop("SKIP_INIT_DB", None)
+
+    if args.command:
+        command = shlex.split(args.command)
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                   "--port", str(args.port), "--log-level", "warning"]
+
+    print(f"[*] {' '.join(command)}  ->  GET {args.path}\n")
+    first = boot_time(command, args.port, args.path, env)
+    print(f"  first boot (creates schema)  {first * 1000:8.0f}ms")
+
+    timings = [boot_time(command, args.port, args.path, env) for _ in range(args.runs)]
+    ms = [t * 1000 for t in timings]
+    print(f"  warm boots ({args.runs})             {statistics.median(ms):8.0f}ms median  "
+          f"(min {min(ms):.0f}, max {max(ms):.0f})")
+
+    imports = [import_time(env) * 1000 for _ in range(args.runs)]
+    print(f"  import main                  {statistics.median(imports):8.0f}ms median")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark: throughput scaling by worker count
+
+Starts the API under gunicorn (gunicorn.conf.py) with 1, 2, 4... workers and
+drives it with concurrent clients for a fixed duration. The mix avoids the
+LLM: session creation through /api/chat INIT_GREETING, session reads and
+/api/sessions/all. Every run ends with a burst of concurrent greetings for
+one session_id, to check that exactly one row gets created across workers.
+
+Usage:
+    python bench_workers.py --workers 1 2 4 --duration 15 --concurrency 64
+    DATABASE_URL=postgresql://... python bench_workers.py --use-env-db
+
+The default scratch database is SQLite, where writes serialize; use
+PostgreSQL to see how the write-heavy part scales.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+
+def start_server(workers, port, env):
+    cmd = [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+           "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    return subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+async def wait_until_ready(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+async def drive(base_url, duration, concurrency):
+    stats = {"requests": 0, "errors": 0}
+    sessions = []
+    deadline = time.monotonic() + duration
+
+    async def client_loop(client):
+        while time.monotonic() < deadline:
+            roll = random.random()
+            try:
+                if roll < 0.4 or not sessions:
+                    session_id = f"bench-{uuid.uuid4().hex}"
+                    r = await client.post("/api/chat", json={"session_id": session_id, "user_message": "INIT_GREETING"})
+                    sessions.append(session_id)
+                elif roll < 0.95:
+                    r = await client.get(f"/api/sessions/{random.choice(sessions)}")
+                else:
+                    r = await client.get("/api/sessions/all")
+                stats["requests"] += 1
+                if r.status_code >= 400:
+                    stats["errors"] += 1
+            except httpx.HTTPError:
+                stats["errors"] += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        stats["elapsed"] = time.perf_counter() - started
+
+        # Same session_id on every worker at once - must end up as one row
+        race_id = f"race-{uuid.uuid4().hex}"
+        responses = await asyncio.gather(*(
+            client.post("/api/chat", json={"session_id": race_id, "user_message": "INIT_GREETING"})
+            for _ in range(concurrency)
+        ))
+        stats["race_errors"] = sum(1 for r in responses if r.status_code != 200)
+        stats["race_session_ok"] = (await client.get(f"/api/sessions/{race_id}")).status_code == 200
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker throughput benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--use-env-db", action="store_true")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench")
+    if not args.use_env_db:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    env.pop("SKIP_INIT_DB", None)
+    # Every simulated client shares one IP
+    env.setdefault("RATE_LIMIT_BACKEND", "off")
+
+    print(f"[*] {os.cpu_count()} CPUs, {args.concurrency} clients, {args.duration:.0f}s per run\n")
+    baseline = None
+    for workers in args.workers:
+        server = start_server(workers, args.port, env)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            asyncio.run(wait_until_ready(base_url))
+            stats = asyncio.run(drive(base_url, args.duration, args.concurrency))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+        rps = stats["requests"] / stats["elapsed"]
+        baseline = baseline or rps
+        race = "ok" if stats["race_session_ok"] and not stats["race_errors"] else f"{stats['race_errors']} errors"
+        print(f"  {workers:>2} workers  {rps:8.0f} req/s  ({rps / baseline:4.2f}x)   "
+              f"{stats['errors']} errors   same-session race: {race}")
+
+
+if __name__ == "__main__":
+    main()
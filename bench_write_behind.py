@@ -0,0 +1,133 @@
+"""
+Benchmark: synchronous vs write-behind message inserts
+
+Simulates chat turns from many concurrent sessions against a scratch SQLite
+database (or DATABASE_URL with --use-env-db). Each turn mirrors the DB work in
+chat(): store the user message, store the assistant message, update the
+session's price. The LLM is skipped so the DB commit rate is the bottleneck.
+
+Usage:
+    python bench_write_behind.py --sessions 200 --turns 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write-behind message batching benchmark")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=10, help="Turns per session")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--use-env-db", action="store_true")
+    args = parser.parse_args()
+
+    if not args.use_env_db:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    from sqlalchemy import event
+    from database import SessionLocal, engine, init_db
+    from message_writer import MessageWriter
+    from models import ChatSession, ConversationMessage
+
+    init_db()
+
+    commits = {"count": 0}
+    event.listen(engine, "commit", lambda conn: commits.__setitem__("count", commits["count"] + 1))
+
+    def create_sessions(tag):
+        db = SessionLocal()
+        try:
+            sessions = [
+                ChatSession(session_id=f"{tag}-{i}-{random.random()}", product_name="Bench",
+                            starting_price=450, current_price=450, minimum_price=360)
+                for i in range(args.sessions)
+            ]
+            db.add_all(sessions)
+            db.commit()
+            return [s.id for s in sessions]
+        finally:
+            db.close()
+
+    def sync_turn(session_pk, turn):
+        db = SessionLocal()
+        try:
+            db.add(ConversationMessage(session_id=session_pk, role="user", content=f"offer {turn}"))
+            db.commit()
+            db.add(ConversationMessage(session_id=session_pk, role="assistant", content=f"counter {turn}"))
+            session = db.get(ChatSession, session_pk)
+            session.current_price = max(350, session.current_price - 5)
+            db.commit()
+        finally:
+            db.close()
+
+    def write_behind_turn(writer, session_pk, turn):
+        writer.enqueue(session_pk, "user", f"offer {turn}")
+        db = SessionLocal()
+        try:
+            writer.enqueue(session_pk, "assistant", f"counter {turn}")
+            session = db.get(ChatSession, session_pk)
+            session.current_price = max(350, session.current_price - 5)
+            db.commit()
+        finally:
+            db.close()
+
+    async def run(mode):
+        session_ids = create_sessions(mode)
+        writer = None
+        if mode == "write-behind":
+            writer = MessageWriter(SessionLocal, batch_size=args.batch_size, interval=args.interval)
+            await writer.start()
+
+        async def player(session_pk):
+            for turn in range(args.turns):
+                if writer:
+                    await asyncio.to_thread(write_behind_turn, writer, session_pk, turn)
+                else:
+                    await asyncio.to_thread(sync_turn, session_pk, turn)
+
+        commits["count"] = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(player(pk) for pk in session_ids))
+        if writer:
+            await writer.stop()
+        elapsed = time.perf_counter() - started
+
+        db = SessionLocal()
+        try:
+            stored = db.query(ConversationMessage).filter(
+                ConversationMessage.session_id.in_(session_ids)
+            ).count()
+        finally:
+            db.close()
+
+        turns = args.sessions * args.turns
+        return {
+            "mode": mode,
+            "turns": turns,
+            "elapsed": elapsed,
+            "commits": commits["count"],
+            "stored": stored,
+            "flushes": writer.flushes if writer else 0,
+        }
+
+    print(f"[*] {args.sessions} sessions x {args.turns} turns\n")
+    results = [asyncio.run(run("sync")), asyncio.run(run("write-behind"))]
+    for r in results:
+        print(f"  {r['mode']:<13} {r['turns'] / r['elapsed']:8.0f} turns/s   "
+              f"{r['commits']:6d} commits ({r['commits'] / r['turns']:.2f}/turn)   "
+              f"{r['stored']} messages stored"
+              + (f" in {r['flushes']} flushes" if r["flushes"] else ""))
+
+    saved = results[0]["commits"] - results[1]["commits"]
+    print(f"\n[INFO] write-behind saved {saved} commits "
+          f"({saved / results[0]['commits'] * 100:.0f}% of the synchronous total)")
+
+
+if __name__ == "__main__":
+    main()
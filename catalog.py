@@ -0,0 +1,247 @@
+"""
+Product catalog for /api/chat
+
+Products live in the `products` table. Every worker keeps them all in
+memory with everything a turn needs already built:
+- the NegotiationEngine config (built once, engine created on first use)
+- the opening messages (the product's own, or OPENING_TEMPLATES filled in)
+
+A turn never reads product config from the database. At most once every
+CATALOG_TTL_SECONDS a lookup runs one cheap version query (row count and
+newest updated_at); only when that changed are the rows updated since the last
+load read, and everything else keeps its entry (and engine). Products are
+deactivated rather than deleted; a smaller row count re-reads the whole table.
+POST /api/admin/products makes the local catalog check right away; other
+workers pick the change up within the TTL. The catalog is loaded at startup,
+off the event loop.
+
+Sessions without a product (all sessions before the catalog existed, and new
+sessions that don't ask for one) use DEFAULT_PRODUCT_SLUG. If that row is
+missing the built-in DEFAULT_PRODUCT is used, so the app works on an empty
+table.
+"""
+
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from models import Product
+from negotiation_engine import NegotiationEngine
+
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "30"))
+DEFAULT_PRODUCT_SLUG = os.getenv("DEFAULT_PRODUCT_SLUG", "apple-watch")
+
+DEFAULT_PRODUCT = {
+    "slug": "apple-watch",
+    "name": "Premium Apple Watch",
+    "starting_price": 450,
+    "floor_price": 350,  # Hard floor - never sold below this
+    "session_minimum_low": 350,  # Each session gets a random minimum in this range
+    "session_minimum_high": 390,
+    "cost_price": 350,  # AI knows this internally
+    "features": [
+        "Original Apple Watch",
+        "Excellent condition",
+        "Full warranty coverage",
+        "All accessories included",
+        "Latest software updates"
+    ],
+    # Bra Alex Opening Messages - randomly selected for each session
+    "opening_messages": [
+        "Welcome! I'm Bra Alex. See this Premium Apple Watch? Original, top condition, everything included. The price is 450 GHS. Should I wrap it for you? 😉",
+        "Hey there! Bra Alex here. I was just checking this Premium Apple Watch - it's the original one, 450 GHS. Ready to make an offer?",
+        "Perfect timing! I'm Bra Alex, and this Apple Watch is moving fast. 450 GHS, full accessories. I have another buyer asking, but you're here first. Interested?",
+        "Welcome! They call me Bra Alex, the best negotiator around. This Apple Watch is 450 GHS, but I have a feeling you're going to try and outsmart me. Let's see what you've got! 😄",
+        "Bra Alex here. Simple deal: one Premium Apple Watch, original, excellent condition, 450 GHS. What can you offer?",
+        "Greetings! I'm Bra Alex. Before you ask - yes, original. Yes, full warranty. Yes, all accessories included. My starting price is 450 GHS. Ready to negotiate?",
+        "You know, someone tried to sell me a fake one last week. But this? This is the real deal. I'm Bra Alex, 450 GHS for this Premium Apple Watch. Think you can convince me otherwise? 😂",
+        "Welcome! I see you have good taste. This Premium Apple Watch will look amazing. My price is 450 GHS. So, MoMo or card?",
+        "Bra Alex at your service. Quick question: are you looking for the best quality Apple Watch in town? Because you just found it. 450 GHS - let's make a deal.",
+        "Hey! Bra Alex here. This Premium Apple Watch is 450 GHS, comes with everything. Let's find a price that works for both of us!"
+    ]
+}
+
+# Openings for products without their own ({name}, {price})
+OPENING_TEMPLATES = [
+    "Welcome! I'm Bra Alex. See this {name}? Top condition, everything included. The price is {price} GHS. Should I wrap it for you? 😉",
+    "Hey there! Bra Alex here. I was just checking this {name} - it's the real thing, {price} GHS. Ready to make an offer?",
+    "Perfect timing! I'm Bra Alex, and this {name} is moving fast. {price} GHS. I have another buyer asking, but you're here first. Interested?",
+    "Welcome! They call me Bra Alex, the best negotiator around. This {name} is {price} GHS, but I have a feeling you're going to try and outsmart me. Let's see what you've got! 😄",
+    "Bra Alex here. Simple deal: one {name}, excellent condition, {price} GHS. What can you offer?",
+    "Welcome! I see you have good taste. This {name} will serve you well. My price is {price} GHS. So, MoMo or card?",
+    "Hey! Bra Alex here. This {name} is {price} GHS. Let's find a price that works for both of us!"
+]
+
+
+def _format_price(price: float) -> str:
+    return f"{price:g}"
+
+
+def _json_list(value) -> List[str]:
+    if not value:
+        return []
+    return json.loads(value) if isinstance(value, str) else list(value)
+
+
+class CatalogProduct:
+    """One product with its engine config and opening messages precomputed"""
+
+    def __init__(self, config: dict, product_id: Optional[int] = None, updated_at=None):
+        self.id = product_id
+        self.slug = config["slug"]
+        self.name = config["name"]
+        self.starting_price = float(config["starting_price"])
+        self.floor_price = float(config["floor_price"])
+        self.session_minimum_low = float(config["session_minimum_low"])
+        self.session_minimum_high = float(config["session_minimum_high"])
+        self.updated_at = updated_at
+        self.config = {
+            "name": self.name,
+            "starting_price": self.starting_price,
+            "floor_price": self.floor_price,
+            "cost_price": config.get("cost_price"),
+            "features": _json_list(config.get("features")),
+        }
+        self.opening_messages = _json_list(config.get("opening_messages")) or [
+            template.format(name=self.name, price=_format_price(self.starting_price))
+            for template in OPENING_TEMPLATES
+        ]
+        self._engine = None
+
+    @classmethod
+    def from_row(cls, row: Product) -> "CatalogProduct":
+        return cls({
+            "slug": row.slug,
+            "name": row.name,
+            "starting_price": row.starting_price,
+            "floor_price": row.floor_price,
+            "session_minimum_low": row.session_minimum_low,
+            "session_minimum_high": row.session_minimum_high,
+            "cost_price": row.cost_price,
+            "features": row.features,
+            "opening_messages": row.opening_messages,
+        }, product_id=row.id, updated_at=row.updated_at)
+
+    @property
+    def engine(self) -> NegotiationEngine:
+        # Built on first use: a reload of thousands of products doesn't build thousands of engines
+        if self._engine is None:
+            self._engine = NegotiationEngine(self.config)
+        return self._engine
+
+    def session_minimum(self) -> int:
+        """Random minimum price for a new session (never below the floor)"""
+        low = max(self.session_minimum_low, self.floor_price)
+        return random.randint(int(low), int(max(low, self.session_minimum_high)))
+
+    def opening_message(self) -> str:
+        return random.choice(self.opening_messages)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "slug": self.slug,
+            "name": self.name,
+            "starting_price": self.starting_price,
+            "features": self.config["features"],
+        }
+
+
+class Catalog:
+    def __init__(self, ttl: float = CATALOG_TTL_SECONDS, default_slug: str = DEFAULT_PRODUCT_SLUG):
+        self.ttl = ttl
+        self.default_slug = default_slug
+        self.builtin_default = CatalogProduct(DEFAULT_PRODUCT)
+        self._by_id: Dict[int, CatalogProduct] = {}
+        self._by_slug: Dict[str, CatalogProduct] = {}
+        self._version = None
+        self._checked_at = 0.0
+        self.loads = 0
+        self.version_checks = 0
+
+    def _fresh(self, db):
+        """Re-read the table if it changed since the last load (checked at most once per TTL)"""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.ttl:
+            return
+        version = tuple(db.query(func.count(Product.id), func.max(Product.updated_at)).one())
+        self.version_checks += 1
+        self._checked_at = now
+        if version == self._version:
+            return
+        query = db.query(Product)
+        previous = self._version
+        if previous is not None and previous[1] is not None and version[0] >= previous[0]:
+            # Rows were only added or updated (both bump updated_at): read just those
+            by_id, by_slug = dict(self._by_id), dict(self._by_slug)
+            query = query.filter(Product.updated_at > previous[1])
+        else:
+            by_id, by_slug = {}, {}
+        for row in query.all():
+            entry = by_id.get(row.id)
+            if entry is not None and entry.slug != row.slug:
+                by_slug.pop(entry.slug, None)
+            if entry is None or entry.updated_at != row.updated_at:
+                entry = CatalogProduct.from_row(row)
+            # Inactive products stay reachable by id: their open sessions keep negotiating
+            by_id[entry.id] = entry
+            if row.active:
+                by_slug[entry.slug] = entry
+            else:
+                by_slug.pop(entry.slug, None)
+        self._by_id, self._by_slug = by_id, by_slug
+        self._version = version
+        self.loads += 1
+
+    def default(self, db) -> CatalogProduct:
+        self._fresh(db)
+        return self._by_slug.get(self.default_slug, self.builtin_default)
+
+    def get(self, db, product_id: Optional[int]) -> CatalogProduct:
+        """A session's product; sessions without one (or whose product was deleted) get the default"""
+        self._fresh(db)
+        if product_id is not None:
+            entry = self._by_id.get(product_id)
+            if entry is not None:
+                return entry
+        return self._by_slug.get(self.default_slug, self.builtin_default)
+
+    def by_slug(self, db, slug: str) -> Optional[CatalogProduct]:
+        self._fresh(db)
+        entry = self._by_slug.get(slug)
+        if entry is None and slug == self.default_slug:
+            return self.builtin_default
+        return entry
+
+    def all(self, db) -> List[CatalogProduct]:
+        self._fresh(db)
+        return list(self._by_slug.values()) or [self.builtin_default]
+
+    def warm(self):
+        """Load the catalog before the first turn needs it (run off the event loop)"""
+        from database import SessionLocal
+        db = SessionLocal()
+        try:
+            self._fresh(db)
+        finally:
+            db.close()
+
+    def invalidate(self):
+        """Check the table on the next lookup instead of waiting for the TTL"""
+        self._checked_at = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "products": len(self._by_slug),
+            "engines_built": sum(1 for entry in self._by_id.values() if entry._engine is not None),
+            "loads": self.loads,
+            "version_checks": self.version_checks,
+            "ttl_seconds": self.ttl,
+        }
+
+
+catalog = Catalog()
@@ -1,31 +1,139 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from models import Base
 import os
+import threading
+import time
 
 # Use PostgreSQL in production (Railway), SQLite for local development
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./nego_challenge.db")
 
-# Railway provides DATABASE_URL starting with postgres:// but SQLAlchemy needs postgresql://
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+# Optional read replica for heavy reads (admin dashboard, leaderboard, stats)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
 
-# Different connection args for SQLite vs PostgreSQL
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+# How far behind the primary the replica may be before reads fall back to the primary
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# How often the replica's health/lag is re-checked
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.getenv("REPLICA_CHECK_INTERVAL_SECONDS", "2"))
+
+def normalize_url(url: str) -> str:
+    # Railway provides DATABASE_URL starting with postgres:// but SQLAlchemy needs postgresql://
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+def connect_args_for(url: str) -> dict:
+    # Different connection args for SQLite vs PostgreSQL
+    if url.startswith("sqlite"):
+        return {"check_same_thread": False}
+    return {}
+
+DATABASE_URL = normalize_url(DATABASE_URL)
+connect_args = connect_args_for(DATABASE_URL)
+
+# Chat turns hand their connection back before the LLM calls (see negotiate_turn in
+# main.py), so the pool only needs to cover concurrent DB work, not in-flight turns
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
 
 engine = create_engine(
-    DATABASE_URL, 
-    connect_args=connect_args
+    DATABASE_URL,
+    connect_args=connect_args,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Set by gunicorn.conf.py after the master process has run init_db(), so each
+# worker skips it on boot
+SKIP_INIT_DB = os.getenv("SKIP_INIT_DB", "").lower() in ("1", "true", "yes")
+
+read_engine = None
+ReadSessionLocal = None
+if DATABASE_READ_URL:
+    DATABASE_READ_URL = normalize_url(DATABASE_READ_URL)
+    read_connect_args = connect_args_for(DATABASE_READ_URL)
+    if DATABASE_READ_URL.startswith("postgresql"):
+        # Don't let a dead replica hang requests - fail fast and fall back
+        read_connect_args["connect_timeout"] = 2
+    read_engine = create_engine(
+        DATABASE_READ_URL,
+        connect_args=read_connect_args,
+        pool_pre_ping=True
+    )
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Postgres standby lag in seconds (0 when fully caught up or not a standby)
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+_replica_state = {"checked_at": 0.0, "usable": False, "lag": None}
+_replica_lock = threading.Lock()
+
+def replica_lag_seconds() -> float:
+    """Measure replication lag on the read replica (raises if it's unreachable)"""
+    with read_engine.connect() as conn:
+        if read_engine.dialect.name == "postgresql":
+            return float(conn.execute(text(REPLICA_LAG_SQL)).scalar() or 0)
+        conn.execute(text("SELECT 1"))
+        return 0.0
+
+def replica_is_usable() -> bool:
+    """Whether reads may go to the replica right now (cached for REPLICA_CHECK_INTERVAL_SECONDS)"""
+    if read_engine is None:
+        return False
+
+    now = time.monotonic()
+    if now - _replica_state["checked_at"] < REPLICA_CHECK_INTERVAL_SECONDS:
+        return _replica_state["usable"]
+
+    # Only one thread re-checks; the others use the last known state
+    if not _replica_lock.acquire(blocking=False):
+        return _replica_state["usable"]
+    try:
+        try:
+            lag = replica_lag_seconds()
+            usable = lag <= REPLICA_MAX_LAG_SECONDS
+        except Exception as e:
+            lag = None
+            usable = False
+            if _replica_state["usable"]:
+                print(f"⚠️  Read replica unavailable, falling back to primary: {e}")
+        _replica_state.update(checked_at=time.monotonic(), usable=usable, lag=lag)
+        return usable
+    finally:
+        _replica_lock.release()
+
+def replica_status() -> dict:
+    return {
+        "configured": read_engine is not None,
+        "usable": _replica_state["usable"],
+        "lag_seconds": _replica_state["lag"],
+        "max_lag_seconds": REPLICA_MAX_LAG_SECONDS,
+    }
+
+def dialect_insert(db, model):
+    """INSERT construct for the session's backend (supports ON CONFLICT on both)"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
 def init_db():
-    """Initialize the database"""
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database initialized successfully")
+    """Initialize the database and apply pending migrations"""
+    from migrations import upgrade
+    applied = upgrade(engine)
+    if applied:
+        print("✅ Database initialized successfully")
+    else:
+        print("✅ Database schema up to date")
 
 def get_db():
     """Get database session"""
@@ -35,4 +143,16 @@ def get_db():
     finally:
         db.close()
 
+def read_session():
+    """Session for read-only queries: the replica when healthy, else the primary"""
+    if replica_is_usable():
+        return ReadSessionLocal()
+    return SessionLocal()
 
+def get_read_db():
+    """Get read-only database session (may be up to REPLICA_MAX_LAG_SECONDS stale)"""
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,120 @@
+"""
+Per-turn deadline for /api/chat
+
+chat() gives every turn TURN_BUDGET_SECONDS; a client can ask for less with an
+X-Turn-Budget header (its own request timeout, in seconds). Like the current
+span, the deadline lives in a contextvar, so NegotiationEngine reads it without
+it being passed around. Each stage gets what is left as its timeout:
+- session lookup, history load and the final session update (PostgreSQL):
+  statement_timeout
+- intent call: skipped for the regex parser when less than
+  DEADLINE_MIN_INTENT_SECONDS would be left after keeping
+  DEADLINE_MIN_REPLY_SECONDS for the reply; a call that runs out of time falls
+  back to the regex parser too
+- reply call: skipped for a templated line quoting the turn's price when less
+  than DEADLINE_MIN_REPLY_SECONDS is left; a call that runs out of time is
+  replaced the same way
+COMMIT_RESERVE_SECONDS is always kept back for the writes at the end of the
+turn. A turn that fails after its deadline passed gets a 504.
+
+Downgrades are counted in nego_deadline_downgrades_total{stage}, turns that
+finished late in nego_deadline_exceeded_total, and the unused budget in
+nego_turn_budget_left_seconds. The root span carries deadline_seconds,
+deadline_left and the downgraded stages. TURN_BUDGET_SECONDS=0 turns the
+deadline off (unless the client sends a budget).
+"""
+
+import contextvars
+import math
+import os
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from metrics import DEADLINE_DOWNGRADES, DEADLINE_EXCEEDED, TURN_BUDGET_LEFT
+
+TURN_BUDGET_SECONDS = float(os.getenv("TURN_BUDGET_SECONDS", "10"))
+DEADLINE_MIN_INTENT_SECONDS = float(os.getenv("DEADLINE_MIN_INTENT_SECONDS", "0.5"))
+DEADLINE_MIN_REPLY_SECONDS = float(os.getenv("DEADLINE_MIN_REPLY_SECONDS", "1.5"))
+# Left for the message/session writes and the commit after the reply
+COMMIT_RESERVE_SECONDS = 0.25
+
+_current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+class Deadline:
+    """A turn's time budget; a budget of None never runs out"""
+
+    def __init__(self, budget: Optional[float]):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget if budget else None
+        self.downgraded: List[str] = []
+        self._token = None
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return math.inf
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, reserve: float = 0.0) -> Optional[float]:
+        """Seconds a stage may take while keeping `reserve` for the stages after it (None: no limit)"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.remaining() - reserve)
+
+    def allows(self, seconds: float, reserve: float = 0.0) -> bool:
+        """Whether a stage needing `seconds` still fits, keeping `reserve` for the stages after it"""
+        return self.remaining() - reserve >= seconds
+
+    def downgrade(self, stage: str):
+        self.downgraded.append(stage)
+        DEADLINE_DOWNGRADES.labels(stage).inc()
+
+    def __enter__(self):
+        self._token = _current_deadline.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_deadline.reset(self._token)
+        if self.expires_at is not None:
+            left = self.remaining()
+            if left < 0:
+                DEADLINE_EXCEEDED.inc()
+            TURN_BUDGET_LEFT.observe(max(0.0, left))
+        return False
+
+
+NO_DEADLINE = Deadline(None)
+
+
+def current_deadline() -> Deadline:
+    """The running turn's deadline (NO_DEADLINE outside a chat turn, e.g. in replay.py)"""
+    return _current_deadline.get() or NO_DEADLINE
+
+
+def turn_budget(requested: Optional[str]) -> Optional[float]:
+    """TURN_BUDGET_SECONDS, or the client's X-Turn-Budget when that is shorter"""
+    budget = TURN_BUDGET_SECONDS if TURN_BUDGET_SECONDS > 0 else None
+    try:
+        requested = float(requested) if requested else None
+    except ValueError:
+        requested = None
+    if requested is not None and requested > 0 and math.isfinite(requested):
+        budget = min(budget, requested) if budget else requested
+    return budget
+
+
+def limit_statements(db):
+    """Cap the current transaction's statements (and row lock waits) at the turn's remaining budget"""
+    deadline = current_deadline()
+    if deadline.expires_at is None or db.get_bind().dialect.name != "postgresql":
+        return
+    # SET LOCAL lasts until the transaction ends, so the turn's final writes get it too:
+    # never below COMMIT_RESERVE_SECONDS (and never 0, which means "no limit")
+    milliseconds = int(max(COMMIT_RESERVE_SECONDS, deadline.remaining()) * 1000)
+    db.execute(text(f"SET LOCAL statement_timeout = {milliseconds}"))
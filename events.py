@@ -0,0 +1,309 @@
+"""
+Live admin event feed
+
+Writers call publish(db, type, data) inside their transaction. The event is
+delivered when that transaction commits and dropped if it rolls back:
+- PostgreSQL: pg_notify() on the ADMIN_EVENTS_CHANNEL channel. Every worker
+  that has an admin client connected LISTENs on it, so events reach the
+  dashboard whichever worker served the write. Writers only NOTIFY while some
+  worker is listening: the listener connections carry a known
+  application_name, and each worker looks for one in pg_stat_activity at most
+  every ADMIN_EVENTS_LISTENER_CHECK_SECONDS. With no dashboard open, chat
+  writes send nothing.
+- SQLite: kept on the session and handed to this process's subscribers
+  after commit.
+
+Each connected client (the SSE stream at /api/admin/events) gets a bounded
+buffer of ADMIN_EVENTS_BUFFER_SIZE events. A slow client loses its oldest
+events instead of holding memory or stalling writers, and is sent a `resync`
+event telling it to refetch the first page.
+
+Streams close after ADMIN_EVENTS_STREAM_SECONDS so an open dashboard never
+blocks a graceful shutdown. Every event carries an SSE `id`, and the browser
+sends the last one back as Last-Event-ID when it reconnects. Each worker keeps
+its last ADMIN_EVENTS_BUFFER_SIZE events, and keeps collecting them for
+ADMIN_EVENTS_IDLE_SECONDS after its last client leaves. A reconnect is sent
+only what it missed. A `resync` is sent only when that id is no longer known
+(the buffer moved on, or the worker wasn't collecting).
+
+Event types: session_created, message_added, deal_closed, waitlist_signup,
+waitlist_import.
+"""
+
+import asyncio
+import math
+import os
+import select
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+import orjson
+from sqlalchemy import event, text
+
+from database import SessionLocal, engine
+
+ADMIN_EVENTS_CHANNEL = "admin_events"
+ADMIN_EVENTS_BUFFER_SIZE = int(os.getenv("ADMIN_EVENTS_BUFFER_SIZE", "500"))
+ADMIN_EVENTS_MAX_CLIENTS = int(os.getenv("ADMIN_EVENTS_MAX_CLIENTS", "50"))
+# Keep below gunicorn's graceful_timeout: open streams delay worker shutdown
+ADMIN_EVENTS_STREAM_SECONDS = float(os.getenv("ADMIN_EVENTS_STREAM_SECONDS", "25"))
+# How long a worker keeps collecting events after its last client left, so reconnects can resume
+ADMIN_EVENTS_IDLE_SECONDS = float(os.getenv("ADMIN_EVENTS_IDLE_SECONDS", "60"))
+# How stale a writer's "is anyone listening?" answer may be (PostgreSQL)
+ADMIN_EVENTS_LISTENER_CHECK_SECONDS = float(os.getenv("ADMIN_EVENTS_LISTENER_CHECK_SECONDS", "2"))
+LISTENER_APPLICATION_NAME = "nego_admin_events"
+# NOTIFY payloads are capped at 8000 bytes - keep message previews well under it
+MESSAGE_PREVIEW_CHARS = 500
+
+USE_NOTIFY = engine.dialect.name == "postgresql"
+
+
+class Subscriber:
+    """One connected admin client: a bounded buffer plus a wake-up event"""
+
+    def __init__(self, buffer_size: int = ADMIN_EVENTS_BUFFER_SIZE):
+        self.events = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._wake = asyncio.Event()
+
+    def push(self, item: dict):
+        """Called on the event loop thread"""
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(item)
+        self._wake.set()
+
+    async def next_batch(self, timeout: float) -> List[dict]:
+        """Wait up to `timeout` seconds for events; returns everything buffered"""
+        if not self.events:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._wake.clear()
+        batch = list(self.events)
+        self.events.clear()
+        return batch
+
+
+class Resume:
+    """What a (re)connecting client is owed: missed events, or a resync"""
+
+    def __init__(self, events: List[dict], position: str, resync: bool):
+        self.events = events
+        self.position = position
+        self.resync = resync
+
+
+class EventBus:
+    """Fans events out to this process's subscribers"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._listener = None
+        self.published = 0
+        # Recent events for resuming streams, since `_epoch` began (the last time
+        # this worker started collecting - events before it may be missing)
+        self._recent = deque(maxlen=ADMIN_EVENTS_BUFFER_SIZE)
+        self._epoch = None
+        self._last_left = -math.inf
+        self._listeners_seen = False
+        self._listeners_checked_at = -math.inf
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _collecting(self) -> bool:
+        """Clients connected, or one left less than ADMIN_EVENTS_IDLE_SECONDS ago (caller holds _lock)"""
+        return bool(self._subscribers) or time.monotonic() - self._last_left < ADMIN_EVENTS_IDLE_SECONDS
+
+    @property
+    def collecting(self) -> bool:
+        with self._lock:
+            return self._collecting()
+
+    def restart_collecting(self):
+        """Forget recent events: some may have been missed (no listener, or it reconnected)"""
+        with self._lock:
+            self._restart()
+
+    def _restart(self):
+        self._recent.clear()
+        self._epoch = os.urandom(4).hex()
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Optional[Tuple[Subscriber, Resume]]:
+        """
+        Register a client (None when ADMIN_EVENTS_MAX_CLIENTS are connected).
+        The Resume holds the events it missed after `last_event_id`, or asks
+        for a resync when they aren't all known here.
+        """
+        with self._lock:
+            if len(self._subscribers) >= ADMIN_EVENTS_MAX_CLIENTS:
+                return None
+            if not self._collecting():
+                self._restart()
+            self._loop = asyncio.get_running_loop()
+            subscriber = Subscriber()
+            self._subscribers.add(subscriber)
+            resume = self._resume(last_event_id)
+            if USE_NOTIFY and self._listener is None:
+                self._listener = NotifyListener(self)
+                self._listener.start()
+        return subscriber, resume
+
+    def _resume(self, last_event_id: Optional[str]) -> Resume:
+        # With no events yet the position is this epoch's start marker
+        position = self._recent[-1]["id"] if self._recent else f"start-{self._epoch}"
+        if not last_event_id:
+            return Resume([], position, resync=False)
+        if last_event_id == f"start-{self._epoch}" and (
+                not self._recent or self._recent[0]["seq"] == 1):
+            return Resume(list(self._recent), position, resync=False)
+        for index, item in enumerate(self._recent):
+            if item["id"] == last_event_id:
+                return Resume(list(self._recent)[index + 1:], position, resync=False)
+        return Resume([], position, resync=True)
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers:
+                self._last_left = time.monotonic()
+
+    def keep_listening(self, listener: "NotifyListener") -> bool:
+        """Called by the listener between waits; it exits once nobody needs events here"""
+        with self._lock:
+            if self._collecting():
+                return True
+            if self._listener is listener:
+                self._listener = None
+            return False
+
+    def has_listeners(self, db) -> bool:
+        """Whether any worker LISTENs for admin events (PostgreSQL; may be a few seconds stale)"""
+        if self._listener is not None:
+            return True
+        now = time.monotonic()
+        if now - self._listeners_checked_at >= ADMIN_EVENTS_LISTENER_CHECK_SECONDS:
+            self._listeners_checked_at = now
+            self._listeners_seen = bool(db.execute(
+                text("SELECT EXISTS (SELECT 1 FROM pg_stat_activity WHERE application_name = :name)"),
+                {"name": LISTENER_APPLICATION_NAME}
+            ).scalar())
+        return self._listeners_seen
+
+    def dispatch(self, item: dict):
+        """Deliver to every local subscriber (safe to call from any thread)"""
+        with self._lock:
+            if not self._collecting():
+                return
+            seq = self._recent[-1]["seq"] + 1 if self._recent else 1
+            item = {**item, "seq": seq}
+            self._recent.append(item)
+            subscribers = list(self._subscribers)
+            loop = self._loop
+        if not subscribers or loop is None or loop.is_closed():
+            return
+        self.published += 1
+        for subscriber in subscribers:
+            loop.call_soon_threadsafe(subscriber.push, item)
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+class NotifyListener(threading.Thread):
+    """LISTENs on ADMIN_EVENTS_CHANNEL and dispatches notifications locally"""
+
+    def __init__(self, bus: EventBus):
+        super().__init__(name="admin-events-listener", daemon=True)
+        self.bus = bus
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                # Returns once no client has needed events for ADMIN_EVENTS_IDLE_SECONDS
+                self._listen()
+                return
+            except Exception as e:
+                print(f"⚠️  Admin event listener error, reconnecting: {e}")
+                self._stopping.wait(2)
+
+    def _listen(self):
+        # A dedicated connection: LISTEN state must never go back into the pool
+        raw = engine.raw_connection()
+        raw.detach()
+        conn = raw.driver_connection
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            # Lets writers on every worker see that someone is listening (EventBus.has_listeners)
+            cursor.execute(f"SET application_name = '{LISTENER_APPLICATION_NAME}'")
+            cursor.execute(f"LISTEN {ADMIN_EVENTS_CHANNEL}")
+            # Anything sent before LISTEN (first start, or after an error) was missed
+            self.bus.restart_collecting()
+            while not self._stopping.is_set():
+                if not self.bus.keep_listening(self):
+                    return
+                if select.select([conn], [], [], 5)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.bus.dispatch(orjson.loads(notify.payload))
+        finally:
+            raw.close()
+
+    def stop(self):
+        self._stopping.set()
+
+
+event_bus = EventBus()
+
+
+def publish(db, event_type: str, data: dict):
+    """Queue an admin event on `db`'s transaction (delivered on commit)"""
+    # The id is the same on every worker that receives the event, so a client can resume anywhere
+    item = {"id": os.urandom(6).hex(), "type": event_type, "data": data, "ts": time.time()}
+    if USE_NOTIFY:
+        if event_bus.has_listeners(db):
+            db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                       {"channel": ADMIN_EVENTS_CHANNEL, "payload": orjson.dumps(item).decode()})
+    elif event_bus.collecting:
+        db.info.setdefault("admin_events", []).append(item)
+
+
+def message_preview(content: str) -> str:
+    if len(content) <= MESSAGE_PREVIEW_CHARS:
+        return content
+    return content[:MESSAGE_PREVIEW_CHARS] + "…"
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _deliver_after_commit(session):
+    for item in session.info.pop("admin_events", ()):
+        event_bus.dispatch(item)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop("admin_events", None)
+
+
+def encode_sse(item: dict) -> bytes:
+    # Events without an id (resync) leave the client's Last-Event-ID alone
+    event_id = b"id: " + item["id"].encode() + b"\n" if "id" in item else b""
+    payload = {key: value for key, value in item.items() if key != "seq"}
+    return event_id + b"event: " + item["type"].encode() + b"\ndata: " + orjson.dumps(payload) + b"\n\n"
+
+
+def encode_sse_position(position: str) -> bytes:
+    """Sets the client's Last-Event-ID without delivering an event"""
+    return b"id: " + position.encode() + b"\n\n"
@@ -0,0 +1,148 @@
+"""
+Streaming exports for the waitlist and conversations.
+
+Rows are read through a server-side cursor (stream_results + yield_per) in
+id order and serialized one at a time, so memory stays flat no matter how big
+the table is. Exports read from the replica when one is configured. Every row carries its `id`; pass the last id you received as
+`after_id` to resume an interrupted export.
+
+The messages export also covers sessions moved to `conversation_archives`
+(see archive.py): after the hot messages, archived ones follow session by
+session with `"archived": true`. They have no message id (`id` is null), so
+that part is always sent in full, including on resume.
+"""
+
+import csv
+import io
+from typing import Iterator, Optional
+
+import orjson
+
+from archive import unpack_messages
+from database import read_session
+from models import WaitlistEntry, ChatSession, ConversationArchive, ConversationMessage
+
+EXPORT_BATCH_SIZE = 1000
+
+WAITLIST_FIELDS = [
+    "id", "contact_type", "contact_value", "source",
+    "referral_code", "referred_by", "referral_count", "created_at",
+]
+
+SESSION_FIELDS = [
+    "id", "session_id", "product_name", "starting_price", "current_price",
+    "minimum_price", "final_price", "deal_closed", "discount_percentage",
+    "referral_code", "referred_by", "created_at", "ended_at",
+]
+
+MESSAGE_FIELDS = [
+    "id", "session_id", "role", "content", "timestamp", "archived",
+]
+
+EXPORTS = {
+    # name: (model, fields)
+    "waitlist": (WaitlistEntry, WAITLIST_FIELDS),
+    "sessions": (ChatSession, SESSION_FIELDS),
+    "messages": (ConversationMessage, MESSAGE_FIELDS),
+}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _value(obj, field: str):
+    value = getattr(obj, field)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def iter_rows(model, fields: list, after_id: Optional[int] = None,
+              batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """Yield rows of `model` as dicts, in id order, from a server-side cursor"""
+    db = read_session()
+    try:
+        query = db.query(model)
+        if after_id is not None:
+            query = query.filter(model.id > after_id)
+        query = (
+            query.order_by(model.id)
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
+        for obj in query:
+            yield {field: _value(obj, field) for field in fields}
+            # Don't let the identity map grow with the export
+            db.expunge(obj)
+    finally:
+        db.close()
+
+
+def iter_archived_messages(batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """Yield archived messages, session by session in archive id order"""
+    db = read_session()
+    try:
+        query = (
+            db.query(ConversationArchive.session_id, ConversationArchive.payload)
+            .order_by(ConversationArchive.id)
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
+        for archive in query:
+            for m in unpack_messages(archive.payload):
+                yield {
+                    "id": None,
+                    "session_id": archive.session_id,
+                    "role": m["role"],
+                    "content": m["content"],
+                    "timestamp": m["timestamp"].isoformat() if m["timestamp"] else None,
+                    "archived": True,
+                }
+    finally:
+        db.close()
+
+
+def iter_messages(after_id: Optional[int] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """Hot messages in id order (resumable with after_id), then all archived ones"""
+    hot_fields = [field for field in MESSAGE_FIELDS if field != "archived"]
+    for row in iter_rows(ConversationMessage, hot_fields, after_id=after_id, batch_size=batch_size):
+        row["archived"] = False
+        yield row
+    # Read after the hot part: a session archived meanwhile shows up twice rather than not at all
+    yield from iter_archived_messages(batch_size)
+
+
+def iter_ndjson(rows: Iterator[dict]) -> Iterator[bytes]:
+    """Serialize rows as newline-delimited JSON"""
+    for row in rows:
+        yield orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def iter_csv(rows: Iterator[dict], fields: list) -> Iterator[bytes]:
+    """Serialize rows as CSV with a header line"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Header-only export
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_export(name: str, fmt: str = "ndjson", after_id: Optional[int] = None,
+                  batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Return a byte iterator for the named export in the given format"""
+    model, fields = EXPORTS[name]
+    if name == "messages":
+        rows = iter_messages(after_id=after_id, batch_size=batch_size)
+    else:
+        rows = iter_rows(model, fields, after_id=after_id, batch_size=batch_size)
+    if fmt == "csv":
+        return iter_csv(rows, fields)
+    return iter_ndjson(rows)
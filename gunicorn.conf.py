@@ -0,0 +1,49 @@
+"""
+Gunicorn config for multi-worker serving (uvicorn workers)
+
+    gunicorn main:app -c gunicorn.conf.py
+
+WEB_CONCURRENCY sets the number of workers (default 1). The master runs
+init_db() / partition maintenance once before forking, and workers skip it
+(SKIP_INIT_DB). Concurrent turns on one session are resolved by a
+compare-and-set on chat_sessions.turn_count (see negotiate_turn in main.py),
+so they stay consistent across workers. Run several workers on PostgreSQL
+only - SQLite serializes every write anyway.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Chat turns wait on the LLM; uvicorn workers stay responsive, so this only
+# catches hung workers
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# Time for in-flight turns to finish and the write-behind buffer to flush
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    """Runs once in the master, before any worker is forked"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    # Set before `database` is imported: workers are forked with the master's
+    # modules, and SKIP_INIT_DB is read at import time
+    os.environ["SKIP_INIT_DB"] = "1"
+
+    from database import engine, init_db
+    from partitions import MESSAGE_PARTITIONING, maintain
+
+    from message_writer import MESSAGE_WRITE_BEHIND
+
+    if MESSAGE_WRITE_BEHIND and workers > 1:
+        print("⚠️  MESSAGE_WRITE_BEHIND buffers messages per worker: with several workers, "
+              "history reads can miss another worker's unflushed messages")
+
+    init_db()
+    if MESSAGE_PARTITIONING:
+        maintain(engine)
+    # Workers must not inherit the master's pooled connections
+    engine.dispose()
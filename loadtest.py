@@ -0,0 +1,440 @@
+"""
+Load test: scripted buyers negotiating through /api/chat
+
+Starts the mock LLM (mock_llm.py) and the API on a scratch SQLite database,
+then runs thousands of concurrent buyers against it. Each buyer opens a
+session (INIT_GREETING), negotiates following its persona, reads its session
+back and starts over until the test ends:
+
+- lowballer: opens far below the floor and creeps up 20-30 GHS a turn
+- quick_closer: offers just under the asking price, then says "deal"
+- best_price: keeps asking "what's your best price?" and takes the 3rd answer
+- double_tapper: sends every message twice at once (double-clicked send button)
+
+Buyers read the seller's counter-offer back from the reply, so the mock LLM is
+needed (the real one would cost money and rate limit long before the API
+does). Think time between messages is exponential around --think-time.
+
+Reports requests/s and p50/p95/p99 latency per endpoint, error rates, and the
+server-side commit and deal rates from /metrics. Results are written to
+loadtest_results/ as JSON; --compare prints the difference to an earlier run.
+
+Usage:
+    python loadtest.py --buyers 1000 --duration 60
+    python loadtest.py --workers 4 --buyers 2000 --reply-latency 2.5
+    python loadtest.py --url http://localhost:8090   # already running API + mock
+    python loadtest.py --compare loadtest_results/<earlier>.json
+
+Latency is measured on the client and includes waiting for one of the
+--connections pooled connections. /metrics is per worker: with --workers > 1
+the server-side rates come from whichever worker answered the scrape.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+RESULTS_DIR = "loadtest_results"
+PRICE_IN_REPLY = re.compile(r"(\d+(?:\.\d+)?)\s*GHS")
+STARTING_PRICE = 450
+DEFAULT_PERSONAS = "lowballer=3,quick_closer=2,best_price=3,double_tapper=2"
+SERVER_COUNTERS = {
+    "commits": 'nego_chat_stage_seconds_count{stage="commit"}',
+    "chat_turns": "nego_chat_turn_seconds_count",
+    "deals_closed": "nego_deals_closed_total",
+    "turn_conflicts": "nego_chat_turn_conflicts_total",
+    "llm_errors_intent": 'nego_llm_errors_total{call="intent"}',
+    "llm_errors_reply": 'nego_llm_errors_total{call="reply"}',
+    "replies_llm": 'nego_replies_total{source="llm"}',
+    "replies_template": 'nego_replies_total{source="template"}',
+    "replies_cache": 'nego_replies_total{source="cache"}',
+    "speculation_hits": 'nego_speculative_replies_total{outcome="hit"}',
+    "speculation_misses": 'nego_speculative_replies_total{outcome="miss"}',
+    "speculation_saved_seconds": "nego_speculation_saved_seconds_total",
+    "deadline_downgrades_intent": 'nego_deadline_downgrades_total{stage="intent"}',
+    "deadline_downgrades_reply": 'nego_deadline_downgrades_total{stage="reply"}',
+    "deadline_exceeded": "nego_deadline_exceeded_total",
+}
+
+
+class Recorder:
+    """Latency samples and errors per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_kinds = defaultdict(int)
+
+    async def request(self, client, endpoint: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.latencies[endpoint].append(time.perf_counter() - started)
+            self.errors[endpoint] += 1
+            self.error_kinds[type(e).__name__] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+            self.error_kinds[f"HTTP {response.status_code}"] += 1
+            return None
+        return response
+
+
+class Buyer:
+    def __init__(self, client, recorder: Recorder, think_time: float):
+        self.client = client
+        self.recorder = recorder
+        self.think_time = think_time
+        self.session_id = None
+        self.price = STARTING_PRICE
+
+    async def pause(self):
+        await asyncio.sleep(random.expovariate(1 / self.think_time) if self.think_time else 0)
+
+    async def say(self, text: str, times: int = 1):
+        """Send one chat message; returns the parsed reply (None on error)"""
+        calls = [
+            self.recorder.request(self.client, "POST /api/chat", "POST", "/api/chat",
+                                  json={"session_id": self.session_id, "user_message": text})
+            for _ in range(times)
+        ]
+        responses = await asyncio.gather(*calls)
+        replies = [r.json() for r in responses if r is not None]
+        if not replies:
+            return None
+        reply = replies[0]
+        quoted = PRICE_IN_REPLY.findall(reply["ai_message"])
+        if quoted:
+            self.price = float(quoted[-1])
+        return reply
+
+    async def negotiate(self, persona: str) -> bool:
+        """One conversation; True when it ended in a deal"""
+        self.session_id = f"load-{persona}-{uuid.uuid4().hex}"
+        self.price = STARTING_PRICE
+        if await self.say("INIT_GREETING") is None:
+            return False
+        deal = await PERSONAS[persona](self)
+        await self.pause()
+        await self.recorder.request(self.client, "GET /api/sessions/{id}", "GET",
+                                    f"/api/sessions/{self.session_id}")
+        if random.random() < 0.1:
+            await self.recorder.request(self.client, "GET /api/leaderboard", "GET", "/api/leaderboard")
+        return deal
+
+
+async def lowballer(buyer: Buyer) -> bool:
+    offer = random.randint(150, 250)
+    for _ in range(8):
+        await buyer.pause()
+        reply = await buyer.say(f"I can pay {offer} GHS")
+        if reply is None or reply["deal_closed"]:
+            return bool(reply and reply["deal_closed"])
+        offer = min(offer + random.randint(20, 30), int(buyer.price))
+    await buyer.pause()
+    reply = await buyer.say(f"okay {buyer.price:g}")
+    return bool(reply and reply["deal_closed"])
+
+
+async def quick_closer(buyer: Buyer) -> bool:
+    await buyer.pause()
+    reply = await buyer.say(f"what about {buyer.price - random.randint(5, 15):g}")
+    if reply is None or reply["deal_closed"]:
+        return bool(reply and reply["deal_closed"])
+    await buyer.pause()
+    reply = await buyer.say(f"deal, {buyer.price:g} is fine")
+    return bool(reply and reply["deal_closed"])
+
+
+async def best_price(buyer: Buyer) -> bool:
+    for _ in range(3):
+        await buyer.pause()
+        reply = await buyer.say("what's your best price?")
+        if reply is None:
+            return False
+    await buyer.pause()
+    reply = await buyer.say(f"alright {buyer.price:g}")
+    return bool(reply and reply["deal_closed"])
+
+
+async def double_tapper(buyer: Buyer) -> bool:
+    offer = random.randint(330, 370)
+    for _ in range(4):
+        await buyer.pause()
+        reply = await buyer.say(f"can you do {offer}", times=2)
+        if reply is None or reply["deal_closed"]:
+            return bool(reply and reply["deal_closed"])
+        offer = min(offer + 10, int(buyer.price))
+    await buyer.pause()
+    reply = await buyer.say(f"fine {buyer.price:g}", times=2)
+    return bool(reply and reply["deal_closed"])
+
+
+PERSONAS = {
+    "lowballer": lowballer,
+    "quick_closer": quick_closer,
+    "best_price": best_price,
+    "double_tapper": double_tapper,
+}
+
+
+def parse_personas(spec: str) -> dict:
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in PERSONAS:
+            raise SystemExit(f"Unknown persona {name!r} (choose from {', '.join(PERSONAS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def scrape_counters(client) -> dict:
+    try:
+        text = (await client.get("/metrics")).text
+    except httpx.HTTPError:
+        return {}
+    values = {}
+    for line in text.splitlines():
+        name, _, value = line.rpartition(" ")
+        for key, series in SERVER_COUNTERS.items():
+            if name == series:
+                values[key] = float(value)
+    return values
+
+
+async def run(base_url: str, args) -> dict:
+    weights = parse_personas(args.personas)
+    recorder = Recorder()
+    conversations = {name: {"started": 0, "deals": 0} for name in weights}
+    deadline = time.monotonic() + args.ramp_up + args.duration
+
+    async def buyer_loop(client, delay: float):
+        await asyncio.sleep(delay)
+        buyer = Buyer(client, recorder, args.think_time)
+        while time.monotonic() < deadline:
+            persona = random.choices(list(weights), weights=list(weights.values()))[0]
+            conversations[persona]["started"] += 1
+            if await buyer.negotiate(persona):
+                conversations[persona]["deals"] += 1
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    # Only /api/chat reads it (see deadline.py)
+    headers = {"X-Turn-Budget": str(args.turn_budget)} if args.turn_budget else None
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout, headers=headers) as client:
+        before = await scrape_counters(client)
+        started = time.perf_counter()
+        # Buyers finish their current conversation after the deadline, so the tail is drained
+        await asyncio.gather(*(
+            buyer_loop(client, args.ramp_up * i / args.buyers) for i in range(args.buyers)
+        ))
+        elapsed = time.perf_counter() - started
+        after = await scrape_counters(client)
+
+    endpoints = {}
+    total_requests = 0
+    for endpoint, samples in sorted(recorder.latencies.items()):
+        samples.sort()
+        total_requests += len(samples)
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed,
+            "errors": recorder.errors[endpoint],
+            "error_rate": recorder.errors[endpoint] / len(samples),
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+            "max_ms": samples[-1] * 1000,
+        }
+    server = {key: after[key] - before.get(key, 0) for key in after}
+    for key in ("commits", "deals_closed"):
+        if key in server:
+            server[f"{key}_per_second"] = server[key] / elapsed
+
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        "elapsed_seconds": elapsed,
+        "requests": total_requests,
+        "rps": total_requests / elapsed,
+        "errors": sum(recorder.errors.values()),
+        "error_kinds": dict(recorder.error_kinds),
+        "endpoints": endpoints,
+        "conversations": conversations,
+        "server": server,
+    }
+
+
+def print_report(result: dict):
+    print(f"\n[*] {result['requests']} requests in {result['elapsed_seconds']:.1f}s  "
+          f"({result['rps']:.1f} req/s, {result['errors']} errors)\n")
+    print(f"  {'endpoint':<26}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>9}")
+    for endpoint, s in result["endpoints"].items():
+        print(f"  {endpoint:<26}{s['rps']:9.1f}{s['p50_ms']:8.0f}ms{s['p95_ms']:7.0f}ms"
+              f"{s['p99_ms']:7.0f}ms{s['error_rate']:8.1%}")
+    if result["error_kinds"]:
+        print("\n  errors: " + ", ".join(f"{k} x{v}" for k, v in result["error_kinds"].items()))
+
+    print(f"\n  {'persona':<26}{'convos':>9}{'deals':>9}")
+    for persona, c in result["conversations"].items():
+        print(f"  {persona:<26}{c['started']:9}{c['deals']:9}")
+
+    server = result["server"]
+    if server:
+        print(f"\n  server: {server.get('commits', 0):.0f} commits "
+              f"({server.get('commits_per_second', 0):.1f}/s), "
+              f"{server.get('deals_closed', 0):.0f} deals closed, "
+              f"LLM errors intent/reply {server.get('llm_errors_intent', 0):.0f}/"
+              f"{server.get('llm_errors_reply', 0):.0f}")
+        replies = sum(server.get(f"replies_{source}", 0) for source in ("llm", "template", "cache"))
+        if replies:
+            print(f"  replies without an LLM call: {server.get('replies_template', 0) / replies:.1%} templates, "
+                  f"{server.get('replies_cache', 0) / replies:.1%} reply cache (of {replies:.0f})")
+        speculated = server.get("speculation_hits", 0) + server.get("speculation_misses", 0)
+        if speculated:
+            hits = server.get("speculation_hits", 0)
+            print(f"  speculative replies: {hits / speculated:.1%} used ({hits:.0f} of {speculated:.0f}), "
+                  f"{server.get('speculation_saved_seconds', 0) / max(hits, 1) * 1e3:.0f}ms saved per hit")
+        downgrades = server.get("deadline_downgrades_intent", 0) + server.get("deadline_downgrades_reply", 0)
+        if downgrades or server.get("deadline_exceeded"):
+            print(f"  deadline: intent/reply downgraded {server.get('deadline_downgrades_intent', 0):.0f}/"
+                  f"{server.get('deadline_downgrades_reply', 0):.0f}, "
+                  f"{server.get('deadline_exceeded', 0):.0f} turns past their deadline")
+
+
+def print_comparison(result: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n[*] Compared with {baseline_path} ({baseline['started_at']})\n")
+    print(f"  {'endpoint':<26}{'req/s':>22}{'p95':>26}{'p99':>26}")
+
+    def delta(new, old, unit="", digits=0):
+        change = f"{(new - old) / old:+.0%}" if old else "n/a"
+        return f"{old:.{digits}f}{unit} -> {new:.{digits}f}{unit} ({change})"
+
+    rows = [("total", result, baseline)] + [
+        (name, s, baseline["endpoints"].get(name)) for name, s in result["endpoints"].items()
+    ]
+    for name, new, old in rows:
+        if not old:
+            continue
+        p95 = delta(new["p95_ms"], old["p95_ms"], "ms") if "p95_ms" in new else ""
+        p99 = delta(new["p99_ms"], old["p99_ms"], "ms") if "p99_ms" in new else ""
+        print(f"  {name:<26}{delta(new['rps'], old['rps'], digits=1):>22}{p95:>26}{p99:>26}")
+
+
+def start_processes(args, env):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    mock = subprocess.Popen(
+        [sys.executable, "mock_llm.py", "--port", str(args.mock_port),
+         "--intent-latency", str(args.intent_latency), "--reply-latency", str(args.reply_latency),
+         "--error-rate", str(args.llm_error_rate)],
+        cwd=cwd, env=env
+    )
+    env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+         "--workers", str(args.workers), "--bind", f"127.0.0.1:{args.port}",
+         "--log-level", "warning", "--backlog", "4096"],
+        cwd=cwd, env=env
+    )
+    return [server, mock]
+
+
+async def wait_until_ready(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scripted-buyer load test for /api/chat")
+    parser.add_argument("--buyers", type=int, default=1000, help="Concurrent buyers")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Seconds to start all buyers")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds between messages")
+    parser.add_argument("--personas", default=DEFAULT_PERSONAS,
+                        help="Weights, e.g. lowballer=3,quick_closer=1")
+    parser.add_argument("--connections", type=int, default=256, help="Client connection pool size")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--turn-budget", type=float, default=None,
+                        help="Seconds each chat turn may take (X-Turn-Budget; default: the server's TURN_BUDGET_SECONDS)")
+    parser.add_argument("--url", default=None,
+                        help="Test a running API (its OPENAI_BASE_URL must point at mock_llm.py)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--mock-port", type=int, default=8199)
+    parser.add_argument("--intent-latency", type=float, default=0.4)
+    parser.add_argument("--reply-latency", type=float, default=1.2)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--use-env-db", action="store_true")
+    parser.add_argument("--out", default=None, help=f"Results file (default {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    processes = []
+    base_url = args.url
+    if not base_url:
+        env = dict(os.environ)
+        env.setdefault("OPENAI_API_KEY", "loadtest")
+        if not args.use_env_db:
+            env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+        env.pop("SKIP_INIT_DB", None)
+        # Every simulated client shares one IP
+        env.setdefault("RATE_LIMIT_BACKEND", "off")
+        processes = start_processes(args, env)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    print(f"[*] {args.buyers} buyers, {args.ramp_up:.0f}s ramp-up + {args.duration:.0f}s "
+          f"against {base_url}  (personas {args.personas})")
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        result = asyncio.run(run(base_url, args))
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait(timeout=60)
+
+    print_report(result)
+
+    out = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n[INFO] Results saved to {out}")
+
+    if args.compare:
+        print_comparison(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,91 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse, ORJSONResponse
 from pydantic import BaseModel, EmailStr
+from brotli_asgi import BrotliMiddleware
 from typing import Optional, List
 from datetime import datetime
+import asyncio
+import json
+import math
 import os
+import tempfile
+import time
 from dotenv import load_dotenv
-from contextlib import asynccontextmanager
-
-from database import init_db, get_db
-from models import ConversationMessage, WaitlistEntry, ChatSession
-from negotiation_engine import NegotiationEngine
+from contextlib import asynccontextmanager, nullcontext
+from sqlalchemy import func
+
+from deadline import Deadline, current_deadline, limit_statements, turn_budget
+from database import init_db, get_db, get_read_db, engine, dialect_insert, SKIP_INIT_DB
+from models import ConversationMessage, WaitlistEntry, ChatSession, ConversationArchive, Product
+from negotiation_engine import ladder_range_error, require_api_key, shared_client
+from catalog import catalog
+from events import event_bus, publish, message_preview, encode_sse, encode_sse_position, ADMIN_EVENTS_STREAM_SECONDS
+from exports import stream_export, MEDIA_TYPES
+from archive import load_messages
+from message_writer import message_writer
+from metrics import (
+    CHAT_TURN_CONFLICTS, CHAT_TURN_SECONDS, CHAT_TURNS_IN_FLIGHT, DEALS_CLOSED, RATE_LIMITED, STAGE_COMMIT,
+    STAGE_HISTORY_LOAD, STAGE_SESSION_LOOKUP, CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics, watch_pool
+)
+from profiling import (
+    ADMIN_COOKIE, ADMIN_COOKIE_PATH, ADMIN_SESSION_SECONDS, RequestProfiler, admin_cookie_value,
+    list_profiles, profile_name, profile_path, require_admin, should_profile
+)
+from partitions import MESSAGE_PARTITIONING, message_time_filter, maintain as maintain_partitions
+from rate_limit import rate_limiter, client_ip
+from reply_templates import template_reply
+from response_cache import response_cache, LEADERBOARD_KEY, SESSION_STATS_KEY
+from static_assets import static_asset
+from tracing import start_trace, span, current_trace_id, new_id, shutdown as shutdown_tracing
+from waitlist import add_signup
+from waitlist_import import import_binary_file
 
 load_dotenv()
 
 # Initialize database on startup using lifespan
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    init_db()
+    # Startup (under gunicorn the master already did this once for all workers)
+    if not SKIP_INIT_DB:
+        init_db()
+        if MESSAGE_PARTITIONING:
+            maintain_partitions(engine)
+    if message_writer:
+        await message_writer.start()
+    # Import openai / build the client off the startup path - the server is
+    # already accepting requests while this runs
+    warm_ups = [
+        asyncio.create_task(asyncio.to_thread(shared_client, OPENAI_API_KEY)),
+        asyncio.create_task(asyncio.to_thread(catalog.warm)),
+    ]
     yield
-    # Shutdown (if needed)
-
-app = FastAPI(title="Nego Challenge API", lifespan=lifespan)
+    # Threads can't be interrupted: let a warm-up still running finish, and report
+    # failures (harmless - the client and catalog are also loaded on first use)
+    for result in await asyncio.gather(*warm_ups, return_exceptions=True):
+        if isinstance(result, Exception):
+            print(f"⚠️  Warm-up failed: {result}")
+    event_bus.stop()
+    # Shutdown - flush buffered messages so nothing is lost on redeploy
+    if message_writer:
+        await message_writer.stop()
+    shutdown_tracing()
+
+watch_pool(engine)
+
+# orjson encodes responses several times faster than the stdlib json encoder
+app = FastAPI(title="Nego Challenge API", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Compress responses larger than COMPRESSION_MIN_SIZE bytes (brotli, gzip fallback).
+# The admin event stream is excluded: compressors buffer, which would delay events.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+app.add_middleware(
+    BrotliMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_fallback=True,
+    excluded_handlers=[r"^/api/admin/events$"]
+)
 
 # CORS middleware - Allow all origins in production for Railway deployment
 # In production, you can restrict this to your frontend domain
@@ -50,6 +113,7 @@ class ChatMessage(BaseModel):
     session_id: str
     user_message: str
     referred_by: Optional[str] = None  # Challenge referral code
+    product: Optional[str] = None  # Product slug for new sessions (default product when omitted)
 
 class ChatResponse(BaseModel):
     ai_message: str
@@ -66,45 +130,21 @@ class ConversationHistory(BaseModel):
     deal_closed: bool
     final_price: Optional[float] = None
 
-# Product configuration
-PRODUCT_CONFIG = {
-    "name": "Premium Apple Watch",
-    "starting_price": 450,
-    "minimum_price": 380,  # Won't go below this
-    "cost_price": 350,  # AI knows this internally
-    "features": [
-        "Original Apple Watch",
-        "Excellent condition",
-        "Full warranty coverage",
-        "All accessories included",
-        "Latest software updates"
-    ]
-}
-
-# Bra Alex Opening Messages - randomly selected for each session
-OPENING_MESSAGES = [
-    "Welcome! I'm Bra Alex. See this Premium Apple Watch? Original, top condition, everything included. The price is 450 GHS. Should I wrap it for you? 😉",
-    
-    "Hey there! Bra Alex here. I was just checking this Premium Apple Watch - it's the original one, 450 GHS. Ready to make an offer?",
-    
-    "Perfect timing! I'm Bra Alex, and this Apple Watch is moving fast. 450 GHS, full accessories. I have another buyer asking, but you're here first. Interested?",
-    
-    "Welcome! They call me Bra Alex, the best negotiator around. This Apple Watch is 450 GHS, but I have a feeling you're going to try and outsmart me. Let's see what you've got! 😄",
-    
-    "Bra Alex here. Simple deal: one Premium Apple Watch, original, excellent condition, 450 GHS. What can you offer?",
-    
-    "Greetings! I'm Bra Alex. Before you ask - yes, original. Yes, full warranty. Yes, all accessories included. My starting price is 450 GHS. Ready to negotiate?",
-    
-    "You know, someone tried to sell me a fake one last week. But this? This is the real deal. I'm Bra Alex, 450 GHS for this Premium Apple Watch. Think you can convince me otherwise? 😂",
-    
-    "Welcome! I see you have good taste. This Premium Apple Watch will look amazing. My price is 450 GHS. So, MoMo or card?",
-    
-    "Bra Alex at your service. Quick question: are you looking for the best quality Apple Watch in town? Because you just found it. 450 GHS - let's make a deal.",
-    
-    "Hey! Bra Alex here. This Premium Apple Watch is 450 GHS, comes with everything. Let's find a price that works for both of us!"
-]
-
-negotiation_engine = NegotiationEngine(PRODUCT_CONFIG)
+class ProductConfig(BaseModel):
+    slug: str
+    name: str
+    starting_price: float
+    floor_price: float
+    session_minimum_low: float
+    session_minimum_high: float
+    cost_price: Optional[float] = None
+    features: List[str] = []
+    opening_messages: List[str] = []  # Generated from catalog.OPENING_TEMPLATES when empty
+    active: bool = True
+
+# Products and their opening messages live in the products table (see catalog.py).
+# Checked here so a missing key fails the deploy instead of the first chat turn.
+OPENAI_API_KEY = require_api_key()
 
 # ==================== ENDPOINTS ====================
 
@@ -121,357 +161,20 @@ async def root():
         }
     }
 
-@app.get("/admin", response_class=HTMLResponse)
-async def admin_dashboard():
-    from fastapi.responses import HTMLResponse
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Nego Challenge Admin</title>
-        <style>
-            * { margin: 0; padding: 0; box-sizing: border-box; }
-            body {
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-                background: #f5f5f5;
-                padding: 20px;
-            }
-            .container { max-width: 1400px; margin: 0 auto; }
-            h1 { color: #333; margin-bottom: 30px; }
-            .tabs {
-                display: flex;
-                gap: 10px;
-                margin-bottom: 20px;
-                border-bottom: 2px solid #ddd;
-            }
-            .tab {
-                padding: 12px 24px;
-                background: white;
-                border: none;
-                cursor: pointer;
-                font-size: 16px;
-                border-radius: 8px 8px 0 0;
-                transition: all 0.3s;
-            }
-            .tab.active {
-                background: #6366f1;
-                color: white;
-            }
-            .tab-content { display: none; }
-            .tab-content.active { display: block; }
-            .stats {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 20px;
-                margin-bottom: 30px;
-            }
-            .stat-card {
-                background: white;
-                padding: 20px;
-                border-radius: 12px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            }
-            .stat-value {
-                font-size: 32px;
-                font-weight: bold;
-                color: #6366f1;
-                margin-bottom: 5px;
-            }
-            .stat-label {
-                color: #666;
-                font-size: 14px;
-            }
-            .card {
-                background: white;
-                border-radius: 12px;
-                padding: 20px;
-                margin-bottom: 20px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            }
-            .card h3 {
-                margin-bottom: 15px;
-                color: #333;
-            }
-            table {
-                width: 100%;
-                border-collapse: collapse;
-            }
-            th, td {
-                padding: 12px;
-                text-align: left;
-                border-bottom: 1px solid #eee;
-            }
-            th {
-                background: #f8f9fa;
-                font-weight: 600;
-                color: #666;
-            }
-            .badge {
-                padding: 4px 12px;
-                border-radius: 20px;
-                font-size: 12px;
-                font-weight: 500;
-            }
-            .badge.success { background: #d1fae5; color: #065f46; }
-            .badge.pending { background: #fef3c7; color: #92400e; }
-            .message {
-                padding: 10px 15px;
-                border-radius: 8px;
-                margin: 8px 0;
-                max-width: 80%;
-            }
-            .message.user {
-                background: #6366f1;
-                color: white;
-                margin-left: auto;
-            }
-            .message.assistant {
-                background: #f1f5f9;
-                color: #333;
-            }
-            .conversation {
-                max-height: 400px;
-                overflow-y: auto;
-                padding: 10px;
-                background: #fafafa;
-                border-radius: 8px;
-            }
-            .session-card {
-                border: 1px solid #e5e7eb;
-                border-radius: 8px;
-                padding: 15px;
-                margin-bottom: 15px;
-                cursor: pointer;
-                transition: all 0.3s;
-            }
-            .session-card:hover {
-                box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-                transform: translateY(-2px);
-            }
-            .session-header {
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                margin-bottom: 10px;
-            }
-            .btn {
-                padding: 8px 16px;
-                background: #6366f1;
-                color: white;
-                border: none;
-                border-radius: 6px;
-                cursor: pointer;
-                font-size: 14px;
-            }
-            .btn:hover { background: #4f46e5; }
-            .loading { text-align: center; padding: 40px; color: #666; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🎯 Nego Challenge Admin Dashboard</h1>
-            
-            <div class="stats" id="stats">
-                <div class="stat-card">
-                    <div class="stat-value" id="totalSessions">-</div>
-                    <div class="stat-label">Total Sessions</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value" id="closedDeals">-</div>
-                    <div class="stat-label">Deals Closed</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value" id="conversionRate">-</div>
-                    <div class="stat-label">Conversion Rate</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value" id="avgPrice">-</div>
-                    <div class="stat-label">Avg Final Price (GHS)</div>
-                </div>
-                <div class="stat-card">
-                    <div class="stat-value" id="waitlistCount">-</div>
-                    <div class="stat-label">Waitlist Signups</div>
-                </div>
-            </div>
-
-            <div class="tabs">
-                <button class="tab active" onclick="showTab('conversations')">💬 Conversations</button>
-                <button class="tab" onclick="showTab('waitlist')">📧 Waitlist</button>
-            </div>
-
-            <div id="conversations-tab" class="tab-content active">
-                <div class="card">
-                    <h3>Recent Conversations</h3>
-                    <div id="sessionsContainer" class="loading">Loading conversations...</div>
-                </div>
-            </div>
-
-            <div id="waitlist-tab" class="tab-content">
-                <div class="card">
-                    <h3>Waitlist Signups</h3>
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>Type</th>
-                                <th>Contact</th>
-                                <th>Source</th>
-                                <th>Signed Up</th>
-                            </tr>
-                        </thead>
-                        <tbody id="waitlistTable">
-                            <tr><td colspan="4" class="loading">Loading waitlist...</td></tr>
-                        </tbody>
-                    </table>
-                </div>
-            </div>
-        </div>
-
-        <script>
-            const API_URL = window.location.origin;
-            
-            function showTab(tabName) {
-                document.querySelectorAll('.tab').forEach(t => t.classList.remove('active'));
-                document.querySelectorAll('.tab-content').forEach(t => t.classList.remove('active'));
-                event.target.classList.add('active');
-                document.getElementById(tabName + '-tab').classList.add('active');
-            }
-
-            async function loadStats() {
-                try {
-                    const [sessionsRes, waitlistRes] = await Promise.all([
-                        fetch(API_URL + '/api/sessions/stats'),
-                        fetch(API_URL + '/api/waitlist/count')
-                    ]);
-                    
-                    const sessions = await sessionsRes.json();
-                    const waitlist = await waitlistRes.json();
-                    
-                    document.getElementById('totalSessions').textContent = sessions.total_sessions;
-                    document.getElementById('closedDeals').textContent = sessions.closed_deals;
-                    document.getElementById('conversionRate').textContent = sessions.conversion_rate;
-                    document.getElementById('avgPrice').textContent = sessions.average_final_price.toFixed(0);
-                    document.getElementById('waitlistCount').textContent = waitlist.count;
-                } catch (error) {
-                    console.error('Error loading stats:', error);
-                }
-            }
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
-            async function loadSessions() {
-                try {
-                    const res = await fetch(API_URL + '/api/sessions/all');
-                    const sessions = await res.json();
-                    
-                    const container = document.getElementById('sessionsContainer');
-                    
-                    if (sessions.length === 0) {
-                        container.innerHTML = '<p class="loading">No conversations yet</p>';
-                        return;
-                    }
-                    
-                    container.innerHTML = sessions.map(session => `
-                        <div class="session-card" onclick="toggleConversation('${session.session_id}')">
-                            <div class="session-header">
-                                <div>
-                                    <strong>${session.product_name}</strong>
-                                    <br><small style="color: #666;">${new Date(session.created_at).toLocaleString()}</small>
-                                </div>
-                                <div>
-                                    ${session.deal_closed 
-                                        ? `<span class="badge success">✓ Deal: ${session.final_price} GHS</span>` 
-                                        : `<span class="badge pending">Ongoing</span>`
-                                    }
-                                </div>
-                            </div>
-                            <div style="font-size: 12px; color: #666; margin-top: 8px;">
-                                Starting: ${session.starting_price} GHS | 
-                                Min: ${session.minimum_price} GHS | 
-                                Messages: ${session.message_count || 0}
-                            </div>
-                            <div id="conv-${session.session_id}" style="display: none; margin-top: 15px;">
-                                <div class="loading">Loading messages...</div>
-                            </div>
-                        </div>
-                    `).join('');
-                } catch (error) {
-                    console.error('Error loading sessions:', error);
-                    document.getElementById('sessionsContainer').innerHTML = 
-                        '<p class="loading" style="color: red;">Error loading conversations</p>';
-                }
-            }
-
-            async function toggleConversation(sessionId) {
-                const div = document.getElementById('conv-' + sessionId);
-                
-                if (div.style.display === 'none') {
-                    div.style.display = 'block';
-                    
-                    try {
-                        const res = await fetch(API_URL + '/api/sessions/' + sessionId);
-                        const data = await res.json();
-                        
-                        div.innerHTML = '<div class="conversation">' + 
-                            data.messages.map(msg => `
-                                <div class="message ${msg.role}">
-                                    <strong>${msg.role === 'user' ? 'Customer' : 'Bra Alex (AI)'}</strong>
-                                    <div>${msg.content}</div>
-                                    <small style="opacity: 0.7; font-size: 11px;">
-                                        ${new Date(msg.timestamp).toLocaleTimeString()}
-                                    </small>
-                                </div>
-                            `).join('') + 
-                        '</div>';
-                    } catch (error) {
-                        div.innerHTML = '<p style="color: red;">Error loading messages</p>';
-                    }
-                } else {
-                    div.style.display = 'none';
-                }
-            }
-
-            async function loadWaitlist() {
-                try {
-                    const res = await fetch(API_URL + '/api/waitlist/all');
-                    const waitlist = await res.json();
-                    
-                    const table = document.getElementById('waitlistTable');
-                    
-                    if (waitlist.length === 0) {
-                        table.innerHTML = '<tr><td colspan="4" class="loading">No signups yet</td></tr>';
-                        return;
-                    }
-                    
-                    table.innerHTML = waitlist.map(entry => `
-                        <tr>
-                            <td><span class="badge ${entry.contact_type === 'email' ? 'success' : 'pending'}">
-                                ${entry.contact_type}
-                            </span></td>
-                            <td>${entry.contact_value}</td>
-                            <td>${entry.source}</td>
-                            <td>${new Date(entry.created_at).toLocaleString()}</td>
-                        </tr>
-                    `).join('');
-                } catch (error) {
-                    console.error('Error loading waitlist:', error);
-                    document.getElementById('waitlistTable').innerHTML = 
-                        '<tr><td colspan="4" style="color: red;">Error loading waitlist</td></tr>';
-                }
-            }
+@app.get("/admin", response_class=HTMLResponse)
+async def admin_dashboard(request: Request):
+    """Admin dashboard (static/admin.html, served precompressed)"""
+    return static_asset("admin.html").respond(request)
 
-            // Load data on page load
-            loadStats();
-            loadSessions();
-            loadWaitlist();
-
-            // Refresh every 10 seconds
-            setInterval(() => {
-                loadStats();
-                loadSessions();
-                loadWaitlist();
-            }, 10000);
-        </script>
-    </body>
-    </html>
-    """
+@app.get("/admin-config.js")
+async def admin_config():
+    """Dashboard config: served from here, the dashboard talks to this origin"""
+    return Response("window.ADMIN_API_URL = null;\n", media_type="application/javascript")
 
 @app.post("/api/waitlist")
 async def add_to_waitlist(signup: WaitlistSignup):
@@ -479,50 +182,18 @@ async def add_to_waitlist(signup: WaitlistSignup):
     db = next(get_db())
     
     try:
-        # Check if already exists
-        existing = db.query(WaitlistEntry).filter(
-            WaitlistEntry.contact_value == signup.contact_value
-        ).first()
-        
-        if existing:
-            return {
-                "success": True,
-                "message": "Already on waitlist",
-                "id": existing.id,
-                "referral_code": existing.referral_code
-            }
-        
-        # Generate unique referral code
-        import random
-        import string
-        referral_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-        
-        # Check if referred by someone
-        if signup.referred_by:
-            referrer = db.query(WaitlistEntry).filter(
-                WaitlistEntry.referral_code == signup.referred_by
-            ).first()
-            if referrer:
-                referrer.referral_count += 1
-                db.add(referrer)
-        
-        # Create new entry
-        entry = WaitlistEntry(
+        entry_id, referral_code, created = add_signup(
+            db,
             contact_type=signup.contact_type,
             contact_value=signup.contact_value,
             source=signup.source,
-            referral_code=referral_code,
-            referred_by=signup.referred_by,
-            referral_count=0
+            referred_by=signup.referred_by
         )
-        db.add(entry)
-        db.commit()
-        db.refresh(entry)
         
         return {
             "success": True,
-            "message": "Added to waitlist successfully",
-            "id": entry.id,
+            "message": "Added to waitlist successfully" if created else "Already on waitlist",
+            "id": entry_id,
             "referral_code": referral_code
         }
     except Exception as e:
@@ -531,163 +202,325 @@ async def add_to_waitlist(signup: WaitlistSignup):
     finally:
         db.close()
 
+@app.post("/api/waitlist/import")
+async def import_waitlist(request: Request, format: str = "csv", source: str = "import"):
+    """Bulk import a CSV or NDJSON request body into the waitlist (X-Admin-Token required)"""
+    require_admin(request)
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    
+    # Spool the upload (memory up to 1 MB, then disk) so large files don't sit in RAM
+    upload = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    try:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        
+        db = next(get_db())
+        try:
+            return await run_in_threadpool(import_binary_file, db, upload, format, source)
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            db.close()
+    finally:
+        upload.close()
+
+# A turn whose compare-and-set loses to a concurrent turn on the same session
+# starts over from the fresh state; after this many attempts it gets a 409
+CHAT_TURN_ATTEMPTS = 2
+
+class TurnConflict(Exception):
+    """Another turn on the same session committed while this one was negotiating"""
+
+def get_chat_session(db, session_id: str) -> Optional[ChatSession]:
+    """
+    Load a chat session. No lock is taken: the turn commits its price/deal
+    update with a compare-and-set on turn_count instead (see negotiate_turn),
+    so nothing is held while the LLM calls run.
+    """
+    return db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
+
+def too_many_requests(denied) -> HTTPException:
+    """The 429 for a rate_limiter (scope, retry_after) denial"""
+    scope, retry_after = denied
+    RATE_LIMITED.labels(scope).inc()
+    return HTTPException(
+        status_code=429,
+        detail=f"Too many messages ({scope} limit) - please slow down",
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(message: ChatMessage):
+async def chat(message: ChatMessage, request: Request, response: Response):
     """Handle chat negotiation with LLM"""
+    # The turn's time budget, counted from here (see deadline.py)
+    deadline = Deadline(turn_budget(request.headers.get("x-turn-budget")))
+    # Checked before any DB or LLM work - a rejected request costs a dict lookup
+    if rate_limiter.enabled:
+        denied = rate_limiter.check(client_ip(request), message.session_id)
+        if denied:
+            raise too_many_requests(denied)
+    # Clients/proxies may send their own X-Request-ID; it is echoed back either way
+    request_id = request.headers.get("x-request-id") or new_id(8)
+    response.headers["X-Request-ID"] = request_id
+    profiler = nullcontext()
+    if should_profile(request):
+        profiler = RequestProfiler(profile_name(request_id))
+        response.headers["X-Profile-ID"] = profiler.name
+    with start_trace("chat_turn", request_id=request_id, session_id=message.session_id) as root, profiler, deadline:
+        root.set("deadline_seconds", deadline.budget)
+        trace_id = current_trace_id()
+        if trace_id:
+            response.headers["X-Trace-ID"] = trace_id
+        try:
+            result = await chat_turn(message)
+        finally:
+            if deadline.budget:
+                root.set("deadline_left", round(deadline.remaining(), 3))
+            if deadline.downgraded:
+                root.set("downgraded", ",".join(deadline.downgraded))
+        root.set("deal_closed", result.deal_closed)
+        return result
+
+async def chat_turn(message: ChatMessage) -> ChatResponse:
+    """One negotiation turn (runs inside the request's root span)"""
+    started = time.perf_counter()
+    CHAT_TURNS_IN_FLIGHT.inc()
     db = next(get_db())
     
     try:
-        # Get or create session
-        session = db.query(ChatSession).filter(
-            ChatSession.session_id == message.session_id
-        ).first()
+        for _ in range(CHAT_TURN_ATTEMPTS):
+            try:
+                return await negotiate_turn(db, message)
+            except TurnConflict:
+                db.rollback()
+                CHAT_TURN_CONFLICTS.inc()
+        raise HTTPException(
+            status_code=409,
+            detail="This conversation changed while you were negotiating - please send your message again"
+        )
+        
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        if current_deadline().expired:
+            # e.g. statement_timeout while waiting for the session's row lock
+            raise HTTPException(status_code=504, detail="This turn ran out of time - please try again")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        db.close()
+        CHAT_TURNS_IN_FLIGHT.dec()
+        CHAT_TURN_SECONDS.observe(time.perf_counter() - started)
+
+async def negotiate_turn(db, message: ChatMessage) -> ChatResponse:
+    """
+    Read the session and its history, commit, negotiate, then write the turn.
+    The read transaction ends before the LLM calls, so a turn holds neither a
+    row lock nor a pooled connection while it waits on OpenAI. The final write
+    only applies if the session's turn_count is still the one that was read;
+    otherwise it raises TurnConflict and chat_turn() starts over.
+    """
+    started = time.perf_counter()
+    # Get or create session. With several workers the same session_id can arrive
+    # at two of them at once: the insert is a no-op for the loser, which then
+    # reads the winner's row (and its random minimum price).
+    with span("db.session_lookup"):
+        limit_statements(db)
+        session = get_chat_session(db, message.session_id)
         
         if not session:
-            # Generate random minimum price between 350-390 for this session
+            if message.product:
+                product = catalog.by_slug(db, message.product)
+                if product is None:
+                    raise HTTPException(status_code=404, detail=f"Unknown product '{message.product}'")
+            else:
+                product = catalog.default(db)
+            # The share-code limit counts sessions brought in by a code, not their turns
+            if rate_limiter.enabled and message.referred_by:
+                denied = rate_limiter.check_new_session(message.referred_by)
+                if denied:
+                    raise too_many_requests(denied)
+            # Random minimum price for this session, within the product's range
             import random
             import string
-            random_minimum = random.randint(350, 390)
-            
+            random_minimum = product.session_minimum()
+        
             # Generate unique share code for this challenge participant
             share_code = 'NEGO' + ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            
-            session = ChatSession(
-                session_id=message.session_id,
-                product_name=PRODUCT_CONFIG["name"],
-                starting_price=PRODUCT_CONFIG["starting_price"],
-                current_price=PRODUCT_CONFIG["starting_price"],
-                minimum_price=random_minimum,
-                referral_code=share_code,
-                referred_by=message.referred_by
-            )
-            db.add(session)
-            db.commit()
-            db.refresh(session)
-            
-            # Track referral if someone referred them
-            if message.referred_by:
-                referrer_session = db.query(ChatSession).filter(
-                    ChatSession.referral_code == message.referred_by
-                ).first()
-                # Referrer gets points for bringing them in
-        
-        # Check if this is initialization greeting request
-        if message.user_message == "INIT_GREETING":
-            # Return random opening message
-            import random
-            opening = random.choice(OPENING_MESSAGES)
-            return ChatResponse(
-                ai_message=opening,
-                deal_closed=False,
-                is_first_message=True
-            )
-        
-        # Check if deal already closed
-        if session.deal_closed:
-            return ChatResponse(
-                ai_message="We already made a deal! Are you trying to renegotiate? 😄",
-                deal_closed=True,
-                final_price=session.final_price
-            )
         
-        # Store user message (unless it's initialization)
-        if message.user_message != "INIT_GREETING":
-            user_msg = ConversationMessage(
-                session_id=session.id,
-                role="user",
-                content=message.user_message
-            )
-            db.add(user_msg)
+            created = db.execute(
+                dialect_insert(db, ChatSession).values(
+                    session_id=message.session_id,
+                    product_id=product.id,
+                    product_name=product.name,
+                    starting_price=product.starting_price,
+                    current_price=product.starting_price,
+                    minimum_price=random_minimum,
+                    referral_code=share_code,
+                    referred_by=message.referred_by
+                ).on_conflict_do_nothing(index_elements=["session_id"])
+            ).rowcount
+            if created:
+                publish(db, "session_created", {
+                    "session_id": message.session_id,
+                    "product_name": product.name,
+                    "starting_price": product.starting_price,
+                    "minimum_price": random_minimum,
+                    "created_at": datetime.utcnow().isoformat()
+                })
             db.commit()
+            session = get_chat_session(db, message.session_id)
         
-        # Get conversation history
-        history = db.query(ConversationMessage).filter(
-            ConversationMessage.session_id == session.id
-        ).order_by(ConversationMessage.timestamp).all()
-        
-        conversation_context = [
-            {"role": msg.role, "content": msg.content} 
-            for msg in history
-        ]
-        
-        # Generate AI response using negotiation engine with session's random minimum
-        result = await negotiation_engine.negotiate(
+            # Track referral if someone referred them
+            if created and message.referred_by:
+                # Referrer gets points for bringing them in
+                response_cache.invalidate(LEADERBOARD_KEY)
+        # The session's product from the in-memory catalog (config, engine, openings)
+        product = catalog.get(db, session.product_id)
+        STAGE_SESSION_LOOKUP.observe(time.perf_counter() - started)
+    
+    # Check if this is initialization greeting request
+    if message.user_message == "INIT_GREETING":
+        # Return random opening message
+        return ChatResponse(
+            ai_message=product.opening_message(),
+            deal_closed=False,
+            is_first_message=True
+        )
+    
+    # Check if deal already closed
+    if session.deal_closed:
+        return ChatResponse(
+            ai_message=template_reply("deal_closed", price=session.final_price)
+            or "We already made a deal! Are you trying to renegotiate? 😄",
+            deal_closed=True,
+            final_price=session.final_price
+        )
+    
+    # The user message is stored with the rest of the turn; its timestamp is when it arrived
+    received_at = datetime.utcnow()
+    
+    # Get conversation history (hot table plus any archived messages)
+    with STAGE_HISTORY_LOAD.time(), span("db.history_load") as history_span:
+        history = load_messages(db, session)
+        history_span.set("messages", len(history))
+    session_pk, turn_count, share_code = session.id, session.turn_count, session.referral_code
+    current_price, minimum_price = session.current_price, session.minimum_price
+    # End the read transaction: the connection goes back to the pool for the LLM calls
+    db.commit()
+    
+    conversation_context = [
+        {"role": msg["role"], "content": msg["content"]} 
+        for msg in history
+    ] + [{"role": "user", "content": message.user_message}]
+    
+    # Generate AI response using negotiation engine with session's random minimum
+    with span("engine.negotiate", product=product.slug):
+        result = await product.engine.negotiate(
             user_message=message.user_message,
             conversation_history=conversation_context,
-            current_price=session.current_price,
-            minimum_price=session.minimum_price
-        )
-        
-        # Store AI message
-        ai_msg = ConversationMessage(
-            session_id=session.id,
-            role="assistant",
-            content=result["message"]
+            current_price=current_price,
+            minimum_price=minimum_price
         )
-        db.add(ai_msg)
-        
-        # Update session with HARD FLOOR ENFORCEMENT
-        ABSOLUTE_MINIMUM = 350.0  # NEVER go below this price
+    
+    # Update session with HARD FLOOR ENFORCEMENT
+    ABSOLUTE_MINIMUM = product.floor_price  # NEVER go below this price
+    update = {"turn_count": turn_count + 1}
+    
+    if result["deal_closed"]:
+        # FINAL SAFETY CHECK: Ensure final price is never below the product's floor
+        final_price = result["final_price"]
+        if final_price < ABSOLUTE_MINIMUM:
+            # REJECT - Don't close the deal if price is below floor
+            result["deal_closed"] = False
+            result["message"] = f"Sorry, I can't close at that price. My absolute lowest is {ABSOLUTE_MINIMUM + 10} GHS for this quality product. Can you work with that?"
+        else:
+            update.update(
+                deal_closed=True,
+                final_price=final_price,
+                discount_percentage=result.get("discount_percentage"),
+                ended_at=datetime.utcnow()
+            )
+    elif result.get("new_price"):
+        # Ensure new price never goes below floor
+        update["current_price"] = max(result["new_price"], ABSOLUTE_MINIMUM)
+    
+    with STAGE_COMMIT.time(), span("db.commit"):
+        limit_statements(db)
+        # Compare-and-set: a no-op when another turn on this session committed since the read
+        applied = db.query(ChatSession).filter(
+            ChatSession.id == session_pk,
+            ChatSession.turn_count == turn_count
+        ).update(update, synchronize_session=False)
+        if not applied:
+            raise TurnConflict()
         
-        if result["deal_closed"]:
-            # FINAL SAFETY CHECK: Ensure final price is never below 350
-            final_price = result["final_price"]
-            if final_price < ABSOLUTE_MINIMUM:
-                # REJECT - Don't close the deal if price is below floor
-                session.deal_closed = False
-                result["deal_closed"] = False
-                result["message"] = f"Sorry, I can't close at that price. My absolute lowest is {ABSOLUTE_MINIMUM + 10} GHS for this quality product. Can you work with that?"
-            else:
-                session.deal_closed = True
-                session.final_price = final_price
-                session.discount_percentage = result.get("discount_percentage")
-                session.ended_at = datetime.utcnow()
-        elif result.get("new_price"):
-            # Ensure new price never goes below floor
-            new_price = max(result["new_price"], ABSOLUTE_MINIMUM)
-            session.current_price = new_price
+        # Store both messages (write-behind: buffered after the commit instead)
+        if not message_writer:
+            db.add_all([
+                ConversationMessage(session_id=session_pk, role="user",
+                                    content=message.user_message, timestamp=received_at),
+                ConversationMessage(session_id=session_pk, role="assistant", content=result["message"])
+            ])
         
+        now = datetime.utcnow().isoformat()
+        for role, content in (("user", message.user_message), ("assistant", result["message"])):
+            publish(db, "message_added", {
+                "session_id": message.session_id,
+                "role": role,
+                "content": message_preview(content),
+                "timestamp": now
+            })
+        if update.get("deal_closed"):
+            publish(db, "deal_closed", {
+                "session_id": message.session_id,
+                "final_price": update["final_price"],
+                "ended_at": update["ended_at"].isoformat()
+            })
         db.commit()
-        
-        return ChatResponse(
-            ai_message=result["message"],
-            deal_closed=result["deal_closed"],
-            final_price=result.get("final_price"),
-            discount_percentage=result.get("discount_percentage"),
-            share_code=session.referral_code  # Return their share code
-        )
-        
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
+    
+    if message_writer:
+        message_writer.enqueue(session_pk, "user", message.user_message, timestamp=received_at)
+        message_writer.enqueue(session_pk, "assistant", result["message"])
+    
+    if update.get("deal_closed"):
+        DEALS_CLOSED.inc()
+        response_cache.invalidate(LEADERBOARD_KEY, SESSION_STATS_KEY)
+    
+    return ChatResponse(
+        ai_message=result["message"],
+        deal_closed=result["deal_closed"],
+        final_price=result.get("final_price"),
+        discount_percentage=result.get("discount_percentage"),
+        share_code=share_code  # Return their share code
+    )
 
 @app.get("/api/waitlist/count")
 async def waitlist_count():
     """Get total waitlist signups"""
-    db = next(get_db())
+    db = next(get_read_db())
     try:
         count = db.query(WaitlistEntry).count()
         return {"count": count}
     finally:
         db.close()
 
-@app.get("/api/sessions/stats")
-async def session_stats():
-    """Get statistics about chat sessions"""
-    db = next(get_db())
+def build_session_stats() -> dict:
+    """Compute session statistics (cached by /api/sessions/stats)"""
+    db = next(get_read_db())
     try:
         total_sessions = db.query(ChatSession).count()
         closed_deals = db.query(ChatSession).filter(
             ChatSession.deal_closed == True
         ).count()
         
-        avg_final_price = db.query(ChatSession).filter(
+        avg_price = db.query(func.avg(ChatSession.final_price)).filter(
             ChatSession.final_price.isnot(None)
-        ).all()
-        
-        avg_price = sum(s.final_price for s in avg_final_price) / len(avg_final_price) if avg_final_price else 0
+        ).scalar() or 0
         
         return {
             "total_sessions": total_sessions,
@@ -698,20 +531,50 @@ async def session_stats():
     finally:
         db.close()
 
+@app.get("/api/sessions/stats")
+async def session_stats(request: Request):
+    """Get statistics about chat sessions"""
+    return response_cache.respond(request, SESSION_STATS_KEY, build_session_stats)
+
+ADMIN_PAGE_MAX = 500
+
 @app.get("/api/sessions/all")
-async def get_all_sessions():
-    """Get all chat sessions with message counts"""
-    db = next(get_db())
+async def get_all_sessions(limit: Optional[int] = None, before_id: Optional[int] = None):
+    """
+    Chat sessions with message counts, newest first.
+    Pass `limit` for one page; the next page is `before_id=<last id received>`.
+    """
+    db = next(get_read_db())
     try:
-        sessions = db.query(ChatSession).order_by(ChatSession.created_at.desc()).all()
+        query = db.query(ChatSession, ConversationArchive.message_count).outerjoin(
+            ConversationArchive, ConversationArchive.session_id == ChatSession.id
+        )
+        if before_id is not None:
+            query = query.filter(ChatSession.id < before_id)
+        query = query.order_by(ChatSession.id.desc())
+        if limit is not None:
+            query = query.limit(max(1, min(limit, ADMIN_PAGE_MAX)))
+        sessions = query.all()
+        if not sessions:
+            return ORJSONResponse([])
+        
+        # Hot message counts for the whole page in one grouped query
+        count_query = db.query(
+            ConversationMessage.session_id, func.count(ConversationMessage.id)
+        )
+        if limit is not None:
+            count_query = count_query.filter(
+                ConversationMessage.session_id.in_([session.id for session, _ in sessions])
+            )
+        if MESSAGE_PARTITIONING:
+            oldest = min((session for session, _ in sessions),
+                         key=lambda session: session.created_at or datetime.min)
+            count_query = count_query.filter(*message_time_filter(oldest))
+        hot_counts = dict(count_query.group_by(ConversationMessage.session_id).all())
         
-        result = []
-        for session in sessions:
-            message_count = db.query(ConversationMessage).filter(
-                ConversationMessage.session_id == session.id
-            ).count()
-            
-            result.append({
+        result = [
+            {
+                "id": session.id,
                 "session_id": session.session_id,
                 "product_name": session.product_name,
                 "starting_price": session.starting_price,
@@ -721,21 +584,33 @@ async def get_all_sessions():
                 "deal_closed": session.deal_closed,
                 "created_at": session.created_at.isoformat(),
                 "ended_at": session.ended_at.isoformat() if session.ended_at else None,
-                "message_count": message_count
-            })
+                "message_count": hot_counts.get(session.id, 0) + (archived_count or 0)
+            }
+            for session, archived_count in sessions
+        ]
         
-        return result
+        # Already JSON-native - skip FastAPI's jsonable_encoder pass
+        return ORJSONResponse(result)
     finally:
         db.close()
 
 @app.get("/api/waitlist/all")
-async def get_all_waitlist():
-    """Get all waitlist entries"""
-    db = next(get_db())
+async def get_all_waitlist(limit: Optional[int] = None, before_id: Optional[int] = None):
+    """
+    Waitlist entries, newest first.
+    Pass `limit` for one page; the next page is `before_id=<last id received>`.
+    """
+    db = next(get_read_db())
     try:
-        entries = db.query(WaitlistEntry).order_by(WaitlistEntry.created_at.desc()).all()
+        query = db.query(WaitlistEntry)
+        if before_id is not None:
+            query = query.filter(WaitlistEntry.id < before_id)
+        query = query.order_by(WaitlistEntry.id.desc())
+        if limit is not None:
+            query = query.limit(max(1, min(limit, ADMIN_PAGE_MAX)))
+        entries = query.all()
         
-        return [
+        return ORJSONResponse([
             {
                 "id": entry.id,
                 "contact_type": entry.contact_type,
@@ -746,10 +621,144 @@ async def get_all_waitlist():
                 "created_at": entry.created_at.isoformat()
             }
             for entry in entries
-        ]
+        ])
     finally:
         db.close()
 
+@app.post("/api/admin/session")
+async def admin_session(request: Request, response: Response):
+    """
+    Trade the X-Admin-Token header for a signed, HttpOnly cookie that only
+    /api/admin/events accepts (EventSource can't send headers)
+    """
+    require_admin(request)
+    secure = request.url.scheme == "https" or request.headers.get("x-forwarded-proto") == "https"
+    response.set_cookie(
+        ADMIN_COOKIE, admin_cookie_value(), max_age=ADMIN_SESSION_SECONDS, path=ADMIN_COOKIE_PATH,
+        httponly=True, samesite="strict", secure=secure
+    )
+    return {"expires_in": ADMIN_SESSION_SECONDS}
+
+@app.get("/api/admin/events")
+async def admin_events(request: Request):
+    """
+    Server-sent events for the admin dashboard: session_created, message_added,
+    deal_closed, waitlist_signup, waitlist_import, and `resync` when this
+    client missed events (X-Admin-Token, or the cookie from /api/admin/session
+    since EventSource can't send headers). A reconnect with Last-Event-ID gets
+    the events it missed.
+    """
+    require_admin(request, allow_cookie=True)
+    subscribed = event_bus.subscribe(request.headers.get("last-event-id"))
+    if subscribed is None:
+        raise HTTPException(status_code=503, detail="Too many admin event clients")
+    subscriber, resume = subscribed
+
+    async def stream():
+        # Streams end after ADMIN_EVENTS_STREAM_SECONDS so they never hold up a
+        # graceful shutdown; EventSource reconnects with Last-Event-ID and resumes
+        deadline = time.monotonic() + ADMIN_EVENTS_STREAM_SECONDS
+        try:
+            yield b"retry: 1000\n\n"
+            if resume.resync:
+                yield encode_sse({"type": "resync", "data": {"dropped": None}})
+            for item in resume.events:
+                yield encode_sse(item)
+            # Where this stream starts, in case it ends before any event
+            yield encode_sse_position(resume.position)
+            reported_drops = 0
+            while time.monotonic() < deadline:
+                batch = await subscriber.next_batch(timeout=min(15, max(0.1, deadline - time.monotonic())))
+                if subscriber.dropped > reported_drops:
+                    reported_drops = subscriber.dropped
+                    yield encode_sse({"type": "resync", "data": {"dropped": reported_drops}})
+                    continue
+                if not batch:
+                    yield b": keepalive\n\n"
+                for item in batch:
+                    yield encode_sse(item)
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.get("/api/admin/profiles")
+async def get_profiles(request: Request):
+    """Stored request profiles, newest first (X-Admin-Token required)"""
+    require_admin(request)
+    return list_profiles()
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request):
+    """One profile in folded-stack format (flamegraph.pl, speedscope, inferno)"""
+    require_admin(request)
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=f"{profile_id}.folded")
+
+@app.post("/api/admin/products")
+async def upsert_product(product: ProductConfig, request: Request):
+    """Create or update a product by slug (X-Admin-Token required)"""
+    require_admin(request)
+    if not (product.floor_price <= product.session_minimum_low <= product.session_minimum_high
+            <= product.starting_price):
+        raise HTTPException(
+            status_code=400,
+            detail="Prices must satisfy floor_price <= session_minimum_low <= session_minimum_high <= starting_price"
+        )
+    ladder_error = ladder_range_error(product.starting_price, product.floor_price)
+    if ladder_error:
+        raise HTTPException(status_code=400, detail=ladder_error)
+    values = product.model_dump()
+    values["features"] = json.dumps(product.features)
+    values["opening_messages"] = json.dumps(product.opening_messages) if product.opening_messages else None
+    values["updated_at"] = datetime.utcnow()  # Other workers' catalogs reload when this changes
+    db = next(get_db())
+    try:
+        insert = dialect_insert(db, Product).values(**values)
+        db.execute(insert.on_conflict_do_update(
+            index_elements=["slug"],
+            set_={key: value for key, value in values.items() if key != "slug"}
+        ))
+        db.commit()
+    finally:
+        db.close()
+    catalog.invalidate()
+    return {"success": True, "slug": product.slug}
+
+def export_response(name: str, format: str, after_id: Optional[int]) -> StreamingResponse:
+    """Build a streaming NDJSON/CSV export response"""
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    return StreamingResponse(
+        stream_export(name, format, after_id=after_id),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'}
+    )
+
+@app.get("/api/waitlist/export")
+def export_waitlist(request: Request, format: str = "ndjson", after_id: Optional[int] = None):
+    """Stream all waitlist entries (resume with after_id=<last id received>; X-Admin-Token required)"""
+    require_admin(request)
+    return export_response("waitlist", format, after_id)
+
+@app.get("/api/sessions/export")
+def export_sessions(request: Request, format: str = "ndjson", after_id: Optional[int] = None):
+    """Stream all chat sessions (resume with after_id=<last id received>; X-Admin-Token required)"""
+    require_admin(request)
+    return export_response("sessions", format, after_id)
+
+@app.get("/api/sessions/messages/export")
+def export_messages(request: Request, format: str = "ndjson", after_id: Optional[int] = None):
+    """Stream all conversation messages (resume with after_id=<last id received>; X-Admin-Token required)"""
+    require_admin(request)
+    return export_response("messages", format, after_id)
+
 @app.get("/api/sessions/{session_id}", response_model=ConversationHistory)
 async def get_session(session_id: str):
     """Get conversation history for a session"""
@@ -763,17 +772,15 @@ async def get_session(session_id: str):
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        messages = db.query(ConversationMessage).filter(
-            ConversationMessage.session_id == session.id
-        ).order_by(ConversationMessage.timestamp).all()
+        messages = load_messages(db, session)
         
         return ConversationHistory(
             session_id=session.session_id,
             messages=[
                 {
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat()
+                    "role": msg["role"],
+                    "content": msg["content"],
+                    "timestamp": msg["timestamp"].isoformat()
                 }
                 for msg in messages
             ],
@@ -784,10 +791,9 @@ async def get_session(session_id: str):
     finally:
         db.close()
 
-@app.get("/api/leaderboard")
-async def get_leaderboard():
-    """Get top negotiators and challenge referrers"""
-    db = next(get_db())
+def build_leaderboard() -> dict:
+    """Compute top negotiators and referrers (cached by /api/leaderboard)"""
+    db = next(get_read_db())
     try:
         # Top negotiators (best discount %)
         top_negotiators = db.query(ChatSession).filter(
@@ -795,29 +801,19 @@ async def get_leaderboard():
             ChatSession.discount_percentage.isnot(None)
         ).order_by(ChatSession.discount_percentage.desc()).limit(10).all()
         
-        # Count referrals for each participant
-        all_sessions = db.query(ChatSession).filter(
-            ChatSession.referral_code.isnot(None)
-        ).all()
+        # Count how many people used each referral code, in one grouped query
+        referral_counts = db.query(
+            ChatSession.referred_by.label("code"),
+            func.count(ChatSession.id).label("count")
+        ).filter(
+            ChatSession.referred_by.isnot(None)
+        ).group_by(ChatSession.referred_by).subquery()
         
-        referral_counts = {}
-        for session in all_sessions:
-            # Count how many people used their referral code
-            count = db.query(ChatSession).filter(
-                ChatSession.referred_by == session.referral_code
-            ).count()
-            if count > 0:
-                referral_counts[session.referral_code] = {
-                    "count": count,
-                    "session_id": session.session_id[:8]
-                }
-        
-        # Sort by referral count
-        top_referrers = sorted(
-            referral_counts.items(), 
-            key=lambda x: x[1]["count"], 
-            reverse=True
-        )[:10]
+        top_referrers = db.query(
+            ChatSession.referral_code, ChatSession.session_id, referral_counts.c.count
+        ).join(
+            referral_counts, referral_counts.c.code == ChatSession.referral_code
+        ).order_by(referral_counts.c.count.desc()).limit(10).all()
         
         return {
             "top_negotiators": [
@@ -832,16 +828,35 @@ async def get_leaderboard():
             ],
             "top_referrers": [
                 {
-                    "share_code": code,
-                    "referral_count": data["count"],
-                    "session_id": data["session_id"]
+                    "share_code": r.referral_code,
+                    "referral_count": r.count,
+                    "session_id": r.session_id[:8]
                 }
-                for code, data in top_referrers
+                for r in top_referrers
             ]
         }
     finally:
         db.close()
 
+@app.get("/api/leaderboard")
+async def get_leaderboard(request: Request):
+    """Get top negotiators and challenge referrers"""
+    return response_cache.respond(request, LEADERBOARD_KEY, build_leaderboard)
+
+@app.get("/api/products")
+async def get_products():
+    """Products buyers can negotiate for (pass the slug as `product` in /api/chat)"""
+    db = next(get_db())
+    try:
+        return [product.to_dict() for product in catalog.all(db)]
+    finally:
+        db.close()
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit ratio and counters of the response cache"""
+    return response_cache.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8090)
@@ -0,0 +1,197 @@
+"""
+Write-behind batching of conversation message inserts
+
+With MESSAGE_WRITE_BEHIND=1, chat() hands its two ConversationMessage rows
+per turn to a buffer instead of committing them on the request path. A
+background task flushes the buffer as one multi-row INSERT + one commit when
+it reaches MESSAGE_FLUSH_BATCH_SIZE messages or every
+MESSAGE_FLUSH_INTERVAL_SECONDS, whichever comes first. Price and deal-closing
+updates on ChatSession stay synchronous.
+
+Loss bounds: messages are only in memory until the next flush. A clean
+shutdown (SIGTERM / lifespan exit) flushes everything. A hard crash can lose
+at most the last MESSAGE_FLUSH_INTERVAL_SECONDS of messages, and never more
+than MESSAGE_MAX_BUFFERED: the buffer is capped there, and when the flusher
+can't keep up (or the DB is down and failed batches are kept for retry) the
+oldest messages are dropped and counted in messages_dropped. enqueue() never
+writes on the event loop; a full buffer only wakes the background task.
+
+Buffered messages are visible to history reads in the same process only (see
+pending_messages()). With several gunicorn workers, a turn served by another
+worker reads history without the last flush interval of that session's
+messages, so keep write-behind to a single worker.
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from models import ConversationMessage
+
+MESSAGE_WRITE_BEHIND = os.getenv("MESSAGE_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+MESSAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("MESSAGE_FLUSH_INTERVAL_SECONDS", "0.5"))
+MESSAGE_FLUSH_BATCH_SIZE = int(os.getenv("MESSAGE_FLUSH_BATCH_SIZE", "200"))
+MESSAGE_MAX_BUFFERED = int(os.getenv("MESSAGE_MAX_BUFFERED", str(MESSAGE_FLUSH_BATCH_SIZE * 20)))
+
+
+class MessageWriter:
+    """Buffers message inserts and writes them in batches"""
+
+    def __init__(self, session_factory, batch_size: int = MESSAGE_FLUSH_BATCH_SIZE,
+                 interval: float = MESSAGE_FLUSH_INTERVAL_SECONDS,
+                 max_buffered: int = MESSAGE_MAX_BUFFERED):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_buffered = max_buffered
+
+        self._buffer = []
+        self._inflight = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = None
+        self._task = None
+
+        self.flushes = 0
+        self.messages_written = 0
+        self.flush_errors = 0
+        self.messages_dropped = 0
+
+    # ---------- request path ----------
+
+    def enqueue(self, session_pk: int, role: str, content: str,
+                timestamp: Optional[datetime] = None) -> dict:
+        row = {
+            "session_id": session_pk,
+            "role": role,
+            "content": content,
+            "timestamp": timestamp or datetime.utcnow(),
+        }
+        with self._lock:
+            self._buffer.append(row)
+            # The flusher can't keep up (or the DB is down) - stay within the loss bound
+            dropped = self._trim()
+            size = len(self._buffer)
+
+        if dropped:
+            print(f"⚠️  Message buffer full: dropped {dropped} oldest messages")
+        if size >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return row
+
+    def _trim(self) -> int:
+        """Drop the oldest buffered messages beyond max_buffered (caller holds _lock)"""
+        excess = len(self._buffer) + len(self._inflight) - self.max_buffered
+        if excess <= 0:
+            return 0
+        excess = min(excess, len(self._buffer))
+        del self._buffer[:excess]
+        self.messages_dropped += excess
+        return excess
+
+    def pending_for(self, session_pk: int) -> List[dict]:
+        """Messages for a session that haven't been committed yet, oldest first"""
+        with self._lock:
+            rows = self._inflight + self._buffer
+            return [dict(r) for r in rows if r["session_id"] == session_pk]
+
+    @property
+    def buffered(self) -> int:
+        with self._lock:
+            return len(self._buffer) + len(self._inflight)
+
+    # ---------- flushing ----------
+
+    def flush(self) -> int:
+        """Write everything buffered in one multi-row INSERT + commit"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                self._inflight, self._buffer = self._buffer, []
+                batch = self._inflight
+
+            db = self.session_factory()
+            try:
+                db.execute(ConversationMessage.__table__.insert(), batch)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self.flush_errors += 1
+                # Keep the rows (in order) for the next attempt, up to max_buffered
+                with self._lock:
+                    self._buffer = batch + self._buffer
+                    self._inflight = []
+                    dropped = self._trim()
+                print(f"⚠️  Message flush failed ({len(batch) - dropped} messages kept for retry, "
+                      f"{dropped} dropped): {e}")
+                return 0
+            finally:
+                db.close()
+
+            with self._lock:
+                self._inflight = []
+            self.flushes += 1
+            self.messages_written += len(batch)
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await asyncio.to_thread(self.flush)
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush whatever is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+        # A failed flush keeps rows buffered - try once more before giving up
+        if self.buffered:
+            await asyncio.to_thread(self.flush)
+            if self.buffered:
+                print(f"❌ {self.buffered} buffered messages could not be written on shutdown")
+
+
+message_writer = None
+if MESSAGE_WRITE_BEHIND:
+    from database import SessionLocal
+    message_writer = MessageWriter(SessionLocal)
+
+
+def pending_messages(session_pk: int) -> List[dict]:
+    """
+    Snapshot of this process's not-yet-flushed messages for a session.
+    Take it BEFORE reading history from the DB, so a flush that commits in
+    between can't make a message disappear from both.
+    """
+    if message_writer is None:
+        return []
+    return message_writer.pending_for(session_pk)
+
+
+def merge_pending(messages: List[dict], pending: List[dict]) -> List[dict]:
+    """Append pending messages to a history loaded from the DB"""
+    if not pending:
+        return messages
+    # A flush may have committed some of them since the snapshot - don't double count
+    stored = {(m["role"], m["content"], m["timestamp"]) for m in messages}
+    return messages + [
+        {"role": m["role"], "content": m["content"], "timestamp": m["timestamp"]}
+        for m in pending
+        if (m["role"], m["content"], m["timestamp"]) not in stored
+    ]
@@ -0,0 +1,327 @@
+"""
+In-process metrics in the Prometheus text exposition format (GET /metrics)
+
+No client library or external service: counters, gauges and histograms are
+plain Python objects updated under a lock (about a microsecond per
+observation), rendered on scrape.
+
+Metrics are per process. With several gunicorn workers each scrape is answered
+by whichever worker accepts it, so totals jump between scrapes; run a single
+worker (or scrape workers individually) when exact totals matter.
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Chat turns are dominated by LLM calls (~0.3-5s); DB stages sit in the low ms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def labels(self, *values: str):
+        """Child metric for one label combination (cache it on hot paths)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels - use .labels(...)")
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}_total{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from `function` at scrape time"""
+        self.function = function
+
+    def render(self, name, labelnames, key):
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return []
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default().set_function(function)
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Context manager observing the elapsed seconds of its block"""
+        return _Timer(self)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(labelnames + ("le",), key + (_format_value(bound),))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self) -> _Timer:
+        return self._default().time()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---------- /api/chat ----------
+
+CHAT_STAGE_SECONDS = Histogram(
+    "nego_chat_stage_seconds",
+    "Time spent in each stage of a /api/chat turn",
+    ["stage"]
+)
+STAGE_SESSION_LOOKUP = CHAT_STAGE_SECONDS.labels("session_lookup")
+STAGE_HISTORY_LOAD = CHAT_STAGE_SECONDS.labels("history_load")
+STAGE_INTENT_EXTRACTION = CHAT_STAGE_SECONDS.labels("intent_extraction")
+STAGE_REPLY_GENERATION = CHAT_STAGE_SECONDS.labels("reply_generation")
+STAGE_COMMIT = CHAT_STAGE_SECONDS.labels("commit")
+
+CHAT_TURN_SECONDS = Histogram("nego_chat_turn_seconds", "End-to-end /api/chat latency")
+TURN_BUDGET_LEFT = Histogram(
+    "nego_turn_budget_left_seconds", "Deadline budget a chat turn had left when it finished (0 when late)"
+)
+DEADLINE_EXCEEDED = Counter("nego_deadline_exceeded", "Chat turns that finished after their deadline")
+DEADLINE_EXCEEDED.labels()
+DEADLINE_DOWNGRADES = Counter(
+    "nego_deadline_downgrades",
+    "Turn stages cut short by the deadline (intent: regex parsing, reply: templated line)",
+    ["stage"]
+)
+for stage in ("intent", "reply"):
+    DEADLINE_DOWNGRADES.labels(stage)
+CHAT_TURN_SECONDS.labels()
+CHAT_TURN_CONFLICTS = Counter(
+    "nego_chat_turn_conflicts",
+    "Chat turns restarted because another turn on the same session committed first"
+)
+CHAT_TURN_CONFLICTS.labels()
+CHAT_TURNS_IN_FLIGHT = Gauge("nego_chat_turns_in_flight", "/api/chat requests currently being handled")
+CHAT_TURNS_IN_FLIGHT.set(0)
+
+DEALS_CLOSED = Counter("nego_deals_closed", "Negotiations that ended in a closed deal")
+DEALS_CLOSED.labels()
+LLM_ERRORS = Counter("nego_llm_errors", "Failed LLM calls", ["call"])
+FALLBACKS_SERVED = Counter(
+    "nego_fallbacks_served",
+    "Turns answered with a fallback (intent: regex parsing, reply: canned message)",
+    ["kind"]
+)
+for call in ("intent", "reply"):
+    LLM_ERRORS.labels(call)
+    FALLBACKS_SERVED.labels(call)
+REPLIES = Counter(
+    "nego_replies",
+    "Chat replies by source: generated by the LLM, from reply_templates.py or from reply_cache.py",
+    ["source"]
+)
+for source in ("llm", "template", "cache"):
+    REPLIES.labels(source)
+TEMPLATE_REPLIES = Counter("nego_template_replies", "Templated replies by situation", ["situation"])
+REPLY_CACHE_EVENTS = Counter(
+    "nego_reply_cache",
+    "Reply cache lookups (hit, miss) and variants offered to it (stored, rejected, fill_error)",
+    ["event"]
+)
+SPECULATIVE_REPLIES = Counter(
+    "nego_speculative_replies",
+    "Replies generated from the regex intent during the intent call (hit: used, miss: discarded)",
+    ["outcome"]
+)
+for outcome in ("hit", "miss"):
+    SPECULATIVE_REPLIES.labels(outcome)
+SPECULATION_SAVED_SECONDS = Counter(
+    "nego_speculation_saved_seconds", "Turn latency saved by speculative replies (reply time overlapping the intent call)"
+)
+SPECULATION_SAVED_SECONDS.labels()
+RATE_LIMITED = Counter("nego_rate_limited", "Chat requests rejected with 429, by the limit that tripped", ["scope"])
+
+# ---------- database ----------
+
+DB_POOL = Gauge("nego_db_pool_connections", "Primary database connection pool", ["state"])
+
+
+def watch_pool(engine):
+    """Export the engine's pool occupancy (QueuePool only - SQLite memory pools have none)"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return
+    DB_POOL.labels("checked_out").set_function(pool.checkedout)
+    DB_POOL.labels("idle").set_function(pool.checkedin)
+    DB_POOL.labels("size").set_function(pool.size)
+    DB_POOL.labels("overflow").set_function(lambda: max(0, pool.overflow()))
+
+
+PROCESS_START = Gauge("nego_process_start_time_seconds", "Unix time this worker started", ["pid"])
+PROCESS_START.labels(str(os.getpid())).set(time.time())
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,305 @@
+"""
+Versioned schema migrations for SQLite and PostgreSQL
+
+Each migration has an integer version and is recorded in `schema_migrations`
+once applied, so `upgrade()` only runs what's new. Transactional migrations run
+inside a single transaction with a short lock_timeout on Postgres, so an ALTER
+that can't get its lock fails fast instead of queueing behind (and blocking)
+live /api/chat traffic. Non-transactional migrations run in autocommit mode,
+which is what CREATE INDEX CONCURRENTLY and batched backfills need.
+
+Usage:
+    python migrations.py status
+    python migrations.py upgrade
+"""
+
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+schema_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    schema_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Serializes concurrent runners (e.g. several workers booting at once) on Postgres
+MIGRATION_LOCK_ID = 72_010_029
+DDL_LOCK_TIMEOUT = "5s"
+BACKFILL_BATCH_SIZE = 1000
+BACKFILL_PAUSE_SECONDS = 0.05
+
+
+class Migration:
+    def __init__(self, version: int, name: str, upgrade, transactional: bool = True):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+        self.transactional = transactional
+
+
+MIGRATIONS = []
+
+
+def migration(version: int, name: str, transactional: bool = True):
+    """Register a migration function (receives a MigrationContext)"""
+    def decorator(func):
+        MIGRATIONS.append(Migration(version, name, func, transactional))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+
+class MigrationContext:
+    """Backend-aware helpers for writing migrations"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.dialect = conn.dialect.name
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.dialect == "postgresql"
+
+    def execute(self, sql: str, **params):
+        return self.conn.execute(text(sql), params)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in [c["name"] for c in inspect(self.conn).get_columns(table)]
+
+    def add_column(self, table: str, column: str, ddl: str):
+        """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+        if not self.has_column(table, column):
+            print(f"📝 Adding {table}.{column}...")
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+    def create_table(self, table: Table):
+        """CREATE TABLE (and its indexes) unless it already exists"""
+        if not inspect(self.conn).has_table(table.name):
+            print(f"📝 Creating table {table.name}...")
+            table.create(self.conn, checkfirst=True)
+
+    def create_index(self, name: str, table: str, columns: list, unique: bool = False):
+        """
+        Create an index if it doesn't exist.
+        On Postgres this uses CREATE INDEX CONCURRENTLY (migration must be
+        non-transactional) so writes to the table are never blocked.
+        """
+        unique_sql = "UNIQUE " if unique else ""
+        cols = ", ".join(columns)
+        if self.is_postgres:
+            # A failed concurrent build leaves an INVALID index behind - rebuild it
+            invalid = self.execute(
+                "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = :name AND NOT i.indisvalid",
+                name=name
+            ).first()
+            if invalid:
+                print(f"⚠️  Dropping invalid index {name}...")
+                self.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            print(f"📝 Building index {name} concurrently...")
+            self.execute(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({cols})")
+        else:
+            print(f"📝 Building index {name}...")
+            self.execute(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+
+    def backfill(self, table: str, set_sql: str, where_sql: str,
+                 batch_size: int = BACKFILL_BATCH_SIZE, pause: float = BACKFILL_PAUSE_SECONDS) -> int:
+        """
+        UPDATE rows matching `where_sql` in small committed batches (migration
+        must be non-transactional) so row locks are held only briefly.
+        """
+        total = 0
+        while True:
+            result = self.execute(
+                f"UPDATE {table} SET {set_sql} WHERE id IN "
+                f"(SELECT id FROM {table} WHERE {where_sql} LIMIT {int(batch_size)})"
+            )
+            if self.conn.in_transaction():
+                self.conn.commit()
+            if result.rowcount <= 0:
+                break
+            total += result.rowcount
+            time.sleep(pause)
+        if total:
+            print(f"📝 Backfilled {total} rows in {table}")
+        return total
+
+
+# ==================== MIGRATIONS ====================
+
+@migration(1, "chat_sessions.minimum_price")
+def add_minimum_price(ctx: MigrationContext):
+    ctx.add_column("chat_sessions", "minimum_price", "FLOAT NOT NULL DEFAULT 380")
+
+
+@migration(2, "referral tracking columns")
+def add_referral_columns(ctx: MigrationContext):
+    ctx.add_column("waitlist", "referral_code", "VARCHAR")
+    ctx.add_column("waitlist", "referred_by", "VARCHAR")
+    ctx.add_column("waitlist", "referral_count", "INTEGER DEFAULT 0")
+    ctx.add_column("chat_sessions", "discount_percentage", "FLOAT")
+    ctx.add_column("chat_sessions", "referral_code", "VARCHAR")
+    ctx.add_column("chat_sessions", "referred_by", "VARCHAR")
+
+
+@migration(3, "message history and referral lookup indexes", transactional=False)
+def add_lookup_indexes(ctx: MigrationContext):
+    ctx.create_index("ix_conversation_messages_session_id_timestamp",
+                     "conversation_messages", ["session_id", "timestamp"])
+    ctx.create_index("ix_chat_sessions_referred_by", "chat_sessions", ["referred_by"])
+
+
+@migration(4, "backfill waitlist.referral_count", transactional=False)
+def backfill_referral_count(ctx: MigrationContext):
+    ctx.backfill("waitlist", "referral_count = 0", "referral_count IS NULL")
+
+
+@migration(5, "conversation_archives table")
+def add_conversation_archives(ctx: MigrationContext):
+    from models import ConversationArchive
+    ctx.create_table(ConversationArchive.__table__)
+
+
+@migration(6, "rate_limit_buckets table")
+def add_rate_limit_buckets(ctx: MigrationContext):
+    from models import RateLimitBucket
+    ctx.create_table(RateLimitBucket.__table__)
+
+
+@migration(7, "products table and chat_sessions.product_id")
+def add_products(ctx: MigrationContext):
+    import json
+    from catalog import DEFAULT_PRODUCT
+    from models import Product
+    ctx.create_table(Product.__table__)
+    ctx.add_column("chat_sessions", "product_id", "INTEGER REFERENCES products(id)")
+    # Seed the product every existing session was negotiating over
+    if not ctx.execute("SELECT 1 FROM products WHERE slug = :slug", slug=DEFAULT_PRODUCT["slug"]).first():
+        print(f"📝 Seeding product {DEFAULT_PRODUCT['slug']}...")
+        ctx.conn.execute(Product.__table__.insert().values(
+            **{key: value for key, value in DEFAULT_PRODUCT.items() if key not in ("features", "opening_messages")},
+            features=json.dumps(DEFAULT_PRODUCT["features"]),
+            opening_messages=json.dumps(DEFAULT_PRODUCT["opening_messages"]),
+            active=True,
+            updated_at=datetime.utcnow()
+        ))
+
+
+@migration(8, "chat_sessions.product_id index", transactional=False)
+def add_product_index(ctx: MigrationContext):
+    ctx.create_index("ix_chat_sessions_product_id", "chat_sessions", ["product_id"])
+
+
+@migration(9, "chat_sessions.turn_count")
+def add_turn_count(ctx: MigrationContext):
+    ctx.add_column("chat_sessions", "turn_count", "INTEGER NOT NULL DEFAULT 0")
+
+
+# ==================== RUNNER ====================
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def applied_versions(engine) -> set:
+    schema_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return {row.version for row in conn.execute(select(schema_migrations.c.version))}
+
+
+def current_version(engine) -> int:
+    """Highest applied migration version (0 if none, or no version table yet)"""
+    if not inspect(engine).has_table("schema_migrations"):
+        return 0
+    with engine.connect() as conn:
+        version = conn.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar()
+    return version or 0
+
+
+def _record(conn, m: Migration):
+    conn.execute(schema_migrations.insert().values(
+        version=m.version, name=m.name, applied_at=datetime.utcnow()
+    ))
+
+
+def _run(engine, m: Migration):
+    if m.transactional:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+            m.upgrade(MigrationContext(conn))
+            _record(conn, m)
+    else:
+        with engine.connect() as conn:
+            autocommit = conn.execution_options(isolation_level="AUTOCOMMIT")
+            m.upgrade(MigrationContext(autocommit))
+        with engine.begin() as conn:
+            _record(conn, m)
+
+
+def upgrade(engine=None, target: int = None) -> list:
+    """Apply all pending migrations up to `target` (default: latest)"""
+    if engine is None:
+        from database import engine
+    from models import Base
+
+    # Fast path for every boot after the first: the schema is already current, so
+    # skip create_all's per-table inspection. (Schema changes always come with a
+    # migration, which bumps LATEST_VERSION and takes the full path.)
+    if (target is None or target >= LATEST_VERSION) and current_version(engine) == LATEST_VERSION:
+        return []
+
+    # Baseline: create any missing tables from the models
+    Base.metadata.create_all(bind=engine)
+    schema_metadata.create_all(bind=engine)
+
+    lock_conn = None
+    if engine.dialect.name == "postgresql":
+        lock_conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+    try:
+        done = applied_versions(engine)
+        applied = []
+        for m in MIGRATIONS:
+            if m.version in done or (target is not None and m.version > target):
+                continue
+            print(f"🔄 Applying migration {m.version}: {m.name}")
+            _run(engine, m)
+            applied.append(m.version)
+        return applied
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            lock_conn.close()
+
+
+def status(engine=None):
+    if engine is None:
+        from database import engine
+    done = applied_versions(engine)
+    for m in MIGRATIONS:
+        mark = "✅" if m.version in done else "⏳"
+        print(f"{mark} {m.version:>4}  {m.name}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "status":
+        status()
+    elif command == "upgrade":
+        target = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        applied = upgrade(target=target)
+        print(f"✅ Applied {len(applied)} migration(s)" if applied else "✅ Database already up to date!")
+    else:
+        print("Usage: python migrations.py [status|upgrade [version]]")
+        sys.exit(1)
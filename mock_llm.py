@@ -0,0 +1,152 @@
+"""
+Mock OpenAI chat completions server for load tests
+
+Answers POST /v1/chat/completions like the OpenAI API, after a simulated
+latency, so the API can be load tested without spending tokens or hitting
+rate limits. Point the API at it with OPENAI_BASE_URL (read by the openai
+client):
+
+    python mock_llm.py --port 8199
+    OPENAI_BASE_URL=http://127.0.0.1:8199/v1 uvicorn main:app
+
+- Intent extraction (JSON mode) gets the offered price / acceptance parsed
+  from the buyer's message with a regex.
+- Reply generation gets a short seller line quoting the price the engine asked
+  for, so scripted buyers can read the counter-offer back.
+
+Latencies are lognormal around --intent-latency / --reply-latency (medians,
+seconds) with --jitter as sigma: most calls land near the median with a long
+tail, like the real API. --error-rate makes that share of calls fail with a
+500 (the openai client retries those, as it would in production).
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
+
+ACCEPT_WORDS = ("okay", "ok ", "fine", "deal", "alright", "i'll take", "agreed")
+PRICE_PATTERN = re.compile(r"(\d{2,5}(?:\.\d+)?)")
+QUOTED_MESSAGE = re.compile(r"Extract from: '(.*)'", re.DOTALL)
+# The engine's pricing instructions quote the counter-offer as "<number> GHS"
+COUNTER_PATTERN = re.compile(r"(?:Counter(?: with)?|Drop to|Offer|Give(?: them)?|offer:) (\d+(?:\.\d+)?) GHS")
+CURRENT_PRICE_PATTERN = re.compile(r"CURRENT PRICE: (\d+(?:\.\d+)?) GHS")
+SUGGESTED_LINE = re.compile(r"Say '([^']+)'")
+
+config = {
+    "intent_latency": 0.4,
+    "reply_latency": 1.2,
+    "jitter": 0.35,
+    "error_rate": 0.0,
+}
+stats = {"intent": 0, "reply": 0, "errors": 0}
+
+app = FastAPI(title="Mock LLM", default_response_class=ORJSONResponse)
+
+
+def simulated_latency(median: float) -> float:
+    return median * random.lognormvariate(0, config["jitter"])
+
+
+def extract_intent(text: str) -> str:
+    quoted = QUOTED_MESSAGE.search(text)
+    message = (quoted.group(1) if quoted else text).lower()
+    price = PRICE_PATTERN.search(message)
+    offered = float(price.group(1)) if price else None
+    accepted = any(word in message + " " for word in ACCEPT_WORDS)
+    offered_json = "null" if offered is None else f"{offered:g}"
+    return f'{{"offered_price": {offered_json}, "accepted_deal": {str(accepted).lower()}, "quantity": 1}}'
+
+
+COUNTER_REPLIES = [
+    "Chale, this watch is original 🔥 I can do {price} GHS for you.",
+    "Ei, you dey push me 😄 Okay, {price} GHS - that's a good price.",
+    "For you, my friend, {price} GHS. Quality like this no dey cheap 💪",
+    "Hmm... let me do {price} GHS. Meet me there and we shake hands 🤝",
+]
+
+
+def seller_reply(messages: list) -> str:
+    system = messages[0]["content"] if messages else ""
+    instruction = messages[-1]["content"] if messages else ""
+    counter = COUNTER_PATTERN.search(instruction) or CURRENT_PRICE_PATTERN.search(system)
+    suggested = SUGGESTED_LINE.search(instruction)
+    if suggested:
+        return suggested.group(1)
+    if counter:
+        # Worded differently each time, like a real model (the reply cache keeps distinct variants)
+        return random.choice(COUNTER_REPLIES).format(price=counter.group(1))
+    return "This one is quality, my friend 😄 What's your offer?"
+
+
+def completion(model: str, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    is_intent = (body.get("response_format") or {}).get("type") == "json_object"
+
+    await asyncio.sleep(simulated_latency(config["intent_latency" if is_intent else "reply_latency"]))
+
+    if random.random() < config["error_rate"]:
+        stats["errors"] += 1
+        return ORJSONResponse(
+            {"error": {"message": "mock upstream error", "type": "server_error"}},
+            status_code=500
+        )
+
+    if is_intent:
+        stats["intent"] += 1
+        return completion(body.get("model", "mock"), extract_intent(messages[-1]["content"]))
+    stats["reply"] += 1
+    return completion(body.get("model", "mock"), seller_reply(messages))
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "config": config}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--intent-latency", type=float, default=config["intent_latency"],
+                        help="Median seconds for intent extraction calls")
+    parser.add_argument("--reply-latency", type=float, default=config["reply_latency"],
+                        help="Median seconds for reply generation calls")
+    parser.add_argument("--jitter", type=float, default=config["jitter"],
+                        help="Lognormal sigma of the latency (0 = fixed)")
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    args = parser.parse_args()
+
+    config.update(intent_latency=args.intent_latency, reply_latency=args.reply_latency,
+                  jitter=args.jitter, error_rate=args.error_rate)
+
+    import uvicorn
+    print(f"🤖 Mock LLM on http://{args.host}:{args.port}/v1 "
+          f"(intent ~{args.intent_latency}s, reply ~{args.reply_latency}s, errors {args.error_rate:.0%})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", backlog=4096)
+
+
+if __name__ == "__main__":
+    main()
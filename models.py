@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -20,6 +20,26 @@ class WaitlistEntry(Base):
     def __repr__(self):
         return f"<WaitlistEntry {self.contact_type}: {self.contact_value}>"
 
+class Product(Base):
+    """A negotiable product (catalog.py caches these and builds one engine per product)"""
+    __tablename__ = "products"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String, unique=True, nullable=False, index=True)
+    name = Column(String, nullable=False)
+    starting_price = Column(Float, nullable=False)
+    floor_price = Column(Float, nullable=False)  # Hard floor - no deal or counter-offer below this
+    session_minimum_low = Column(Float, nullable=False)  # Each session gets a random minimum in this range
+    session_minimum_high = Column(Float, nullable=False)
+    cost_price = Column(Float, nullable=True)
+    features = Column(Text, nullable=True)  # JSON list of selling points
+    opening_messages = Column(Text, nullable=True)  # JSON list; generated from templates when empty
+    active = Column(Boolean, default=True, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<Product {self.slug}: {self.name}>"
+
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
     
@@ -33,7 +53,9 @@ class ChatSession(Base):
     deal_closed = Column(Boolean, default=False)
     discount_percentage = Column(Float, nullable=True)  # Track best discount
     referral_code = Column(String, unique=True, nullable=True, index=True)  # User's share code for challenge
-    referred_by = Column(String, nullable=True)  # Who referred them to play
+    referred_by = Column(String, nullable=True, index=True)  # Who referred them to play
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True, index=True)  # NULL = default product
+    turn_count = Column(Integer, nullable=False, default=0)  # Version for the compare-and-set in chat()
     created_at = Column(DateTime, default=datetime.utcnow)
     ended_at = Column(DateTime, nullable=True)
     
@@ -45,6 +67,10 @@ class ChatSession(Base):
 
 class ConversationMessage(Base):
     __tablename__ = "conversation_messages"
+    __table_args__ = (
+        # History lookups: WHERE session_id = ? ORDER BY timestamp
+        Index("ix_conversation_messages_session_id_timestamp", "session_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)
@@ -58,3 +84,27 @@ class ConversationMessage(Base):
     def __repr__(self):
         return f"<Message {self.role}: {self.content[:50]}...>"
 
+class ConversationArchive(Base):
+    """Cold storage for messages of closed/idle sessions - one compressed blob per session"""
+    __tablename__ = "conversation_archives"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"), unique=True, nullable=False, index=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    payload = Column(LargeBinary, nullable=False)  # zlib-compressed JSON list of messages
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ConversationArchive session={self.session_id}: {self.message_count} messages>"
+
+class RateLimitBucket(Base):
+    """Token bucket shared by all workers (RATE_LIMIT_BACKEND=db) - one row per limited key"""
+    __tablename__ = "rate_limit_buckets"
+    
+    key = Column(String, primary_key=True)  # e.g. "ip:203.0.113.7", "session:abc"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False, index=True)  # unix seconds
+    allowed = Column(Boolean, nullable=False, default=True)  # outcome of the last request
+    
+    def __repr__(self):
+        return f"<RateLimitBucket {self.key}: {self.tokens:.1f}>"
@@ -1,28 +1,161 @@
 import os
 import re
 import json
-from typing import List, Dict, Optional
-from openai import AsyncOpenAI
+import time
+import asyncio
+import threading
+from typing import Any, Coroutine, List, Dict, Optional, Tuple
+
+from deadline import COMMIT_RESERVE_SECONDS, DEADLINE_MIN_INTENT_SECONDS, DEADLINE_MIN_REPLY_SECONDS, current_deadline
+from metrics import (
+    STAGE_INTENT_EXTRACTION, STAGE_REPLY_GENERATION, LLM_ERRORS, FALLBACKS_SERVED, REPLIES,
+    SPECULATIVE_REPLIES, SPECULATION_SAVED_SECONDS
+)
+from reply_cache import reply_cache
+from reply_templates import ENABLED as TEMPLATED_SITUATIONS, template_reply
+from tracing import span
+
+# HARD FLOOR: no counter-offer or closed deal ever goes below this
+# (default for products without their own floor_price)
+ABSOLUTE_MINIMUM = 350.0
+
+# The counter-offer ladder uses fixed GHS lines (offers under 100 and 300) and
+# steps of 25-50 GHS, tuned for the watch (450 down to 350). It only holds for
+# products whose floor sits above the 300 line and whose whole range can be
+# walked in a handful of those steps.
+LADDER_MIN_FLOOR = 300.0
+LADDER_MAX_SPREAD = 200.0
+
+
+def ladder_range_error(starting_price: float, floor_price: float) -> Optional[str]:
+    """Why the counter-offer ladder can't price this range, or None if it can"""
+    if floor_price < LADDER_MIN_FLOOR:
+        return f"floor_price must be at least {LADDER_MIN_FLOOR:g} GHS (the counter-offer ladder's fixed price lines)"
+    if starting_price - floor_price > LADDER_MAX_SPREAD:
+        return f"starting_price can be at most {LADDER_MAX_SPREAD:g} GHS above floor_price (the counter-offer ladder's step sizes)"
+    return None
+
+# Phrases where the customer asks US for a price
+ASKING_FOR_OFFER_PHRASES = (
+    "give me an offer", "what's your offer", "your offer", "best price",
+    "your best price", "what can you do", "make me an offer", "give me a price",
+    "what's your price", "whats your price", "your price"
+)
+
+# Acceptance words checked when the message carries no price
+ACCEPTANCE_KEYWORDS = ("deal", "yes", "agreed", "accept", "i'll take it", "let's do it", "sold")
+
+# Generate the reply from the regex intent while the LLM intent call runs (see Speculation)
+SPECULATIVE_REPLY = os.getenv("SPECULATIVE_REPLY", "").lower() in ("1", "true", "yes")
+
+_shared_client = None
+# Warm-up (a worker thread) and the first turn can both build it
+_shared_client_lock = threading.Lock()
+
+
+def require_api_key() -> str:
+    # Check if OpenAI API key is set
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError(
+            "OPENAI_API_KEY environment variable is not set!\n"
+            "Please set it in Railway dashboard:\n"
+            "1. Go to your service in Railway\n"
+            "2. Click 'Variables' tab\n"
+            "3. Add OPENAI_API_KEY with your OpenAI API key\n"
+            "Get your key from: https://platform.openai.com/api-keys"
+        )
+    return api_key
+
+
+def shared_client(api_key: str):
+    """The process-wide OpenAI client, built on first use (importing openai is a large part of boot time)"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                from openai import AsyncOpenAI
+                _shared_client = AsyncOpenAI(api_key=api_key)
+    return _shared_client
+
+
+class TurnPlan:
+    """What a turn decided once its intent is known (see NegotiationEngine.plan_turn)"""
+
+    def __init__(self, offered_price: Optional[float], user_accepted: bool, asking_for_offer: bool,
+                 counter_offer: float, messages: List[Dict], situation: Optional[str], cache_state):
+        self.offered_price = offered_price
+        self.user_accepted = user_accepted
+        self.asking_for_offer = asking_for_offer
+        self.counter_offer = counter_offer
+        self.messages = messages
+        self.situation = situation
+        self.cache_state = cache_state
+
+
+class Speculation:
+    """
+    A reply call started before the intent is known (SPECULATIVE_REPLY)
+
+    The turn is planned from the regex intent and its reply call starts
+    alongside the intent call. If the real plan builds the same prompt, that
+    reply is the one the turn would have generated and it is used as is;
+    otherwise it is cancelled and the reply is generated again. Outcomes are
+    counted in nego_speculative_replies_total{outcome}, and the reply time that
+    overlapped the intent call in nego_speculation_saved_seconds_total.
+    """
+
+    def __init__(self, plan: TurnPlan, reply: Coroutine[Any, Any, str]):
+        self.plan = plan
+        self.started = time.perf_counter()
+        self.intent_at = None
+        self.reply_at = None
+        self.used = False
+        # A task on the coroutine itself: cancelling it before it starts still closes it
+        self.task = asyncio.get_running_loop().create_task(reply)
+        self.task.add_done_callback(self._reply_done)
+
+    def _reply_done(self, task: asyncio.Task):
+        self.reply_at = time.perf_counter()
+
+    def intent_done(self):
+        self.intent_at = time.perf_counter()
+
+    def matches(self, plan: TurnPlan) -> bool:
+        return plan.messages == self.plan.messages
+
+    async def result(self, timeout: Optional[float] = None) -> str:
+        reply = await asyncio.wait_for(self.task, timeout)
+        # Only a reply that arrived counts as a hit (a failed one is a miss, in close())
+        self.used = True
+        SPECULATIVE_REPLIES.labels("hit").inc()
+        reply_at = self.reply_at or time.perf_counter()
+        SPECULATION_SAVED_SECONDS.inc(min(self.intent_at, reply_at) - self.started)
+        return reply
+
+    def close(self):
+        if not self.used:
+            SPECULATIVE_REPLIES.labels("miss").inc()
+        self.task.cancel()
+        # Nobody awaits a discarded call: retrieve its error so asyncio doesn't log it
+        self.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
 
 class NegotiationEngine:
     """Advanced negotiation engine with strategic pricing and LLM integration"""
     
     def __init__(self, product_config: dict):
         self.product = product_config
-        
-        # Check if OpenAI API key is set
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError(
-                "OPENAI_API_KEY environment variable is not set!\n"
-                "Please set it in Railway dashboard:\n"
-                "1. Go to your service in Railway\n"
-                "2. Click 'Variables' tab\n"
-                "3. Add OPENAI_API_KEY with your OpenAI API key\n"
-                "Get your key from: https://platform.openai.com/api-keys"
-            )
-        
-        self.client = AsyncOpenAI(api_key=api_key)
+        self.floor = float(product_config.get("floor_price", ABSOLUTE_MINIMUM))
+        self.api_key = require_api_key()
+        self._client = None
+    
+    @property
+    def client(self):
+        """OpenAI client (one per process, shared by every product's engine)"""
+        if self._client is None:
+            self._client = shared_client(self.api_key)
+        return self._client
         
     def extract_price_from_message(self, message: str) -> Optional[float]:
         """Extract price offer from user message"""
@@ -62,6 +195,16 @@ class NegotiationEngine:
         """Calculate discount percentage"""
         return ((original - new) / original) * 100
     
+    def is_asking_for_offer(self, message: str) -> bool:
+        """Check if user is asking for an offer from us"""
+        message_lower = message.lower()
+        return any(phrase in message_lower for phrase in ASKING_FOR_OFFER_PHRASES)
+    
+    def has_acceptance_keyword(self, message: str) -> bool:
+        """Keyword fallback for acceptance (used only when the message has no price)"""
+        message_lower = message.lower()
+        return any(keyword in message_lower for keyword in ACCEPTANCE_KEYWORDS)
+    
     def should_accept_price(self, offered_price: float, current_price: float, 
                            minimum_price: float, message_count: int) -> bool:
         """Determine if AI should accept the price based on strategy"""
@@ -83,10 +226,10 @@ class NegotiationEngine:
         else:
             return offered_price >= minimum_price
     
-    async def extract_intent_with_llm(self, user_message: str) -> Dict:
+    async def extract_intent_with_llm(self, user_message: str, timeout: Optional[float] = None) -> Dict:
         """Use LLM to extract price offer and acceptance status"""
         try:
-            response = await self.client.chat.completions.create(
+            response = await asyncio.wait_for(self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[{
                     "role": "system",
@@ -113,12 +256,19 @@ Examples:
                 temperature=0,
                 max_tokens=50,
                 response_format={"type": "json_object"}
-            )
+            ), timeout)
             
             import json
             result = json.loads(response.choices[0].message.content)
             return result
+        except asyncio.TimeoutError:
+            # Out of turn budget (see deadline.py)
+            current_deadline().downgrade("intent")
+            FALLBACKS_SERVED.labels("intent").inc()
+            return self.regex_intent(user_message)
         except:
+            LLM_ERRORS.labels("intent").inc()
+            FALLBACKS_SERVED.labels("intent").inc()
             return {"offered_price": None, "accepted_deal": False, "quantity": 1}
     
     async def negotiate(self, user_message: str, conversation_history: List[Dict],
@@ -127,25 +277,53 @@ Examples:
         Main negotiation logic using LLM with strategic pricing
         """
         
-        # HARD FLOOR: Enforce absolute minimum of 350 GHS - NEVER go below this
-        ABSOLUTE_MINIMUM = 350.0
-        minimum_price = max(minimum_price, ABSOLUTE_MINIMUM)
+        # HARD FLOOR: Enforce the product's floor (350 GHS by default) - NEVER go below this
+        minimum_price = max(minimum_price, self.floor)
         
         message_count = len([m for m in conversation_history if m["role"] == "user"])
+        deadline = current_deadline()
         
-        # Use LLM to extract intent (with fallback to regex)
-        llm_intent = await self.extract_intent_with_llm(user_message)
+        # Start the reply the regex intent leads to while the intent call runs
+        speculation = self.speculate(
+            user_message, conversation_history, current_price, minimum_price, message_count
+        ) if SPECULATIVE_REPLY else None
+        try:
+            # Use LLM to extract intent (with fallback to regex), keeping the reply's share of the budget
+            intent_timeout = deadline.timeout(reserve=DEADLINE_MIN_REPLY_SECONDS + COMMIT_RESERVE_SECONDS)
+            if intent_timeout is not None and intent_timeout < DEADLINE_MIN_INTENT_SECONDS:
+                deadline.downgrade("intent")
+                FALLBACKS_SERVED.labels("intent").inc()
+                llm_intent = self.regex_intent(user_message)
+            else:
+                with STAGE_INTENT_EXTRACTION.time(), span("llm.intent_extraction", model="gpt-3.5-turbo",
+                                                          timeout=intent_timeout) as intent_span:
+                    llm_intent = await self.extract_intent_with_llm(user_message, timeout=intent_timeout)
+                    intent_span.set("offered_price", llm_intent.get("offered_price"))
+            if speculation is not None:
+                speculation.intent_done()
+            
+            plan = self.plan_turn(user_message, conversation_history, current_price, minimum_price,
+                                  message_count, llm_intent)
+            ai_message = await self.reply(plan, current_price, speculation)
+        finally:
+            if speculation is not None:
+                speculation.close()
         
+        result = self.finalize(ai_message or "", plan.offered_price, plan.user_accepted, plan.counter_offer,
+                               current_price)
+        if ai_message is None:
+            result["message"] = self.out_of_time_reply(result, current_price)
+        return result
+    
+    def plan_turn(self, user_message: str, conversation_history: List[Dict], current_price: float,
+                  minimum_price: float, message_count: int, intent: Dict) -> "TurnPlan":
+        """Everything the turn decides from its intent: prices, the reply prompt and where the reply comes from"""
         # Fallback to regex if LLM didn't find price
-        offered_price = llm_intent.get("offered_price") or self.extract_price_from_message(user_message)
-        user_accepted_llm = llm_intent.get("accepted_deal", False)
+        offered_price = intent.get("offered_price") or self.extract_price_from_message(user_message)
+        user_accepted_llm = intent.get("accepted_deal", False)
         
         # Check if user is asking for an offer from us
-        asking_for_offer = any(phrase in user_message.lower() for phrase in [
-            "give me an offer", "what's your offer", "your offer", "best price", 
-            "your best price", "what can you do", "make me an offer", "give me a price",
-            "what's your price", "whats your price", "your price"
-        ])
+        asking_for_offer = self.is_asking_for_offer(user_message)
         
         # CRITICAL: If they said "okay/fine X" where X is a DIFFERENT price than current,
         # it's a COUNTER-OFFER, not acceptance!
@@ -164,13 +342,179 @@ Examples:
         
         # Enhanced fallback keyword check (only if NO price in message)
         if not user_accepted and not offered_price:
-            acceptance_keywords = ["deal", "yes", "agreed", "accept", "i'll take it", "let's do it", "sold"]
-            message_lower = user_message.lower()
-            user_accepted = any(keyword in message_lower for keyword in acceptance_keywords)
+            user_accepted = self.has_acceptance_keyword(user_message)
         
-        quantity = llm_intent.get("quantity", 1) or self.extract_quantity(user_message)
+        quantity = intent.get("quantity", 1) or self.extract_quantity(user_message)
         
         # Calculate strategic counter-offer based on stage
+        counter_offer, pricing_instruction = self.plan_counter_offer(
+            offered_price, asking_for_offer, message_count, current_price
+        )
+        
+        # Build conversational prompt
+        system_prompt = f"""You are "Bra Alex," a clever sales agent with personality and street smarts.
+
+PRODUCT: {self.product['name']} | CURRENT PRICE: {current_price} GHS
+
+YOUR PERSONALITY:
+- Witty and engaging - be yourself, have fun with it
+- Smart negotiator - you know how to read people
+- Use humor and emojis naturally (😅, 😄, 💪, 🔥)
+- Mix professional and casual language - whatever feels natural
+- React genuinely to what they say - if it's ridiculous, call it out!
+
+RESPONSE STYLE:
+- Keep it SHORT (2-3 sentences)
+- Be conversational and natural
+- Use wit, sarcasm, charm - whatever fits the moment
+- Don't be robotic - vary your language
+
+STAGE {message_count + 1} APPROACH:
+- Early: Confident, playful resistance
+- Mid: Show value, add sweeteners
+- Late: Get real about budgets, create urgency
+- Final: Close or walk away
+
+IMPORTANT: Actually READ what they're saying and respond naturally to it!
+
+WHEN THEY ACCEPT YOUR PRICE:
+Celebrate the deal! Use emojis and excitement. NO need to ask for contact details."""
+
+        # Build natural user context
+        if pricing_instruction:
+            user_context = f"""Customer: "{user_message}"
+
+{pricing_instruction}
+
+IMPORTANT: Actually respond to what they said! If it's absurd, call it out. If it's serious, negotiate. Be natural and engaging."""
+        elif quantity > 1:
+            bulk_price = max(int(current_price * 0.93), minimum_price)
+            user_context = f"""Customer: "{user_message}"
+
+They want {quantity} items. Offer bulk pricing around {bulk_price} GHS each - make it feel special."""
+        else:
+            user_context = f"""Customer: "{user_message}"
+
+Respond naturally. Current asking price: {current_price} GHS. Keep the conversation flowing."""
+        
+        # Build conversation for LLM with full context
+        messages = [
+            {"role": "system", "content": system_prompt},
+        ]
+        
+        # Add ALL conversation history for full context
+        for msg in conversation_history:
+            messages.append({
+                "role": msg["role"],
+                "content": msg["content"]
+            })
+        
+        # Add current user message with pricing guidance
+        messages.append({"role": "user", "content": user_context})
+        
+        return TurnPlan(
+            offered_price=offered_price,
+            user_accepted=user_accepted,
+            asking_for_offer=asking_for_offer,
+            counter_offer=counter_offer,
+            messages=messages,
+            # Scripted situations skip the LLM (see reply_templates.py)
+            situation=self.template_situation(offered_price, user_accepted, asking_for_offer),
+            # Replies driven by a pricing instruction are cached by state (see reply_cache.py)
+            cache_state=reply_cache.state(
+                self.product['name'], message_count, pricing_instruction, offered_price, current_price,
+                user_accepted, buyer_text=" ".join(
+                    [m["content"] for m in conversation_history if m["role"] == "user"] + [user_message]
+                )
+            ),
+        )
+    
+    async def reply(self, plan: "TurnPlan", current_price: float,
+                    speculation: Optional["Speculation"] = None) -> Optional[str]:
+        """The reply for a planned turn: templated, cached or generated (None: no time left to generate it)"""
+        if plan.situation == "accept_below_floor":
+            return ""  # finalize() writes this reply, an LLM one would be thrown away
+        if plan.situation and (templated := template_reply(
+                # finalize() never raises the price, so quote the lower of the two
+                plan.situation, offer=plan.offered_price, counter=min(plan.counter_offer, current_price),
+                price=current_price)):
+            return templated
+        
+        cached = reply_cache.get(plan.cache_state) if plan.cache_state else None
+        if cached is not None:
+            REPLIES.labels("cache").inc()
+            reply_cache.fill_in_background(plan.cache_state, lambda: self.generate_reply(plan.messages))
+            return cached
+        
+        deadline = current_deadline()
+        if not deadline.allows(DEADLINE_MIN_REPLY_SECONDS, reserve=COMMIT_RESERVE_SECONDS):
+            deadline.downgrade("reply")
+            return None
+        
+        # Call LLM (a reply that runs out of time is counted as the templated one replacing it)
+        timeout = deadline.timeout(reserve=COMMIT_RESERVE_SECONDS)
+        try:
+            with STAGE_REPLY_GENERATION.time(), span("llm.reply_generation", model="gpt-4o-mini",
+                                                     timeout=timeout) as reply_span:
+                if speculation is not None and speculation.matches(plan):
+                    reply_span.set("speculative", True)
+                    ai_message = await speculation.result(timeout)
+                else:
+                    ai_message = await self.generate_reply(plan.messages, timeout)
+            REPLIES.labels("llm").inc()
+            if plan.cache_state:
+                reply_cache.add(plan.cache_state, ai_message)
+            return ai_message
+        
+        except asyncio.TimeoutError:
+            deadline.downgrade("reply")
+            return None
+        except Exception as e:
+            # Fallback response if LLM fails
+            REPLIES.labels("llm").inc()
+            LLM_ERRORS.labels("reply").inc()
+            FALLBACKS_SERVED.labels("reply").inc()
+            return "Having some technical issues, but this product is high quality. Let's continue - what's your best offer?"
+    
+    def out_of_time_reply(self, result: Dict, current_price: float) -> str:
+        """Reply for a turn whose deadline left no time for the reply call"""
+        if result["deal_closed"]:
+            return result["message"].strip()  # finalize()'s deal line
+        price = result["new_price"] or current_price
+        return template_reply("out_of_time", price=price) or f"Let me be straight with you: {price:g} GHS is where I stand. What do you say?"
+    
+    def regex_intent(self, user_message: str) -> Dict:
+        """What extract_intent_with_llm would return, guessed with the regex helpers"""
+        return {
+            "offered_price": self.extract_price_from_message(user_message),
+            "accepted_deal": self.has_acceptance_keyword(user_message),
+            "quantity": self.extract_quantity(user_message),
+        }
+    
+    def speculate(self, user_message: str, conversation_history: List[Dict], current_price: float,
+                  minimum_price: float, message_count: int) -> Optional["Speculation"]:
+        """Start generating the reply for the regex-guessed plan, if that reply would come from the LLM"""
+        guess = self.plan_turn(user_message, conversation_history, current_price, minimum_price,
+                               message_count, self.regex_intent(user_message))
+        if guess.situation == "accept_below_floor" or guess.situation in TEMPLATED_SITUATIONS:
+            return None
+        if reply_cache.ready(guess.cache_state):
+            return None
+        return Speculation(guess, self.generate_reply(guess.messages))
+    
+    async def generate_reply(self, messages: List[Dict], timeout: Optional[float] = None) -> str:
+        """One gpt-4o-mini reply for the prompt built in negotiate()"""
+        response = await asyncio.wait_for(self.client.chat.completions.create(
+            model="gpt-4o-mini",  # Better reasoning than gpt-3.5-turbo
+            messages=messages,
+            temperature=0.8,  # More creative and natural
+            max_tokens=150  # Allow slightly longer for natural responses
+        ), timeout)
+        return response.choices[0].message.content
+    
+    def plan_counter_offer(self, offered_price: Optional[float], asking_for_offer: bool,
+                           message_count: int, current_price: float) -> Tuple[float, str]:
+        """Counter-offer ladder: our next price and the instruction for the LLM reply"""
         counter_offer = current_price
         pricing_instruction = ""
         
@@ -179,30 +523,30 @@ Examples:
             # Calculate strategic offer based on conversation stage - MORE FLEXIBLE
             if message_count == 0:
                 # First time asking - give a good drop to show willingness
-                counter_offer = max(current_price - 35, ABSOLUTE_MINIMUM + 25)
+                counter_offer = max(current_price - 35, self.floor + 25)
                 pricing_instruction = f"They're asking for YOUR offer. Give them {counter_offer} GHS. Make it sound like a special deal just for them. Add some urgency or value."
             elif message_count < 3:
                 # Early stage - be more generous
-                counter_offer = max(current_price - 45, ABSOLUTE_MINIMUM + 15)
+                counter_offer = max(current_price - 45, self.floor + 15)
                 pricing_instruction = f"They want your best offer. Counter with {counter_offer} GHS. Mention it's a limited-time deal or add a bonus (free delivery/warranty extension)."
             elif message_count < 5:
                 # Mid stage - very flexible
-                counter_offer = max(current_price - 50, ABSOLUTE_MINIMUM + 10)
+                counter_offer = max(current_price - 50, self.floor + 10)
                 pricing_instruction = f"They're asking for your offer. Give {counter_offer} GHS as your 'final' offer. Make it compelling - mention another buyer or time sensitivity."
             else:
                 # Late stage - best offer
-                counter_offer = max(ABSOLUTE_MINIMUM + 5, ABSOLUTE_MINIMUM)
+                counter_offer = max(self.floor + 5, self.floor)
                 pricing_instruction = f"Give your rock-bottom offer: {counter_offer} GHS. This is your absolute final price. Make it clear this is the best you can do."
         
         elif offered_price:
             # Calculate gap first - needed for all logic below
             gap = current_price - offered_price
             
-            # ENFORCEMENT: Reject anything below ABSOLUTE_MINIMUM
-            if offered_price < ABSOLUTE_MINIMUM:
+            # ENFORCEMENT: Reject anything below self.floor
+            if offered_price < self.floor:
                 # Below 350 - HARD REJECTION, make them come up significantly
-                pricing_instruction = f"They offered {offered_price} GHS (way too low!). This is quality merchandise. Politely but firmly say you can't work with that price. Emphasize value and suggest they need to come up significantly. Counter with {ABSOLUTE_MINIMUM + 15} GHS."
-                counter_offer = max(ABSOLUTE_MINIMUM + 15, current_price - 40)
+                pricing_instruction = f"They offered {offered_price} GHS (way too low!). This is quality merchandise. Politely but firmly say you can't work with that price. Emphasize value and suggest they need to come up significantly. Counter with {self.floor + 15} GHS."
+                counter_offer = max(self.floor + 15, current_price - 40)
             
             # Check if offer is absurdly low (not serious)
             elif offered_price < 100:
@@ -212,151 +556,94 @@ Examples:
             
             elif offered_price < 300:
                 # Below 300 - emphasize quality, ask them to come up
-                pricing_instruction = f"They offered {offered_price} GHS (below 300!). Emphasize quality. Say something like: 'This is quality - 300 is already too low for this type of watch. If you can come up a bit, I can work with you.' STAY at {current_price} GHS."
+                pricing_instruction = f"They offered {offered_price} GHS (below 300!). Emphasize quality. Say something like: 'This is quality - 300 is already too low for this type of {self.product['name']}. If you can come up a bit, I can work with you.' STAY at {current_price} GHS."
                 counter_offer = current_price
             
             elif gap > 100:
                 # Way too far - but still drop a bit to show flexibility
-                counter_offer = max(current_price - 30, ABSOLUTE_MINIMUM + 25)
+                counter_offer = max(current_price - 30, self.floor + 25)
                 pricing_instruction = f"They offered {offered_price} GHS but you're at {current_price} GHS (gap too big!). Drop to {counter_offer} GHS to show you're willing to negotiate. Explain why it's worth it (quality, warranty, original)."
             
             elif message_count == 0:
                 # FIRST COUNTER - Be more generous to engage them
                 if gap > 50:
                     # Still far apart - drop more generously
-                    counter_offer = max(current_price - 40, ABSOLUTE_MINIMUM + 20)
+                    counter_offer = max(current_price - 40, self.floor + 20)
                     pricing_instruction = f"First offer: {offered_price} GHS. Counter with {counter_offer} GHS to show you're flexible and serious!"
                 elif gap > 30:
                     # Getting closer - drop moderately
-                    counter_offer = max(current_price - 25, ABSOLUTE_MINIMUM + 15)
+                    counter_offer = max(current_price - 25, self.floor + 15)
                     pricing_instruction = f"They offered {offered_price} GHS (decent). Counter {counter_offer} GHS. Be playful but flexible."
                 else:
                     # Very close - add 5-8 back, but check floor
-                    counter_offer = max(min(offered_price + 8, current_price), ABSOLUTE_MINIMUM)
+                    counter_offer = max(min(offered_price + 8, current_price), self.floor)
                     pricing_instruction = f"They offered {offered_price} GHS (close!). Counter {counter_offer} GHS. 'Nice try! How about {counter_offer}?'"
             
             elif message_count == 1 or message_count == 2:
                 # Messages 2-3: Be more flexible, drop prices more readily
                 if offered_price < current_price - 30:
                     # They're still low - drop a bit to show flexibility
-                    counter_offer = max(current_price - 30, ABSOLUTE_MINIMUM + 18)
+                    counter_offer = max(current_price - 30, self.floor + 18)
                     pricing_instruction = f"They're at {offered_price} GHS, you're at {current_price} GHS. Drop to {counter_offer} GHS to show flexibility. Highlight value (warranty, original, accessories)."
-                elif offered_price >= ABSOLUTE_MINIMUM + 10:
+                elif offered_price >= self.floor + 10:
                     # Good price and persistent - accept it (but only if above floor)
-                    counter_offer = max(offered_price, ABSOLUTE_MINIMUM)
+                    counter_offer = max(offered_price, self.floor)
                     pricing_instruction = f"They offered {offered_price} GHS (good!). ACCEPT! Say 'Deal! {offered_price} GHS it is! 👑' Celebrate the deal!"
                 else:
                     # Drop more generously but ENFORCE FLOOR
-                    counter_offer = max(current_price - 25, ABSOLUTE_MINIMUM + 10)
+                    counter_offer = max(current_price - 25, self.floor + 10)
                     pricing_instruction = f"Drop to {counter_offer} GHS to close the deal. Add bonus (free delivery/screen protector)."
             
             elif message_count == 3:
                 # Message 4: More flexible now
                 if offered_price < current_price - 20:
-                    counter_offer = max(current_price - 35, ABSOLUTE_MINIMUM + 12)
+                    counter_offer = max(current_price - 35, self.floor + 12)
                     pricing_instruction = f"Still at {offered_price} GHS vs {current_price} GHS. Drop to {counter_offer} GHS. Add urgency or value to close!"
                 else:
                     # Close enough, good drop but ENFORCE FLOOR
-                    counter_offer = max(current_price - 30, ABSOLUTE_MINIMUM + 8)
+                    counter_offer = max(current_price - 30, self.floor + 8)
                     pricing_instruction = f"Drop to {counter_offer} GHS. Mention it's your best price today!"
             
             elif message_count < 5:
                 # Messages 5+: Very flexible now but ENFORCE FLOOR
-                counter_offer = max(current_price - 40, ABSOLUTE_MINIMUM + 5)
+                counter_offer = max(current_price - 40, self.floor + 5)
                 pricing_instruction = f"Offer {counter_offer} GHS. This is getting close to your limit. Ask their budget."
             
             else:
                 # Message 6+: Final push - ABSOLUTE MINIMUM
-                counter_offer = max(ABSOLUTE_MINIMUM + 3, ABSOLUTE_MINIMUM)
+                counter_offer = max(self.floor + 3, self.floor)
                 pricing_instruction = f"Final offer: {counter_offer} GHS. Add urgency - another buyer, last chance! This is your rock-bottom price."
         
-        # Build conversational prompt
-        system_prompt = f"""You are "Bra Alex," a clever sales agent with personality and street smarts.
-
-PRODUCT: {self.product['name']} | CURRENT PRICE: {current_price} GHS
-
-YOUR PERSONALITY:
-- Witty and engaging - be yourself, have fun with it
-- Smart negotiator - you know how to read people
-- Use humor and emojis naturally (😅, 😄, 💪, 🔥)
-- Mix professional and casual language - whatever feels natural
-- React genuinely to what they say - if it's ridiculous, call it out!
-
-RESPONSE STYLE:
-- Keep it SHORT (2-3 sentences)
-- Be conversational and natural
-- Use wit, sarcasm, charm - whatever fits the moment
-- Don't be robotic - vary your language
-
-STAGE {message_count + 1} APPROACH:
-- Early: Confident, playful resistance
-- Mid: Show value, add sweeteners
-- Late: Get real about budgets, create urgency
-- Final: Close or walk away
-
-IMPORTANT: Actually READ what they're saying and respond naturally to it!
-
-WHEN THEY ACCEPT YOUR PRICE:
-Celebrate the deal! Use emojis and excitement. NO need to ask for contact details."""
-
-        # Build natural user context
-        if pricing_instruction:
-            user_context = f"""Customer: "{user_message}"
-
-{pricing_instruction}
-
-IMPORTANT: Actually respond to what they said! If it's absurd, call it out. If it's serious, negotiate. Be natural and engaging."""
-        elif quantity > 1:
-            bulk_price = max(int(current_price * 0.93), minimum_price)
-            user_context = f"""Customer: "{user_message}"
-
-They want {quantity} items. Offer bulk pricing around {bulk_price} GHS each - make it feel special."""
-        else:
-            user_context = f"""Customer: "{user_message}"
-
-Respond naturally. Current asking price: {current_price} GHS. Keep the conversation flowing."""
-        
-        # Build conversation for LLM with full context
-        messages = [
-            {"role": "system", "content": system_prompt},
-        ]
-        
-        # Add ALL conversation history for full context
-        for msg in conversation_history:
-            messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
-        
-        # Add current user message with pricing guidance
-        messages.append({"role": "user", "content": user_context})
-        
-        # Call LLM
-        try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Better reasoning than gpt-3.5-turbo
-                messages=messages,
-                temperature=0.8,  # More creative and natural
-                max_tokens=150  # Allow slightly longer for natural responses
-            )
-            
-            ai_message = response.choices[0].message.content
-            
-        except Exception as e:
-            # Fallback response if LLM fails
-            ai_message = "Having some technical issues, but this product is high quality. Let's continue - what's your best offer?"
-        
+        return counter_offer, pricing_instruction
+    
+    def template_situation(self, offered_price: Optional[float], user_accepted: bool,
+                           asking_for_offer: bool) -> Optional[str]:
+        """The reply_templates situation for this turn, if its reply is scripted (mirrors plan_counter_offer/finalize)"""
+        if offered_price and user_accepted and offered_price < self.floor:
+            return "accept_below_floor"
+        # A question ("price for 2 pieces?") whose number was read as an offer needs a real answer
+        if offered_price and not user_accepted and not asking_for_offer:
+            # Absurd first: with a floor above 100, below_floor would otherwise swallow it
+            if offered_price < 100:
+                return "absurd_offer"
+            if offered_price < self.floor:
+                return "below_floor"
+        return None
+    
+    def finalize(self, ai_message: str, offered_price: Optional[float], user_accepted: bool,
+                 counter_offer: float, current_price: float) -> Dict:
+        """Close the deal or move the price, enforcing the floor"""
         # Determine if deal should be closed
         deal_closed = False
         final_price = None
         new_price = current_price
         discount_pct = None
         
-        # HARD ENFORCEMENT: NEVER close a deal below ABSOLUTE_MINIMUM (350 GHS)
-        if offered_price and user_accepted and offered_price >= ABSOLUTE_MINIMUM:
+        # HARD ENFORCEMENT: NEVER close a deal below self.floor (350 GHS)
+        if offered_price and user_accepted and offered_price >= self.floor:
             # They accepted with a valid price (at or above 350)
             deal_closed = True
-            final_price = max(offered_price, ABSOLUTE_MINIMUM)  # Extra safety check
+            final_price = max(offered_price, self.floor)  # Extra safety check
             discount_pct = self.calculate_discount_percentage(
                 self.product['starting_price'], 
                 final_price
@@ -364,25 +651,25 @@ Respond naturally. Current asking price: {current_price} GHS. Keep the conversat
             
             # Add crown celebration if LLM didn't already celebrate
             if "deal" not in ai_message.lower() and "👑" not in ai_message:
-                ai_message += f"\n\n👑 DEAL CLOSED! {final_price} GHS - you got yourself a great watch! 🎉🔥"
-        elif offered_price and user_accepted and offered_price < ABSOLUTE_MINIMUM:
+                ai_message += f"\n\n👑 DEAL CLOSED! {final_price} GHS - you got yourself a great {self.product['name']}! 🎉🔥"
+        elif offered_price and user_accepted and offered_price < self.floor:
             # They tried to accept below minimum - REJECT and redirect
             deal_closed = False
-            ai_message = f"Wait, I think there's been a misunderstanding! I can't go below {ABSOLUTE_MINIMUM + 10} GHS for this quality product. If you can work with something around there, let me know!"
+            ai_message = template_reply("accept_below_floor", price=self.floor + 10) or f"Wait, I think there's been a misunderstanding! I can't go below {self.floor + 10} GHS for this quality product. If you can work with something around there, let me know!"
         
-        # IMPORTANT: Only update price if counter_offer is DIFFERENT, LOWER than current, and ABOVE ABSOLUTE_MINIMUM
+        # IMPORTANT: Only update price if counter_offer is DIFFERENT, LOWER than current, and ABOVE self.floor
         # This prevents price from bouncing around or going below our floor
-        elif counter_offer != current_price and counter_offer < current_price and counter_offer >= ABSOLUTE_MINIMUM:
+        elif counter_offer != current_price and counter_offer < current_price and counter_offer >= self.floor:
             # Never counter with a price LOWER than what user offered (that's backwards!)
             if offered_price and counter_offer < offered_price:
                 # User offered more than our counter - just accept theirs (if above floor)
-                if offered_price >= ABSOLUTE_MINIMUM:
+                if offered_price >= self.floor:
                     new_price = offered_price
                 else:
                     new_price = current_price  # Stay at current if their offer is below floor
             else:
                 # Ensure counter offer never goes below floor
-                new_price = max(counter_offer, ABSOLUTE_MINIMUM)
+                new_price = max(counter_offer, self.floor)
         # If staying firm (counter_offer == current_price), new_price stays same
         
         return {
@@ -392,4 +679,3 @@ Respond naturally. Current asking price: {current_price} GHS. Keep the conversat
             "new_price": new_price if new_price != current_price else None,
             "discount_percentage": discount_pct
         }
-
@@ -0,0 +1,277 @@
+"""
+Monthly range partitioning of conversation_messages on PostgreSQL
+
+Opt in with MESSAGE_PARTITIONING=monthly. Once the table is converted:
+- partitions for the next PARTITION_MONTHS_AHEAD months are created on startup
+  (and by `python partitions.py maintain`, which should also run from cron)
+- a DEFAULT partition catches messages for a month whose partition is missing
+  (maintain didn't run in time), so inserts never fail; creating that month's
+  partition later moves them out of it
+- message queries carry a `timestamp >= session.created_at` bound so Postgres
+  only scans the partitions a session can live in
+- old months are removed instantly with DETACH PARTITION (+ DROP) instead of
+  a huge DELETE. Run archive.py first so nothing still needed lives there.
+
+Usage:
+    python partitions.py status
+    python partitions.py convert            # one-off, run during low traffic
+    python partitions.py maintain
+    python partitions.py detach --older-than-months 12 [--drop]
+
+SQLite has no partitioning; everything here is a no-op there.
+"""
+
+import argparse
+import os
+import re
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from models import ConversationMessage
+
+MESSAGE_PARTITIONING = os.getenv("MESSAGE_PARTITIONING", "").lower() == "monthly"
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+COPY_BATCH_SIZE = 10000
+
+PARENT = "conversation_messages"
+DEFAULT_PARTITION = f"{PARENT}_default"
+MESSAGE_COLUMNS = "id, session_id, role, content, timestamp"
+PARTITION_NAME = re.compile(r"^conversation_messages_y(\d{4})m(\d{2})$")
+
+
+def month_start(d) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, months: int) -> date:
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start: date) -> str:
+    return f"{PARENT}_y{start.year:04d}m{start.month:02d}"
+
+
+def message_time_filter(session):
+    """
+    Extra WHERE clause that lets Postgres prune partitions for a session's
+    messages. Only applied when partitioning is enabled (converted rows always
+    have a timestamp; legacy SQLite rows may not).
+    """
+    if MESSAGE_PARTITIONING and session.created_at is not None:
+        return [ConversationMessage.timestamp >= session.created_at]
+    return []
+
+
+def is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('r', 'p')"),
+        {"name": PARENT}
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(conn) -> list:
+    """[(name, month_start)] of the monthly partitions, oldest first"""
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent
+    """), {"parent": PARENT}).scalars().all()
+
+    partitions = []
+    for name in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def table_exists(conn, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+
+
+def ensure_default_partition(conn) -> bool:
+    """Create the DEFAULT partition (rows for months without their own partition) if it's missing"""
+    if table_exists(conn, DEFAULT_PARTITION):
+        return False
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+    print(f"📝 Created partition {DEFAULT_PARTITION}")
+    return True
+
+
+def create_partition(conn, start: date) -> bool:
+    """Create the partition for the month starting at `start` if it's missing"""
+    name = partition_name(start)
+    if table_exists(conn, name):
+        return False
+    end = add_months(start, 1)
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    in_month = f"timestamp >= '{start.isoformat()}' AND timestamp < '{end.isoformat()}'"
+    stray = 0
+    if table_exists(conn, DEFAULT_PARTITION):
+        stray = conn.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE {in_month}")).scalar()
+    if stray:
+        # The month's rows landed in the default partition while its partition was missing;
+        # Postgres refuses the new partition while they are there, so move them over
+        conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}"))
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT} {bounds}"))
+        conn.execute(text(
+            f"INSERT INTO {name} ({MESSAGE_COLUMNS}) "
+            f"SELECT {MESSAGE_COLUMNS} FROM {DEFAULT_PARTITION} WHERE {in_month}"
+        ))
+        conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+        conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        print(f"📝 Created partition {name} ({stray} messages moved from {DEFAULT_PARTITION})")
+    else:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} {bounds}"))
+        print(f"📝 Created partition {name}")
+    return True
+
+
+def ensure_partitions(conn, months_ahead: int = PARTITION_MONTHS_AHEAD, start: date = None) -> int:
+    """Make sure partitions exist from `start` (default: this month) to `months_ahead` months out"""
+    if not is_partitioned(conn):
+        return 0
+    first = month_start(start or datetime.utcnow())
+    last = add_months(month_start(datetime.utcnow()), months_ahead)
+    created = int(ensure_default_partition(conn))
+    current = first
+    while current <= last:
+        created += create_partition(conn, current)
+        current = add_months(current, 1)
+    return created
+
+
+def convert_to_partitioned(engine, batch_size: int = COPY_BATCH_SIZE):
+    """
+    One-off conversion of a plain conversation_messages table into a monthly
+    partitioned one. The swap is a quick metadata-only transaction; rows are
+    then copied over in committed batches while new messages already land in
+    the partitioned table. The old table is kept as conversation_messages_legacy
+    until you drop it.
+    """
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Partitioning is only supported on PostgreSQL")
+
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            print("✅ conversation_messages is already partitioned")
+            return
+
+        conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        oldest = conn.execute(text(f"SELECT MIN(timestamp) FROM {PARENT}")).scalar()
+
+        conn.execute(text(f"ALTER TABLE {PARENT} RENAME TO {PARENT}_legacy"))
+        for index in conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = :t"
+        ), {"t": f"{PARENT}_legacy"}).scalars().all():
+            conn.execute(text(f"ALTER INDEX {index} RENAME TO {index}_legacy"))
+
+        # The primary key of a partitioned table must include the partition key
+        conn.execute(text(f"""
+            CREATE TABLE {PARENT} (
+                id INTEGER NOT NULL DEFAULT nextval('{PARENT}_id_seq'),
+                session_id INTEGER NOT NULL REFERENCES chat_sessions(id),
+                role VARCHAR NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """))
+        conn.execute(text(f"ALTER SEQUENCE {PARENT}_id_seq OWNED BY {PARENT}.id"))
+        conn.execute(text(
+            f"CREATE INDEX ix_{PARENT}_session_id_timestamp ON {PARENT} (session_id, timestamp)"
+        ))
+        ensure_partitions(conn, start=oldest or datetime.utcnow())
+
+    print("🔄 Copying existing messages into partitions...")
+    copied = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(f"""
+                INSERT INTO {PARENT} (id, session_id, role, content, timestamp)
+                SELECT id, session_id, role, content, COALESCE(timestamp, now() AT TIME ZONE 'utc')
+                FROM {PARENT}_legacy WHERE id > :last_id ORDER BY id LIMIT :n
+                RETURNING id
+            """), {"last_id": last_id, "n": batch_size}).scalars().all()
+        if not rows:
+            break
+        copied += len(rows)
+        last_id = max(rows)
+    print(f"✅ Copied {copied} messages. Drop {PARENT}_legacy once you've verified the data.")
+
+
+def detach_old_partitions(engine, older_than_months: int, drop: bool = False) -> list:
+    """
+    Detach (and optionally drop) monthly partitions entirely older than
+    `older_than_months` months. Detaching is a metadata change, so removing a
+    month of messages takes milliseconds instead of a table-wide DELETE.
+    """
+    cutoff = add_months(month_start(datetime.utcnow()), -older_than_months)
+    removed = []
+    # DETACH ... CONCURRENTLY can't run inside a transaction block
+    with engine.connect() as raw:
+        conn = raw.execution_options(isolation_level="AUTOCOMMIT")
+        if not is_partitioned(conn):
+            return removed
+        concurrently = conn.dialect.server_version_info >= (14,)
+        for name, start in list_partitions(conn):
+            if add_months(start, 1) > cutoff:
+                continue
+            mode = " CONCURRENTLY" if concurrently else ""
+            conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}{mode}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+            print(f"📝 {'Dropped' if drop else 'Detached'} partition {name}")
+            removed.append(name)
+    return removed
+
+
+def maintain(engine) -> int:
+    """Create upcoming partitions (safe to run often)"""
+    if engine.dialect.name != "postgresql":
+        return 0
+    with engine.begin() as conn:
+        return ensure_partitions(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage conversation_messages partitions")
+    parser.add_argument("command", choices=["status", "convert", "maintain", "detach"])
+    parser.add_argument("--older-than-months", type=int, default=12)
+    parser.add_argument("--drop", action="store_true", help="Drop detached partitions")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from database import engine
+
+    if args.command == "convert":
+        convert_to_partitioned(engine)
+    elif args.command == "maintain":
+        print(f"✅ Created {maintain(engine)} partition(s)")
+    elif args.command == "detach":
+        removed = detach_old_partitions(engine, args.older_than_months, drop=args.drop)
+        print(f"✅ Removed {len(removed)} partition(s)")
+    else:
+        with engine.connect() as conn:
+            if not is_partitioned(conn):
+                print("conversation_messages is not partitioned")
+                return
+            for name, start in list_partitions(conn):
+                print(f"  {name}  ({start.isoformat()})")
+            if table_exists(conn, DEFAULT_PARTITION):
+                stray = conn.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}")).scalar()
+                print(f"  {DEFAULT_PARTITION}  ({stray} messages without a monthly partition)")
+            else:
+                print(f"⚠️  No {DEFAULT_PARTITION} - run `python partitions.py maintain`")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+On-demand profiling of single /api/chat requests
+
+A request is profiled when it carries `X-Profile: <ADMIN_TOKEN>` or, with
+PROFILE_SAMPLE_RATE > 0, when it is picked at random. A sampler thread then
+records the request's stack every PROFILE_INTERVAL_MS until it finishes:
+- while the request's task runs on the event loop: the loop thread's Python
+  stack (DB calls, JSON, engine logic...)
+- while the task is suspended: its await chain ending in `[awaiting]`, so time
+  spent waiting on OpenAI or the database shows up too (wall-clock profile)
+
+Samples are written to PROFILE_DIR in the folded-stack format
+("frame;frame;frame count" per line) read by flamegraph.pl, speedscope and
+inferno. Only the newest PROFILE_MAX_FILES are kept. The response carries
+X-Profile-ID; fetch the file from /api/admin/profiles/{id} with the
+X-Admin-Token header.
+
+The admin event stream can't send headers (EventSource), so the dashboard
+trades the token for a signed, HttpOnly cookie scoped to that one path
+(POST /api/admin/session). The cookie holds only an expiry and its HMAC under
+ADMIN_TOKEN, so it stops working when it expires or the token is rotated.
+
+When a request isn't profiled nothing runs beyond a header lookup and, with
+sampling on, one random() call.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+from fastapi import HTTPException, Request
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+ADMIN_SESSION_SECONDS = int(os.getenv("ADMIN_SESSION_SECONDS", str(12 * 3600)))
+ADMIN_COOKIE = "admin_events"
+ADMIN_COOKIE_PATH = "/api/admin/events"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_HEADER = "x-profile"
+PROFILE_SUFFIX = ".folded"
+
+
+def is_admin_token(value: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and value is not None and hmac.compare_digest(value, ADMIN_TOKEN)
+
+
+def _cookie_signature(expires: int) -> str:
+    return hmac.new(ADMIN_TOKEN.encode(), f"{ADMIN_COOKIE}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def admin_cookie_value() -> str:
+    """A cookie value that authenticates as admin for ADMIN_SESSION_SECONDS"""
+    expires = int(time.time()) + ADMIN_SESSION_SECONDS
+    return f"{expires}.{_cookie_signature(expires)}"
+
+
+def is_admin_cookie(value: Optional[str]) -> bool:
+    if not ADMIN_TOKEN or not value:
+        return False
+    expires, _, signature = value.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _cookie_signature(int(expires)))
+
+
+def require_admin(request: Request, allow_cookie: bool = False):
+    """
+    Reject requests without the admin token (admin API disabled when ADMIN_TOKEN is unset).
+    allow_cookie also accepts the signed ADMIN_COOKIE, for clients that can't set
+    headers (EventSource).
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    token = request.headers.get("x-admin-token")
+    if token is None and allow_cookie and is_admin_cookie(request.cookies.get(ADMIN_COOKIE)):
+        return
+    if not is_admin_token(token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def should_profile(request: Request) -> bool:
+    header = request.headers.get(PROFILE_HEADER)
+    if header is not None:
+        return is_admin_token(header)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _await_chain(coro) -> List[str]:
+    """Outermost-first frames of a suspended coroutine's await chain"""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(_frame_label(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None)
+    return frames
+
+
+class RequestProfiler:
+    """Samples one asyncio task from a background thread"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples = Counter()
+        self._task = asyncio.current_task()
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._root_code = self._task.get_coro().cr_frame.f_code
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{name}", daemon=True)
+
+    def _sample(self):
+        if asyncio.current_task(self._loop) is self._task:
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                if frame.f_code is self._root_code:
+                    break
+                frame = frame.f_back
+            stack.reverse()
+        else:
+            stack = _await_chain(self._task.get_coro()) + ["[awaiting]"]
+        if stack:
+            self.samples[";".join(stack)] += 1
+
+    def _run(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        while not self._stop.wait(interval):
+            self._sample()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        try:
+            self.save()
+        except OSError as e:
+            print(f"⚠️  Could not save profile {self.name}: {e}")
+        return False
+
+    def save(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, self.name + PROFILE_SUFFIX)
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        _prune()
+
+
+def _prune():
+    files = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(PROFILE_SUFFIX)),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in files[:-PROFILE_MAX_FILES]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def profile_name(request_id: str) -> str:
+    # request_id may come from the client's X-Request-ID - keep it filename-safe
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9_-]', '', request_id)[:64]}"
+
+
+def list_profiles() -> List[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.name.endswith(PROFILE_SUFFIX):
+            stat = entry.stat()
+            profiles.append({
+                "id": entry.name[:-len(PROFILE_SUFFIX)],
+                "size": stat.st_size,
+                "created_at": stat.st_mtime,
+            })
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """Path of a stored profile (None for unknown ids - never leaves PROFILE_DIR)"""
+    if os.path.basename(profile_id) != profile_id or profile_id.startswith("."):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + PROFILE_SUFFIX)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,189 @@
+"""
+Rate limiting for /api/chat
+
+Every chat turn costs two OpenAI calls, so chat() checks these token buckets
+before touching the database or the LLM and answers 429 (with Retry-After) when
+one is empty:
+- RATE_LIMIT_PER_IP          per client IP (catches scripts rotating session_ids)
+- RATE_LIMIT_PER_SESSION     per session_id
+The share-code bucket limits new challenge sessions instead of turns: it is
+spent once per session created with that code as referred_by, so a player's
+own turns (and INIT_GREETING repeats) never drain their referrer's code:
+- RATE_LIMIT_PER_SHARE_CODE  per challenge share code sent as referred_by
+
+Limits are "<requests>/<seconds>": a bucket holds <requests> tokens (the burst)
+and refills at <requests>/<seconds> per second. "0" or "" disables a limit.
+
+RATE_LIMIT_BACKEND picks where buckets live:
+- memory (default): this worker's memory, an LRU capped at RATE_LIMIT_MAX_KEYS
+  keys. With N workers a client can get up to N times the limit.
+- db: the rate_limit_buckets table, one atomic upsert per key, so all workers
+  share the limits (costs one short transaction per request).
+- off: no limiting.
+
+Client IPs come from X-Forwarded-For when TRUSTED_PROXY_HOPS > 0 (Railway puts
+one proxy in front of the app): the entry that many hops from the right is the
+one our proxy saw, so clients can't spoof it by sending their own header.
+"""
+
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_PER_IP = os.getenv("RATE_LIMIT_PER_IP", "30/60")
+RATE_LIMIT_PER_SESSION = os.getenv("RATE_LIMIT_PER_SESSION", "20/60")
+RATE_LIMIT_PER_SHARE_CODE = os.getenv("RATE_LIMIT_PER_SHARE_CODE", "200/3600")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+# db backend: share of requests that also delete buckets idle long enough to be full again
+PRUNE_PROBABILITY = 0.001
+
+
+class Limit:
+    def __init__(self, scope: str, spec: str):
+        self.scope = scope
+        requests, _, seconds = spec.partition("/")
+        self.capacity = float(requests)
+        self.window = float(seconds or 1)
+        self.rate = self.capacity / self.window  # tokens per second
+
+    def retry_after(self, tokens: float) -> float:
+        return (1 - tokens) / self.rate
+
+
+def parse_limits() -> list:
+    limits = []
+    for scope, spec in (("ip", RATE_LIMIT_PER_IP), ("session", RATE_LIMIT_PER_SESSION),
+                        ("share_code", RATE_LIMIT_PER_SHARE_CODE)):
+        spec = spec.strip()
+        if spec and spec != "0":
+            limits.append(Limit(scope, spec))
+    return limits
+
+
+class MemoryBuckets:
+    """Token buckets in an LRU; evicting an idle bucket only refills it early"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+
+    def take(self, key: str, limit: Limit) -> Optional[float]:
+        """Spend one token; returns seconds to wait when the bucket is empty"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [limit.capacity, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return limit.retry_after(bucket[0])
+        bucket[0] -= 1
+        return None
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class DatabaseBuckets:
+    """Token buckets in rate_limit_buckets, updated with one upsert per key"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        least = "LEAST" if engine.dialect.name == "postgresql" else "MIN"
+        refilled = (f"{least}(:capacity, rate_limit_buckets.tokens + "
+                    f"(:now - rate_limit_buckets.updated_at) * :rate)")
+        # Every SET expression sees the old row, so `allowed` and `tokens` agree
+        self._take_sql = text(f"""
+            INSERT INTO rate_limit_buckets (key, tokens, updated_at, allowed)
+            VALUES (:key, :capacity - 1, :now, :true)
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = CASE WHEN {refilled} >= 1 THEN {refilled} - 1 ELSE {refilled} END,
+                updated_at = :now,
+                allowed = {refilled} >= 1
+            RETURNING allowed, tokens
+        """)
+        self._prune_sql = text("DELETE FROM rate_limit_buckets WHERE updated_at < :cutoff")
+        self._longest_window = 0.0
+
+    def take_all(self, keyed_limits) -> Optional[Tuple[str, float]]:
+        now = time.time()
+        denied = None
+        with self.engine.begin() as conn:
+            for key, limit in keyed_limits:
+                self._longest_window = max(self._longest_window, limit.window)
+                allowed, tokens = conn.execute(self._take_sql, {
+                    "key": key, "capacity": limit.capacity, "rate": limit.rate,
+                    "now": now, "true": True
+                }).one()
+                if not allowed and denied is None:
+                    denied = (limit.scope, limit.retry_after(tokens))
+            if random.random() < PRUNE_PROBABILITY:
+                # A bucket idle for a whole window is full again - the row adds nothing
+                conn.execute(self._prune_sql, {"cutoff": now - self._longest_window})
+        return denied
+
+
+class RateLimiter:
+    def __init__(self, backend: str = RATE_LIMIT_BACKEND):
+        self.limits = parse_limits()
+        self.backend = backend
+        self._memory = MemoryBuckets() if backend == "memory" else None
+        self._db = None
+        if backend == "db":
+            from database import engine
+            self._db = DatabaseBuckets(engine)
+        elif backend not in ("memory", "off"):
+            print(f"⚠️  Unknown RATE_LIMIT_BACKEND={backend!r} - rate limiting disabled")
+            self.backend = "off"
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != "off" and bool(self.limits)
+
+    def check(self, ip: Optional[str], session_id: str) -> Optional[Tuple[str, float]]:
+        """
+        Spend a token from the per-turn buckets. Returns (scope, retry_after
+        seconds) for the first empty one, or None when the request may proceed.
+        """
+        return self._take({"ip": ip, "session": session_id})
+
+    def check_new_session(self, share_code: Optional[str]) -> Optional[Tuple[str, float]]:
+        """Spend a share-code token for a session about to be created (same return as check())"""
+        return self._take({"share_code": share_code})
+
+    def _take(self, values: dict) -> Optional[Tuple[str, float]]:
+        keyed = [(f"{limit.scope}:{values[limit.scope]}", limit)
+                 for limit in self.limits if values.get(limit.scope)]
+        if not keyed:
+            return None
+        if self._db is not None:
+            return self._db.take_all(keyed)
+        denied = None
+        for key, limit in keyed:
+            wait = self._memory.take(key, limit)
+            if wait is not None and denied is None:
+                denied = (limit.scope, wait)
+        return denied
+
+
+def client_ip(request) -> Optional[str]:
+    if TRUSTED_PROXY_HOPS > 0:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.split(",")]
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else None
+
+
+rate_limiter = RateLimiter()
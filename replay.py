@@ -0,0 +1,427 @@
+"""
+Offline replay: re-run stored conversations through a changed negotiation policy
+
+Streams sessions from chat_sessions (keyset pages, messages loaded per page
+from conversation_messages and conversation_archives) and feeds every stored
+user turn into two policies, a baseline and a candidate, exactly as
+/api/chat would: same history, the session's own starting and minimum price,
+and the same floor checks as chat_turn. Pages are spread over a process pool.
+
+A policy is a NegotiationEngine class:
+- git:<ref>               negotiation_engine.py as committed at <ref>
+- <module>[:Class]        an importable module, e.g. negotiation_engine
+- <path.py>[:Class]       a file anywhere
+By default the working tree (candidate) is compared with git:HEAD (baseline),
+i.e. exactly the uncommitted changes to negotiate().
+
+The LLM is never the live API unless asked (--llm):
+- mock (default): intent parsed by mock_llm.extract_intent, and each reply is
+  the assistant message that was actually stored for that turn
+- record: call OpenAI and append every response to --recording
+- recorded: answer from --recording; requests not in it fall back to mock and
+  are counted as misses
+Replies don't move prices - only the intent and the policy's own logic do -
+so mock mode is enough to compare pricing logic.
+
+Output: one JSON line per session in replay_results/ (recorded, baseline and
+candidate outcomes, and whether they differ), a sample of changed sessions,
+and aggregate deltas with throughput in sessions/s.
+
+Usage:
+    python replay.py
+    python replay.py --baseline git:main --limit 5000 --processes 4
+    python replay.py --candidate experiments/engine_v2.py --llm recorded --recording llm.jsonl
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+os.environ.setdefault("TRACE_EXPORTER", "none")
+# Replies don't affect prices; cached ones would only mix other sessions' lines in
+os.environ.setdefault("REPLY_CACHE_VARIANTS", "0")
+# One reply call per turn, so recorded replies line up with the turns that asked for them
+os.environ.setdefault("SPECULATIVE_REPLY", "0")
+
+RESULTS_DIR = "replay_results"
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTCOME_FIELDS = ("deal_closed", "final_price", "price", "closed_at_turn")
+
+
+# ==================== POLICIES ====================
+
+def resolve_policy(spec: str, workdir: str) -> str:
+    """Turn git:<ref> into a file spec the workers can load (done once, in the parent)"""
+    if not spec.startswith("git:"):
+        return spec
+    ref = spec[4:]
+    source = subprocess.run(["git", "show", f"{ref}:negotiation_engine.py"], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    safe_ref = "".join(c if c.isalnum() else "_" for c in ref)
+    path = os.path.join(workdir, f"negotiation_engine_{safe_ref}.py")
+    with open(path, "w") as f:
+        f.write(source)
+    return path
+
+
+def load_policy(spec: str, label: str):
+    target, class_name = spec, "NegotiationEngine"
+    if ":" in spec and not spec.endswith(".py"):
+        target, class_name = spec.rsplit(":", 1)
+    if target.endswith(".py"):
+        module_spec = importlib.util.spec_from_file_location(f"replay_{label}", target)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(target)
+    return getattr(module, class_name)
+
+
+# ==================== LLM ====================
+
+class ReplayLLM:
+    """Stands in for the OpenAI client (see --llm in the module docstring)"""
+
+    def __init__(self, mode: str, recording: Dict[str, str]):
+        self.mode = mode
+        self.recording = recording
+        self.new_recordings = {}
+        self.stored_reply = None  # The assistant message stored for the turn being replayed
+        self.misses = 0
+        self.chat = SimpleNamespace(completions=self)
+        self._live = None
+
+    @staticmethod
+    def key(model: str, messages: list, response_format) -> str:
+        return hashlib.sha1(json.dumps([model, messages, response_format], sort_keys=True).encode()).hexdigest()
+
+    async def create(self, model, messages, response_format=None, **kwargs):
+        key = self.key(model, messages, response_format)
+        if self.mode == "record":
+            if self._live is None:
+                from negotiation_engine import require_api_key, shared_client
+                self._live = shared_client(require_api_key())
+            response = await self._live.chat.completions.create(
+                model=model, messages=messages, response_format=response_format, **kwargs
+            )
+            content = response.choices[0].message.content
+            self.new_recordings[key] = content
+        elif self.mode == "recorded" and key in self.recording:
+            content = self.recording[key]
+        else:
+            if self.mode == "recorded":
+                self.misses += 1
+            if response_format:
+                from mock_llm import extract_intent
+                content = extract_intent(messages[-1]["content"])
+            else:
+                content = self.stored_reply or ""
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def load_recording(path: Optional[str]) -> Dict[str, str]:
+    recording = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                recording[entry["key"]] = entry["content"]
+    return recording
+
+
+# ==================== WORKERS ====================
+
+_worker = {}
+
+
+def init_worker(policy_specs: Dict[str, str], llm_mode: str, recording_path: Optional[str]):
+    if llm_mode != "record":
+        os.environ.setdefault("OPENAI_API_KEY", "replay")
+    _worker["policies"] = {label: load_policy(spec, label) for label, spec in policy_specs.items()}
+    _worker["llm"] = ReplayLLM(llm_mode, load_recording(recording_path) if llm_mode == "recorded" else {})
+    _worker["engines"] = {}
+    _worker["loop"] = asyncio.new_event_loop()
+
+
+def engine_for(label: str, slug: str, config: dict):
+    engine = _worker["engines"].get((label, slug))
+    if engine is None:
+        engine = _worker["policies"][label](config)
+        engine._client = _worker["llm"]
+        _worker["engines"][(label, slug)] = engine
+    return engine
+
+
+async def replay_session(engine, session: dict, llm: ReplayLLM) -> dict:
+    """One stored conversation through one policy, applying chat_turn's floor checks"""
+    floor = session["floor_price"]
+    price = session["starting_price"]
+    outcome = {"deal_closed": False, "final_price": None, "price": price, "closed_at_turn": None}
+    history = []
+    turn = 0
+    messages = session["messages"]
+    for i, (role, content) in enumerate(messages):
+        history.append({"role": role, "content": content})
+        if role != "user":
+            continue
+        turn += 1
+        following = messages[i + 1] if i + 1 < len(messages) else None
+        llm.stored_reply = following[1] if following and following[0] == "assistant" else None
+        result = await engine.negotiate(
+            user_message=content,
+            conversation_history=list(history),
+            current_price=price,
+            minimum_price=session["minimum_price"]
+        )
+        if result["deal_closed"] and result["final_price"] >= floor:
+            outcome.update(deal_closed=True, final_price=result["final_price"], closed_at_turn=turn)
+            break  # Later messages would only get "We already made a deal!"
+        if not result["deal_closed"] and result.get("new_price"):
+            price = max(result["new_price"], floor)
+        outcome["price"] = price
+    return outcome
+
+
+def replay_page(page: dict) -> dict:
+    llm = _worker["llm"]
+    loop = _worker["loop"]
+    misses_before = llm.misses
+    results = []
+    turns = 0
+    for session in page["sessions"]:
+        config = page["products"][session["product"]]
+        outcomes = {}
+        for label in _worker["policies"]:
+            engine = engine_for(label, session["product"], config)
+            outcomes[label] = loop.run_until_complete(replay_session(engine, session, llm))
+        turns += sum(1 for role, _ in session["messages"] if role == "user")
+        baseline, candidate = outcomes["baseline"], outcomes["candidate"]
+        results.append({
+            "session_id": session["session_id"],
+            "product": session["product"],
+            "floor_price": session["floor_price"],
+            "recorded": session["recorded"],
+            "baseline": baseline,
+            "candidate": candidate,
+            "changed": any(baseline[field] != candidate[field] for field in OUTCOME_FIELDS),
+        })
+    recordings, llm.new_recordings = llm.new_recordings, {}
+    return {"results": results, "turns": turns, "llm_misses": llm.misses - misses_before, "recordings": recordings}
+
+
+# ==================== SESSIONS ====================
+
+def load_page_messages(db, session_ids: List[int]) -> Dict[int, list]:
+    """Messages of a page of sessions in two queries: archived first, then hot (as load_messages)"""
+    from models import ConversationArchive, ConversationMessage
+    messages = defaultdict(list)
+    for session_id, payload in db.query(ConversationArchive.session_id, ConversationArchive.payload).filter(
+        ConversationArchive.session_id.in_(session_ids)
+    ):
+        # unpack_messages without the datetime parsing - timestamps aren't needed here
+        messages[session_id].extend((m["role"], m["content"]) for m in json.loads(zlib.decompress(payload)))
+    for session_id, role, content in db.query(
+        ConversationMessage.session_id, ConversationMessage.role, ConversationMessage.content
+    ).filter(
+        ConversationMessage.session_id.in_(session_ids)
+    ).order_by(ConversationMessage.session_id, ConversationMessage.timestamp, ConversationMessage.id):
+        messages[session_id].append((role, content))
+    return messages
+
+
+def stream_pages(page_size: int, limit: Optional[int], since: Optional[datetime]) -> Iterator[dict]:
+    """Pages of sessions with at least one user message, oldest first"""
+    from catalog import Catalog
+    from database import read_session
+    from models import ChatSession
+
+    catalog = Catalog()
+    db = read_session()
+    try:
+        last_id, sent = 0, 0
+        while limit is None or sent < limit:
+            query = db.query(ChatSession).filter(ChatSession.id > last_id)
+            if since:
+                query = query.filter(ChatSession.created_at >= since)
+            rows = query.order_by(ChatSession.id).limit(page_size).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            messages = load_page_messages(db, [row.id for row in rows])
+            page = {"sessions": [], "products": {}}
+            for row in rows:
+                transcript = messages.get(row.id)
+                if not transcript or not any(role == "user" for role, _ in transcript):
+                    continue
+                product = catalog.get(db, row.product_id)
+                page["products"][product.slug] = product.config
+                page["sessions"].append({
+                    "session_id": row.session_id,
+                    "product": product.slug,
+                    "floor_price": product.floor_price,
+                    "starting_price": row.starting_price,
+                    "minimum_price": row.minimum_price,
+                    "messages": transcript,
+                    "recorded": {"deal_closed": bool(row.deal_closed), "final_price": row.final_price,
+                                 "price": row.current_price},
+                })
+                sent += 1
+                if limit is not None and sent >= limit:
+                    break
+            if page["sessions"]:
+                yield page
+    finally:
+        db.close()
+
+
+# ==================== REPORT ====================
+
+class Summary:
+    def __init__(self):
+        self.sessions = 0
+        self.turns = 0
+        self.changed = 0
+        self.llm_misses = 0
+        self.deals = defaultdict(int)
+        self.revenue = defaultdict(float)
+        self.close_turns = defaultdict(int)
+        self.gained = 0
+        self.lost = 0
+        self.both_closed = 0
+        self.price_delta = 0.0
+        self.turns_delta = 0
+        self.floor_violations = 0
+
+    def add(self, result: dict):
+        self.sessions += 1
+        self.changed += result["changed"]
+        for label in ("recorded", "baseline", "candidate"):
+            outcome = result[label]
+            if outcome["deal_closed"]:
+                self.deals[label] += 1
+                self.revenue[label] += outcome["final_price"] or 0
+                self.close_turns[label] += outcome.get("closed_at_turn") or 0
+        baseline, candidate = result["baseline"], result["candidate"]
+        if candidate["deal_closed"] and not baseline["deal_closed"]:
+            self.gained += 1
+        elif baseline["deal_closed"] and not candidate["deal_closed"]:
+            self.lost += 1
+        elif baseline["deal_closed"] and candidate["deal_closed"]:
+            self.both_closed += 1
+            self.price_delta += candidate["final_price"] - baseline["final_price"]
+            self.turns_delta += candidate["closed_at_turn"] - baseline["closed_at_turn"]
+        if candidate["deal_closed"] and candidate["final_price"] < result["floor_price"]:
+            self.floor_violations += 1
+
+    def print(self, elapsed: float):
+        print(f"\n[*] {self.sessions} sessions, {self.turns} turns in {elapsed:.1f}s  "
+              f"({self.sessions / elapsed:.0f} sessions/s, {self.turns / elapsed:.0f} turns/s)\n")
+        print(f"  {'':<12}{'deals':>8}{'deal rate':>11}{'avg price':>11}{'revenue':>12}{'turns to close':>16}")
+        for label in ("recorded", "baseline", "candidate"):
+            deals = self.deals[label]
+            avg = f"{self.revenue[label] / deals:9.1f}" if deals else f"{'-':>9}"
+            turns = f"{self.close_turns[label] / deals:14.1f}" if deals and label != "recorded" else f"{'-':>14}"
+            print(f"  {label:<12}{deals:>8}{deals / max(self.sessions, 1):>10.1%}{avg:>11}"
+                  f"{self.revenue[label]:>12.0f}{turns:>16}")
+        print(f"\n  changed sessions {self.changed} ({self.changed / max(self.sessions, 1):.1%}): "
+              f"{self.gained} deals gained, {self.lost} lost")
+        if self.both_closed:
+            print(f"  closed by both: {self.both_closed}, final price {self.price_delta / self.both_closed:+.1f} GHS, "
+                  f"{self.turns_delta / self.both_closed:+.2f} turns on average")
+        revenue_delta = self.revenue["candidate"] - self.revenue["baseline"]
+        print(f"  revenue {revenue_delta:+.0f} GHS vs baseline")
+        if self.llm_misses:
+            print(f"  [INFO] {self.llm_misses} LLM requests were not in the recording (answered by the mock)")
+        if self.floor_violations:
+            print(f"\n❌ {self.floor_violations} candidate deal(s) closed below the product's floor")
+
+
+def describe(outcome: dict) -> str:
+    if outcome["deal_closed"]:
+        return f"deal {outcome['final_price']:g} @ turn {outcome['closed_at_turn']}"
+    return f"open at {outcome['price']:g}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored conversations through a changed negotiation policy")
+    parser.add_argument("--baseline", default="git:HEAD", help="Policy to compare against (default git:HEAD)")
+    parser.add_argument("--candidate", default="negotiation_engine", help="Policy under test (default: working tree)")
+    parser.add_argument("--llm", choices=["mock", "record", "recorded"], default="mock")
+    parser.add_argument("--recording", default=os.path.join(RESULTS_DIR, "llm_recording.jsonl"))
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--page-size", type=int, default=200, help="Sessions per page sent to a worker")
+    parser.add_argument("--limit", type=int, default=None, help="Replay at most this many sessions")
+    parser.add_argument("--since-days", type=float, default=None, help="Only sessions created in the last N days")
+    parser.add_argument("--show", type=int, default=10, help="Changed sessions to print")
+    parser.add_argument("--out", default=None, help="Per-session JSONL (default replay_results/<timestamp>.jsonl)")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    policies = {"baseline": resolve_policy(args.baseline, workdir),
+                "candidate": resolve_policy(args.candidate, workdir)}
+    since = datetime.utcnow() - timedelta(days=args.since_days) if args.since_days else None
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".jsonl")
+    recording_file = open(args.recording, "a") if args.llm == "record" else None
+
+    print(f"[*] Replaying {args.candidate} against {args.baseline} (LLM: {args.llm}, {args.processes} processes)")
+    summary = Summary()
+    shown = 0
+    started = time.perf_counter()
+    # spawn: forked workers would share the parent's database connections
+    with ProcessPoolExecutor(args.processes, mp_context=get_context("spawn"), initializer=init_worker,
+                             initargs=(policies, args.llm, args.recording)) as pool, open(out, "w") as results_file:
+        pending = set()
+
+        def collect(done):
+            nonlocal shown
+            for future in done:
+                page = future.result()
+                summary.turns += page["turns"]
+                summary.llm_misses += page["llm_misses"]
+                for key, content in page["recordings"].items():
+                    recording_file.write(json.dumps({"key": key, "content": content}) + "\n")
+                for result in page["results"]:
+                    summary.add(result)
+                    results_file.write(json.dumps(result) + "\n")
+                    if result["changed"] and shown < args.show:
+                        shown += 1
+                        print(f"  {result['session_id'][:36]:<38}{describe(result['baseline']):<24} -> "
+                              f"{describe(result['candidate'])}")
+
+        # At most two pages per process in flight: the sessions stream, they're never all in memory
+        for page in stream_pages(args.page_size, args.limit, since):
+            pending.add(pool.submit(replay_page, page))
+            if len(pending) >= args.processes * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(pending)
+    if recording_file:
+        recording_file.close()
+
+    summary.print(time.perf_counter() - started)
+    print(f"\n[INFO] Per-session results saved to {out}")
+    if summary.floor_violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Reply cache keyed by negotiation state
+
+When the engine gives the LLM a pricing instruction ("They offered 300 GHS...
+Counter with 410 GHS"), the reply is driven by that instruction far more than
+by the buyer's exact words, and many buyers land in the same state. Those
+replies are cached by state instead of text:
+- key: product, stage (user message count), the instruction with its numbers
+  masked (i.e. the ladder branch), which of its numbers are equal, the offer
+  band (how far the offer is below our price, in 10% steps) and whether the
+  buyer accepted (a "deal!" turn reads differently from a counter-offer)
+- value: a pool of up to REPLY_CACHE_VARIANTS generated replies, so buyers in
+  the same state don't all read the same line
+
+A cached reply is shown to other buyers, so only template-shaped replies are
+kept:
+- numbers are replaced by the instruction number (or current price) they
+  quote, and filled in with this turn's numbers when served. A reply quoting
+  any other number ("2 years warranty", a made-up discount) is not cached
+- a reply that repeats any of the buyer's own words (beyond COMMON_WORDS and
+  the instruction's) is not cached: it may carry their name or paraphrase
+  what they said
+
+A state is served from the cache once it holds REPLY_CACHE_MIN_VARIANTS
+replies, and the turn makes no reply call. Serving isn't free until the pool
+is full, though: each served turn may start one background reply call (at most
+one per state at a time) to add another variant, up to 2 x
+REPLY_CACHE_VARIANTS calls per state. Turns without a pricing instruction
+(questions, small talk) always go to the LLM. The cache is per process, LRU
+over REPLY_CACHE_MAX_KEYS states. It is off by default
+(REPLY_CACHE_VARIANTS=0); set REPLY_CACHE_VARIANTS to opt in.
+"""
+
+import asyncio
+import os
+import random
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+from metrics import REPLY_CACHE_EVENTS
+
+REPLY_CACHE_VARIANTS = int(os.getenv("REPLY_CACHE_VARIANTS", "0"))
+REPLY_CACHE_MIN_VARIANTS = int(os.getenv("REPLY_CACHE_MIN_VARIANTS", "2"))
+REPLY_CACHE_MAX_KEYS = int(os.getenv("REPLY_CACHE_MAX_KEYS", "10000"))
+
+# The prompt's stages stop changing the ladder after the 6th message
+MAX_STAGE = 6
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+SLOT = re.compile("\x00(\\d+)\x00")
+WORD = re.compile(r"[a-z']+")
+
+# Buyer words a reply may repeat without quoting the buyer
+COMMON_WORDS = frozenset("""
+a about abeg ah all am an and any are as at be best but buy can chale come
+could deal do does don't final fine for get ghs give go good have how i i'll
+i'm if in is it it's just last let's like lower make me more my no not now of
+offer ok okay on one or original please price quality reduce sell so that the
+them then this to too we what with yes you your
+""".split())
+
+
+class ReplyState:
+    """A turn's cache key plus the numbers its replies may quote"""
+
+    def __init__(self, key: tuple, values: List[float], buyer_words: frozenset = frozenset()):
+        self.key = key
+        self.values = values
+        self.buyer_words = buyer_words  # Words only the buyer used: a reply repeating one isn't cached
+
+
+class _Pool:
+    def __init__(self):
+        self.replies = []  # Replies with their numbers as slots
+        self.fills = 0
+
+
+class ReplyCache:
+    def __init__(self, variants: int = REPLY_CACHE_VARIANTS, min_variants: int = REPLY_CACHE_MIN_VARIANTS,
+                 max_keys: int = REPLY_CACHE_MAX_KEYS):
+        self.variants = variants
+        self.min_variants = max(1, min(min_variants, variants))
+        self.max_keys = max_keys
+        self._pools = OrderedDict()  # key -> _Pool
+        self._filling = set()
+        self._tasks = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.variants > 0
+
+    def state(self, product: str, message_count: int, pricing_instruction: str,
+              offered_price: Optional[float], current_price: float,
+              user_accepted: bool, buyer_text: str = "") -> Optional[ReplyState]:
+        """The turn's state, or None when its reply shouldn't be cached (buyer_text: everything they wrote)"""
+        if not self.enabled or not pricing_instruction:
+            return None
+        values = [float(n) for n in NUMBER.findall(pricing_instruction)] + [float(current_price)]
+        band = None
+        if offered_price and current_price:
+            band = max(-1, min(10, int((current_price - offered_price) * 10 // current_price)))
+        key = (
+            product,
+            min(message_count, MAX_STAGE),
+            NUMBER.sub("#", pricing_instruction),
+            tuple(values.index(v) for v in values),
+            band,
+            bool(user_accepted),
+        )
+        buyer_words = set(WORD.findall(buyer_text.lower())) - COMMON_WORDS
+        buyer_words -= set(WORD.findall(f"{product} {pricing_instruction}".lower()))
+        return ReplyState(key, values, frozenset(buyer_words))
+
+    def _to_slots(self, reply: str, values: List[float]) -> Optional[str]:
+        unknown = False
+
+        def slot(match):
+            nonlocal unknown
+            value = float(match.group())
+            if value not in values:
+                unknown = True
+                return match.group()
+            return f"\x00{values.index(value)}\x00"
+
+        templated = NUMBER.sub(slot, reply)
+        return None if unknown else templated
+
+    def ready(self, state: Optional[ReplyState]) -> bool:
+        """Whether get() would serve this state (without counting a lookup)"""
+        pool = self._pools.get(state.key) if state else None
+        return pool is not None and len(pool.replies) >= self.min_variants
+
+    def get(self, state: ReplyState) -> Optional[str]:
+        if not self.ready(state):
+            REPLY_CACHE_EVENTS.labels("miss").inc()
+            return None
+        self._pools.move_to_end(state.key)
+        REPLY_CACHE_EVENTS.labels("hit").inc()
+        return SLOT.sub(lambda m: f"{state.values[int(m.group(1))]:g}", random.choice(self._pools[state.key].replies))
+
+    def add(self, state: ReplyState, reply: Optional[str]) -> bool:
+        if not reply:
+            return False
+        templated = self._to_slots(reply, state.values)
+        if templated is None or state.buyer_words.intersection(WORD.findall(reply.lower())):
+            REPLY_CACHE_EVENTS.labels("rejected").inc()
+            return False
+        pool = self._pools.get(state.key)
+        if pool is None:
+            pool = self._pools[state.key] = _Pool()
+            if len(self._pools) > self.max_keys:
+                self._pools.popitem(last=False)
+        if len(pool.replies) < self.variants and templated not in pool.replies:
+            pool.replies.append(templated)
+            REPLY_CACHE_EVENTS.labels("stored").inc()
+        return True
+
+    def fill_in_background(self, state: ReplyState, generate: Callable[[], Awaitable[str]]):
+        """Generate one more variant for a state served from a pool that isn't full yet"""
+        pool = self._pools.get(state.key)
+        if pool is None or len(pool.replies) >= self.variants or state.key in self._filling:
+            return
+        # Replies that come back as duplicates or get rejected don't fill the pool - stop trying eventually
+        if pool.fills >= 2 * self.variants:
+            return
+        pool.fills += 1
+        self._filling.add(state.key)
+
+        async def fill():
+            try:
+                self.add(state, await generate())
+            except Exception:
+                REPLY_CACHE_EVENTS.labels("fill_error").inc()
+            finally:
+                self._filling.discard(state.key)
+
+        task = asyncio.get_running_loop().create_task(fill())
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        return {
+            "states": len(self._pools),
+            "servable_states": sum(1 for pool in self._pools.values() if len(pool.replies) >= self.min_variants),
+            "variants": sum(len(pool.replies) for pool in self._pools.values()),
+            "filling": len(self._filling),
+        }
+
+
+reply_cache = ReplyCache()
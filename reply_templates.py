@@ -0,0 +1,113 @@
+"""
+Scripted replies for situations that don't need the generation LLM
+
+Some turns always get the same kind of answer - a lowball under the floor, a
+joke offer, "okay 340" when the floor is 350, a message after the deal closed,
+a turn whose deadline ran out before the reply call (see deadline.py).
+For those the engine picks one of several Bra Alex lines here instead of
+paying a gpt-4o-mini call (~1s): the turn's price logic is unchanged, only the
+wording comes from the template.
+
+REPLY_TEMPLATES selects the situations served from templates:
+"all" (default), "off", or a comma-separated list of SITUATIONS. The share of
+replies served this way is nego_replies_total{source="template"} against
+{source="llm"} in /metrics.
+
+Templates take prices by name ({offer}, {counter}, {price}); numbers are
+rendered without a trailing ".0".
+"""
+
+import os
+import random
+from typing import Optional
+
+from metrics import REPLIES, TEMPLATE_REPLIES
+
+TEMPLATES = {
+    # Offer below the product's floor: we still move to {counter}
+    "below_floor": [
+        "Ei, {offer} GHS? Chale, that one no fit work at all 😅 This is quality. I can come down to {counter} GHS - meet me there.",
+        "{offer} GHS?! My friend, you want me to go home empty-handed? 😄 Best I can do is {counter} GHS.",
+        "Herh! {offer} GHS be too small for this quality, abeg. Come up small - {counter} GHS and we talk business 💪",
+        "I like your confidence, but {offer} GHS won't work. Original, top condition... {counter} GHS is where I can stand.",
+        "Chale, {offer}? My landlord go drive me out 😂 Let's be serious - {counter} GHS.",
+        "You dey try me small, eh? 😄 {offer} GHS is far from where I can go. {counter} GHS - that's a fair price for this quality.",
+        "Haha, nice try! But {offer} GHS no go fit. If you can do {counter} GHS, we go shake hands 🤝",
+        "Boss, {offer} GHS dey pain me 😅 This one be quality. I'll drop to {counter} GHS just for you - come up and meet me.",
+        "No no no, {offer} GHS is too low my friend. Quality costs small money. {counter} GHS and it's yours 🔥",
+        "I respect the hustle, but {offer} GHS? 😂 Let's talk real numbers - {counter} GHS.",
+    ],
+    # Joke offer (under 100 GHS): the ladder still treats it as below the floor, so we quote {counter}
+    "absurd_offer": [
+        "{offer} GHS? 😂 Chale, you wan make I cry? Give me a serious offer - I can do {counter} GHS.",
+        "Haha! {offer} GHS can't even buy the box 😅 Serious offers only, my friend. {counter} GHS.",
+        "Ei! {offer} GHS? You for dey joke 😄 I can do {counter} GHS - make me a real offer.",
+        "My friend, {offer} GHS is transport money, not a price 😂 Come again - {counter} GHS is where we are.",
+        "Herh, {offer} GHS?! Abeg, let's be serious 😄 {counter} GHS. What's your real offer?",
+        "I see you like comedy 😂 {offer} GHS no dey. {counter} GHS - bring a serious number.",
+        "Chale, {offer} GHS? Even my small brother no go accept that 😅 {counter} GHS. Try again!",
+        "That's a good joke, {offer} GHS 😄 Now tell me your real offer - I'm at {counter} GHS.",
+    ],
+    # They accepted at a price under the floor; {price} is the lowest we can close at
+    "accept_below_floor": [
+        "Wait, I think there's been a misunderstanding! I can't go below {price} GHS for this quality product. If you can work with something around there, let me know!",
+        "Ah, hold on my friend 😅 I no fit go below {price} GHS for this one. Meet me there and we have a deal!",
+        "Chale, small misunderstanding 😄 My lowest for this quality is {price} GHS. Can you do that?",
+        "Hmm, not so fast! 😅 I can't close below {price} GHS - that's already my rock bottom. You in?",
+        "Eii, I like your energy, but {price} GHS is the lowest I can go. Let's make it happen at {price}!",
+        "Abeg, wait small 😅 Below {price} GHS I dey lose money. {price} GHS and it's yours today.",
+    ],
+    # Message after the deal closed at {price}
+    "deal_closed": [
+        "We already made a deal! Are you trying to renegotiate? 😄",
+        "Chale, we shook hands at {price} GHS already! 😄 No renegotiating now.",
+        "Haha, deal is done my friend - {price} GHS. Enjoy it! 👑",
+        "Ei, you want round two? 😂 We closed at {price} GHS. A deal is a deal!",
+        "We're done here, boss - {price} GHS, sealed 🤝 Come back anytime for another one!",
+        "Nice try 😄 Our deal at {price} GHS stands. Enjoy your purchase! 🔥",
+    ],
+    # The turn's deadline left no time for the reply call; {price} is where this turn left our price
+    "out_of_time": [
+        "Let me be straight with you: {price} GHS is where I stand. What do you say?",
+        "Chale, {price} GHS - original, top condition. That's a fair price 💪",
+        "Here's where we are, my friend: {price} GHS. Let's make it happen 🤝",
+        "I hear you! {price} GHS for this quality. Your move 😄",
+        "{price} GHS, boss. Quality like this no dey cheap 🔥 What do you say?",
+    ],
+}
+SITUATIONS = tuple(TEMPLATES)
+
+
+def parse_situations(value: str) -> frozenset:
+    value = value.strip().lower()
+    if value in ("", "off", "none", "0"):
+        return frozenset()
+    if value == "all":
+        return frozenset(SITUATIONS)
+    selected = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = selected - set(SITUATIONS)
+    if unknown:
+        print(f"⚠️  Unknown REPLY_TEMPLATES situation(s) {sorted(unknown)} - known: {', '.join(SITUATIONS)}")
+    return frozenset(selected & set(SITUATIONS))
+
+
+ENABLED = parse_situations(os.getenv("REPLY_TEMPLATES", "all"))
+
+
+def _format_price(value) -> str:
+    return f"{value:g}" if isinstance(value, (int, float)) else str(value)
+
+
+def render(situation: str, **prices) -> str:
+    """A random line for `situation` (always rendered, whether or not it is enabled)"""
+    template = random.choice(TEMPLATES[situation])
+    return template.format(**{name: _format_price(value) for name, value in prices.items()})
+
+
+def template_reply(situation: str, **prices) -> Optional[str]:
+    """The templated reply for `situation`, or None when REPLY_TEMPLATES leaves it to the LLM"""
+    if situation not in ENABLED:
+        return None
+    REPLIES.labels("template").inc()
+    TEMPLATE_REPLIES.labels(situation).inc()
+    return render(situation, **prices)
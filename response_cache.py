@@ -0,0 +1,133 @@
+"""
+Response cache for polled read endpoints (/api/leaderboard, /api/sessions/stats)
+
+Each entry holds the already-encoded JSON body with an ETag and Last-Modified.
+Entries expire after RESPONSE_CACHE_TTL_SECONDS, or earlier when invalidated
+(deal closed, referral landed). Clients and CDNs that send If-None-Match /
+If-Modified-Since get a bodyless 304 while the data is unchanged. The
+Cache-Control header lets a CDN serve most polls without reaching us.
+
+The cache is per process; with several workers, invalidation is local and
+the TTL bounds staleness everywhere else.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import orjson
+from fastapi import Request, Response
+
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "10"))
+# How long a CDN / browser may reuse a response without revalidating
+CACHE_CONTROL = os.getenv(
+    "RESPONSE_CACHE_CONTROL",
+    f"public, max-age={int(RESPONSE_CACHE_TTL_SECONDS)}, stale-while-revalidate=30"
+)
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, etag: str, last_modified: datetime, expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    @property
+    def headers(self) -> dict:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.last_modified, usegmt=True),
+            "Cache-Control": CACHE_CONTROL,
+        }
+
+
+def encode_json(payload) -> bytes:
+    return orjson.dumps(payload)
+
+
+class ResponseCache:
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            return entry
+
+    def set(self, key: str, payload) -> CachedResponse:
+        body = encode_json(payload)
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        with self._lock:
+            previous = self._entries.get(key)
+            # Unchanged data keeps its Last-Modified, so conditional polls still get 304s
+            last_modified = previous.last_modified if previous and previous.etag == etag else now
+            entry = CachedResponse(body, etag, last_modified, time.monotonic() + self.ttl)
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self, *keys: str):
+        """Expire entries now (their ETag/Last-Modified are kept for comparison)"""
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.expires_at = 0.0
+                    self.invalidations += 1
+
+    @staticmethod
+    def is_not_modified(request: Request, entry: CachedResponse) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            return entry.etag in tags or "*" in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return entry.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def respond(self, request: Request, key: str, build) -> Response:
+        """Serve `key` from cache (or build() it), honouring conditional headers"""
+        entry = self.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = self.set(key, build())
+        else:
+            self.hits += 1
+
+        if self.is_not_modified(request, entry):
+            self.not_modified += 1
+            return Response(status_code=304, headers=entry.headers)
+        return Response(content=entry.body, media_type="application/json", headers=entry.headers)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl,
+        }
+
+
+response_cache = ResponseCache()
+
+LEADERBOARD_KEY = "leaderboard"
+SESSION_STATS_KEY = "session_stats"
@@ -0,0 +1,53 @@
+"""
+Precompressed static assets (the admin dashboard)
+
+Each file under static/ is read and compressed once, on its first request,
+and served from memory afterwards: brotli or gzip according to
+Accept-Encoding, with an ETag so reloads get a 304. The compression
+middleware passes responses that already carry Content-Encoding through
+untouched.
+"""
+
+import gzip
+import hashlib
+import os
+from functools import lru_cache
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_CACHE_CONTROL = "no-cache"  # always revalidate - the ETag makes that cheap
+
+
+class StaticAsset:
+    def __init__(self, path: str, media_type: str):
+        with open(path, "rb") as f:
+            self.body = f.read()
+        self.media_type = media_type
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        self.encoded = {"gzip": gzip.compress(self.body, compresslevel=9)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(self.body, quality=11)
+
+    def respond(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": STATIC_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if self.etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        accepted = request.headers.get("accept-encoding", "")
+        for encoding in ("br", "gzip"):
+            if encoding in self.encoded and encoding in accepted:
+                headers["Content-Encoding"] = encoding
+                return Response(content=self.encoded[encoding], media_type=self.media_type, headers=headers)
+        return Response(content=self.body, media_type=self.media_type, headers=headers)
+
+
+@lru_cache(maxsize=None)
+def static_asset(name: str, media_type: str = "text/html") -> StaticAsset:
+    return StaticAsset(os.path.join(STATIC_DIR, name), media_type)
@@ -0,0 +1,96 @@
+"""
+Concurrency check for waitlist signups
+Fires thousands of parallel signups (including duplicates and referrals)
+and verifies that no request fails and no referral increment is lost.
+
+Usage:
+    python stress_waitlist_signup.py                 # temporary SQLite file
+    python stress_waitlist_signup.py --signups 5000 --workers 64
+    DATABASE_URL=postgresql://... python stress_waitlist_signup.py --use-env-db
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel waitlist signup stress test")
+    parser.add_argument("--signups", type=int, default=2000, help="Number of unique contacts")
+    parser.add_argument("--duplicates", type=int, default=2, help="Submissions per contact")
+    parser.add_argument("--workers", type=int, default=32, help="Parallel threads")
+    parser.add_argument("--use-env-db", action="store_true",
+                        help="Use DATABASE_URL instead of a temporary SQLite file")
+    args = parser.parse_args()
+
+    if not args.use_env_db:
+        tmp_dir = tempfile.mkdtemp()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'stress.db')}"
+
+    # Import after DATABASE_URL is set - database.py reads it at import time
+    from database import SessionLocal, init_db
+    from models import WaitlistEntry
+    from waitlist import add_signup
+
+    init_db()
+
+    run_id = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    _, referrer_code, _ = add_signup(db, "email", f"referrer-{run_id}@example.com", "stress")
+    db.close()
+
+    contacts = [f"user-{run_id}-{i}@example.com" for i in range(args.signups)]
+    submissions = [c for c in contacts for _ in range(args.duplicates)]
+
+    def submit(contact):
+        session = SessionLocal()
+        try:
+            return add_signup(session, "email", contact, "stress", referred_by=referrer_code)
+        finally:
+            session.close()
+
+    print(f"[*] Firing {len(submissions)} signups ({args.signups} unique) on {args.workers} threads...")
+    errors = []
+    created = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(submit, c) for c in submissions]
+        for future in futures:
+            try:
+                _, _, was_created = future.result()
+                created += was_created
+            except Exception as e:
+                errors.append(e)
+    elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    try:
+        referrer = db.query(WaitlistEntry).filter(WaitlistEntry.referral_code == referrer_code).one()
+        stored = db.query(WaitlistEntry).filter(WaitlistEntry.contact_value.in_(contacts)).count()
+        codes = db.query(WaitlistEntry.referral_code).filter(WaitlistEntry.contact_value.in_(contacts)).distinct().count()
+    finally:
+        db.close()
+
+    print(f"[INFO] {len(submissions) / elapsed:.0f} signups/sec over {elapsed:.2f}s")
+    print(f"[INFO] created={created} stored={stored} unique_codes={codes} "
+          f"referral_count={referrer.referral_count} errors={len(errors)}")
+
+    ok = (
+        not errors
+        and created == args.signups
+        and stored == args.signups
+        and codes == args.signups
+        and referrer.referral_count == args.signups
+    )
+    if errors:
+        print(f"[ERROR] First error: {errors[0]!r}")
+    print("[SUCCESS] No lost updates or duplicate errors" if ok else "[ERROR] Consistency check failed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Shared setup for the API tests
+
+The app reads its configuration at import time, so the environment is set
+here before anything imports main: a scratch SQLite database, an admin token,
+no tracing or rate limiting, and a stub OpenAI client (see bench_engine.py)
+so no test reaches the network.
+"""
+
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN_TOKEN = "test-admin-token"
+
+_scratch = tempfile.mkdtemp(prefix="nego-tests-")
+os.environ.update(
+    OPENAI_API_KEY="test-key",
+    DATABASE_URL=f"sqlite:///{os.path.join(_scratch, 'test.db')}",
+    ADMIN_TOKEN=ADMIN_TOKEN,
+    TRACE_EXPORTER="none",
+    RATE_LIMIT_BACKEND="off",
+    MESSAGE_WRITE_BEHIND="",
+    ADMIN_EVENTS_STREAM_SECONDS="0.2",
+)
+
+
+@pytest.fixture(scope="session")
+def client():
+    import bench_engine
+    import negotiation_engine
+    from fastapi.testclient import TestClient
+
+    stub = bench_engine._StubCompletions(negotiation_engine.NegotiationEngine(bench_engine.PRODUCT_CONFIG))
+    negotiation_engine._shared_client = SimpleNamespace(chat=SimpleNamespace(completions=stub))
+
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin_headers():
+    return {"X-Admin-Token": ADMIN_TOKEN}
@@ -0,0 +1,58 @@
+import pytest
+
+EXPORTS = ["/api/waitlist/export", "/api/sessions/export", "/api/sessions/messages/export"]
+
+
+@pytest.mark.parametrize("path", EXPORTS)
+def test_export_without_token_is_rejected(client, path):
+    assert client.get(path).status_code == 401
+
+
+@pytest.mark.parametrize("path", EXPORTS)
+def test_export_with_wrong_token_is_rejected(client, path):
+    assert client.get(path, headers={"X-Admin-Token": "nope"}).status_code == 401
+
+
+@pytest.mark.parametrize("path", EXPORTS)
+def test_export_with_token_streams(client, admin_headers, path):
+    response = client.get(path, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+
+def test_events_reject_token_in_query(client, admin_headers):
+    client.cookies.clear()
+    token = admin_headers["X-Admin-Token"]
+    assert client.get("/api/admin/events", params={"token": token}).status_code == 401
+
+
+def test_events_reject_forged_cookie(client):
+    client.cookies.clear()
+    client.cookies.set("admin_events", "99999999999.deadbeef", path="/api/admin/events")
+    assert client.get("/api/admin/events").status_code == 401
+    client.cookies.clear()
+
+
+def test_session_requires_token(client):
+    assert client.post("/api/admin/session").status_code == 401
+
+
+def test_session_cookie_opens_events(client, admin_headers):
+    client.cookies.clear()
+    response = client.post("/api/admin/session", headers=admin_headers)
+    assert response.status_code == 200
+    set_cookie = response.headers["set-cookie"].lower()
+    assert "httponly" in set_cookie and "samesite=strict" in set_cookie
+    assert "path=/api/admin/events" in set_cookie
+
+    with client.stream("GET", "/api/admin/events") as events:
+        assert events.status_code == 200
+        assert next(events.iter_lines()) == "retry: 1000"
+    client.cookies.clear()
+
+
+def test_expired_cookie_is_rejected(monkeypatch):
+    import profiling
+
+    monkeypatch.setattr(profiling, "ADMIN_SESSION_SECONDS", -1)
+    assert not profiling.is_admin_cookie(profiling.admin_cookie_value())
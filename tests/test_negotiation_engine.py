@@ -0,0 +1,19 @@
+from negotiation_engine import NegotiationEngine
+from catalog import DEFAULT_PRODUCT
+
+
+def make_engine():
+    return NegotiationEngine(DEFAULT_PRODUCT)
+
+
+def test_absurd_offer_gets_its_own_template():
+    engine = make_engine()
+    assert engine.template_situation(50, False, False) == "absurd_offer"
+    assert engine.template_situation(200, False, False) == "below_floor"
+
+
+def test_absurd_offer_is_priced_like_any_below_floor_offer():
+    engine = make_engine()
+    absurd, _ = engine.plan_counter_offer(50, False, 1, 450)
+    below_floor, _ = engine.plan_counter_offer(200, False, 1, 450)
+    assert absurd == below_floor == max(engine.floor + 15, 450 - 40)
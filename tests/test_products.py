@@ -0,0 +1,31 @@
+import pytest
+
+
+def product(**prices):
+    body = {
+        "slug": "test-watch", "name": "Test Watch", "starting_price": 480,
+        "floor_price": 360, "session_minimum_low": 370, "session_minimum_high": 400,
+    }
+    body.update(prices)
+    return body
+
+
+def test_upsert_requires_token(client):
+    assert client.post("/api/admin/products", json=product()).status_code == 401
+
+
+def test_upsert_accepts_a_ladder_range(client, admin_headers):
+    response = client.post("/api/admin/products", json=product(), headers=admin_headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("prices", [
+    # Cheap product: offers above its floor would hit the fixed "under 300" line
+    dict(starting_price=90, floor_price=60, session_minimum_low=65, session_minimum_high=70),
+    # Expensive product: 25-50 GHS steps can't walk a 1000 GHS range
+    dict(starting_price=5000, floor_price=4000, session_minimum_low=4100, session_minimum_high=4200),
+])
+def test_upsert_rejects_ranges_the_ladder_cannot_price(client, admin_headers, prices):
+    response = client.post("/api/admin/products", json=product(slug="bad-range", **prices), headers=admin_headers)
+    assert response.status_code == 400
+    assert "counter-offer ladder" in response.json()["detail"]
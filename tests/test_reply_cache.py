@@ -0,0 +1,70 @@
+import asyncio
+
+from reply_cache import REPLY_CACHE_VARIANTS, ReplyCache
+
+INSTRUCTION = "They offered 300 GHS. Counter with 410 GHS."
+
+
+def make_state(cache, buyer_text="can you do 300"):
+    return cache.state("Premium Apple Watch", 1, INSTRUCTION, 300, 450, False, buyer_text=buyer_text)
+
+
+def test_off_by_default():
+    assert REPLY_CACHE_VARIANTS == 0
+    assert not ReplyCache().enabled
+    assert make_state(ReplyCache()) is None
+
+
+def test_stores_template_shaped_replies():
+    cache = ReplyCache(variants=2, min_variants=1)
+    state = make_state(cache)
+    assert cache.add(state, "300 GHS is too low for this quality. 410 GHS and it's yours!")
+    assert cache.get(make_state(cache, "400 please")) == "300 GHS is too low for this quality. 410 GHS and it's yours!"
+
+
+def test_rejects_replies_that_echo_the_buyer():
+    cache = ReplyCache(variants=2, min_variants=1)
+    state = make_state(cache, "I'm Kwame, I need it for my sister's wedding. 300?")
+    assert not cache.add(state, "Kwame my friend, 410 GHS and it's yours!")
+    assert not cache.add(state, "For a wedding gift? 410 GHS and she'll love it.")
+    assert cache.get(state) is None
+
+
+def test_rejects_replies_with_unknown_numbers():
+    cache = ReplyCache(variants=2, min_variants=1)
+    state = make_state(cache)
+    assert not cache.add(state, "410 GHS with 2 years warranty!")
+
+
+def fill_calls(cache, state, turns):
+    """Serve `turns` cached turns, running each background fill, and count the reply calls they made"""
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        return "Still 410 GHS, my friend."  # Always the same reply, so the pool never fills
+
+    async def serve():
+        for _ in range(turns):
+            assert cache.get(state) is not None
+            cache.fill_in_background(state, generate)
+            await asyncio.gather(*cache._tasks)
+
+    asyncio.run(serve())
+    return calls
+
+
+def test_background_fills_are_capped_per_state():
+    cache = ReplyCache(variants=3, min_variants=1)
+    state = make_state(cache)
+    cache.add(state, "410 GHS is my price.")
+    assert fill_calls(cache, state, 20) == 2 * 3
+
+
+def test_full_pool_makes_no_background_calls():
+    cache = ReplyCache(variants=2, min_variants=1)
+    state = make_state(cache)
+    cache.add(state, "410 GHS is my price.")
+    cache.add(state, "I can do 410 GHS.")
+    assert fill_calls(cache, state, 5) == 0
@@ -0,0 +1,307 @@
+"""
+Request tracing for the chat turn
+
+chat() opens a root span per request (with request_id and session_id) and
+each stage - session lookup / row lock, history load, intent extraction,
+reply generation, commit - runs in a child span. The current span lives in a
+contextvar, so spans opened inside NegotiationEngine nest under the request
+without passing anything around.
+
+Sampling is decided when the root span ends (tail sampling): a trace is kept
+with probability TRACE_SAMPLE_RATE, and always when it took at least
+TRACE_SLOW_SECONDS or failed. Kept spans go to a background exporter thread:
+- TRACE_EXPORTER=jsonl (default): one JSON object per span in TRACE_FILE.
+  Once the file would pass TRACE_FILE_MAX_BYTES it is renamed to
+  TRACE_FILE.1 (replacing the previous one) and a new file starts, so traces
+  never take more than about twice that on disk
+- TRACE_EXPORTER=otlp: OTLP/HTTP JSON to OTEL_EXPORTER_OTLP_ENDPOINT
+- TRACE_EXPORTER=none: tracing off (spans become no-ops)
+"""
+
+import contextvars
+import os
+import queue
+import random
+import threading
+import time
+from typing import List, Optional
+
+import orjson
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "jsonl").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "3"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/")
+OTLP_HEADERS = os.getenv("OTEL_EXPORTER_OTLP_HEADERS", "")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "nego-challenge")
+
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL_SECONDS = 1.0
+EXPORT_QUEUE_SIZE = 10000
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def new_id(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "attributes",
+                 "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = new_id(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+            self.trace.failed = True
+        if self is self.trace.root:
+            self.trace.finish()
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self.end(exc)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": {**self.trace.attributes, **self.attributes},
+            "error": self.error,
+        }
+
+
+class Trace:
+    """Spans of one request, buffered until the root ends and sampling is decided"""
+
+    def __init__(self, attributes: dict):
+        self.trace_id = new_id(16)
+        self.attributes = attributes
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+        self.failed = False
+
+    def finish(self):
+        keep = (
+            self.failed
+            or self.root.duration >= TRACE_SLOW_SECONDS
+            or random.random() < TRACE_SAMPLE_RATE
+        )
+        if keep and exporter is not None:
+            # Spans still open (abandoned by an exception) are closed at the root's end
+            for span in self.spans:
+                if span.end_ns is None:
+                    span.end_ns = self.root.end_ns
+            exporter.submit(self.spans)
+
+
+class _NoopSpan:
+    def set(self, key, value):
+        pass
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def start_trace(name: str, **attributes):
+    """Root span of a request. Attributes (request_id, session_id...) are copied to every span."""
+    if exporter is None:
+        return NOOP_SPAN
+    trace = Trace(attributes)
+    root = Span(trace, name, None, {})
+    trace.root = root
+    trace.spans.append(root)
+    return root
+
+
+def span(name: str, **attributes):
+    """Child span of the current span; a no-op outside a traced request"""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    child = Span(parent.trace, name, parent, attributes)
+    parent.trace.spans.append(child)
+    return child
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.trace_id if current else None
+
+
+# ---------- exporters ----------
+
+class BatchExporter:
+    """Hands finished spans to a daemon thread that writes them in batches"""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+        self.dropped = 0
+
+    def submit(self, spans: List[Span]):
+        for s in spans:
+            try:
+                self._queue.put_nowait(s)
+            except queue.Full:
+                # Never block a request on tracing
+                self.dropped += 1
+
+    def _drain(self, block: bool) -> List[Span]:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=EXPORT_INTERVAL_SECONDS) if block else self._queue.get_nowait())
+            while len(batch) < EXPORT_BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain(block=True)
+            if batch:
+                self._safe_write(batch)
+
+    def _safe_write(self, batch: List[Span]):
+        try:
+            self.write(batch)
+        except Exception as e:
+            print(f"⚠️  Trace export failed ({len(batch)} spans dropped): {e}")
+
+    def flush(self):
+        """Write whatever is queued (called on shutdown)"""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._safe_write(batch)
+
+    def write(self, batch: List[Span]):
+        raise NotImplementedError
+
+
+class JsonLinesExporter(BatchExporter):
+    def __init__(self, path: str = TRACE_FILE, max_bytes: int = TRACE_FILE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def write(self, batch: List[Span]):
+        data = b"".join(orjson.dumps(s.to_dict(), option=orjson.OPT_APPEND_NEWLINE) for s in batch)
+        with self._lock:
+            size = self._size()
+            if self.max_bytes and size and size + len(data) > self.max_bytes:
+                # Keep one rotated file; with several workers two may rotate at once,
+                # which only loses part of the older file
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "ab") as f:
+                f.write(data)
+
+    def _size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPExporter(BatchExporter):
+    """OTLP over HTTP with the JSON encoding (no OpenTelemetry SDK needed)"""
+
+    def __init__(self, endpoint: str = OTLP_ENDPOINT):
+        import httpx
+        headers = dict(h.split("=", 1) for h in OTLP_HEADERS.split(",") if "=" in h)
+        self.client = httpx.Client(timeout=5, headers={"Content-Type": "application/json", **headers})
+        self.url = f"{endpoint}/v1/traces"
+        super().__init__()
+
+    def write(self, batch: List[Span]):
+        spans = []
+        for s in batch:
+            record = {
+                "traceId": s.trace.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 2 if s.parent_id is None else 1,  # SERVER for the root, INTERNAL below
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [
+                    {"key": k, "value": _otlp_value(v)}
+                    for k, v in {**s.trace.attributes, **s.attributes}.items() if v is not None
+                ],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            }
+            if s.parent_id:
+                record["parentSpanId"] = s.parent_id
+            spans.append(record)
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "nego.tracing"}, "spans": spans}],
+        }]}
+        self.client.post(self.url, content=orjson.dumps(payload)).raise_for_status()
+
+
+EXPORTERS = {"jsonl": JsonLinesExporter, "otlp": OTLPExporter}
+
+exporter: Optional[BatchExporter] = None
+if TRACE_EXPORTER in EXPORTERS:
+    exporter = EXPORTERS[TRACE_EXPORTER]()
+elif TRACE_EXPORTER != "none":
+    print(f"⚠️  Unknown TRACE_EXPORTER={TRACE_EXPORTER!r} - tracing disabled")
+
+
+def shutdown():
+    if exporter is not None:
+        exporter.flush()
@@ -0,0 +1,91 @@
+"""
+Waitlist signup logic
+
+Signups go through a single atomic path:
+- INSERT ... ON CONFLICT (contact_value) DO NOTHING for the entry
+- UPDATE ... SET referral_count = referral_count + 1 for the referrer
+Both run in one transaction, so concurrent signups never lose a referral
+increment and duplicate submissions return the existing entry instead of a 500.
+"""
+
+import secrets
+import string
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+
+from database import dialect_insert
+from events import publish
+from models import WaitlistEntry
+
+REFERRAL_CODE_ALPHABET = string.ascii_uppercase + string.digits
+REFERRAL_CODE_LENGTH = 8
+REFERRAL_CODE_ATTEMPTS = 5
+
+
+def generate_referral_code() -> str:
+    """Random 8-character referral code (36^8 ≈ 2.8 trillion combinations)"""
+    return ''.join(secrets.choice(REFERRAL_CODE_ALPHABET) for _ in range(REFERRAL_CODE_LENGTH))
+
+
+def add_signup(db, contact_type: str, contact_value: str, source: Optional[str] = "website",
+               referred_by: Optional[str] = None) -> Tuple[int, str, bool]:
+    """
+    Add a contact to the waitlist atomically.
+
+    Returns (id, referral_code, created). `created` is False when the contact
+    was already on the waitlist, in which case the existing entry is returned.
+    """
+    for _ in range(REFERRAL_CODE_ATTEMPTS):
+        referral_code = generate_referral_code()
+        stmt = (
+            dialect_insert(db, WaitlistEntry)
+            .values(
+                contact_type=contact_type,
+                contact_value=contact_value,
+                source=source,
+                referral_code=referral_code,
+                referred_by=referred_by,
+                referral_count=0
+            )
+            .on_conflict_do_nothing(index_elements=["contact_value"])
+            .returning(WaitlistEntry.id)
+        )
+
+        try:
+            entry_id = db.execute(stmt).scalar()
+        except IntegrityError:
+            # Referral code collided with an existing one - try a fresh code
+            db.rollback()
+            continue
+
+        if entry_id is None:
+            # Already on the waitlist (possibly inserted by a concurrent request)
+            db.rollback()
+            existing = db.query(WaitlistEntry.id, WaitlistEntry.referral_code).filter(
+                WaitlistEntry.contact_value == contact_value
+            ).one()
+            return existing.id, existing.referral_code, False
+
+        if referred_by:
+            db.execute(
+                update(WaitlistEntry)
+                .where(WaitlistEntry.referral_code == referred_by)
+                .values(referral_count=func.coalesce(WaitlistEntry.referral_count, 0) + 1)
+            )
+
+        publish(db, "waitlist_signup", {
+            "id": entry_id,
+            "contact_type": contact_type,
+            "contact_value": contact_value,
+            "source": source,
+            "referral_code": referral_code,
+            "referral_count": 0,
+            "created_at": datetime.utcnow().isoformat()
+        })
+        db.commit()
+        return entry_id, referral_code, True
+
+    raise RuntimeError("Could not generate a unique referral code")
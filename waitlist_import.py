@@ -0,0 +1,242 @@
+"""
+Bulk waitlist import from partner CSV / NDJSON files
+
+Rows are streamed from the file, validated, deduped (within the batch and
+against existing contact_values) and inserted in chunks with a single
+executemany INSERT ... ON CONFLICT DO NOTHING per batch. Referral credit for
+imported rows is applied with one batched UPDATE per chunk.
+
+Usage:
+    python waitlist_import.py contacts.csv
+    python waitlist_import.py contacts.ndjson --source partner-x --batch-size 2000
+
+CSV files need a `contact_value` column (`contact_type`, `source` and
+`referred_by` are optional). NDJSON files use the same keys per line.
+"""
+
+import argparse
+import csv
+import io
+import json
+import re
+import time
+from collections import Counter
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.exc import IntegrityError
+
+from database import dialect_insert
+from events import publish
+from models import WaitlistEntry
+from waitlist import generate_referral_code, REFERRAL_CODE_ATTEMPTS
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+PHONE_PATTERN = re.compile(r'^\+?[\d\s\-()]{7,20}$')
+
+
+def read_csv(stream: Iterable[str]) -> Iterator[dict]:
+    """Yield rows from a CSV text stream"""
+    for row in csv.DictReader(stream):
+        yield row
+
+
+def read_ndjson(stream: Iterable[str]) -> Iterator[dict]:
+    """Yield rows from an NDJSON text stream (invalid lines yield None)"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else None
+
+
+def validate_row(row: Optional[dict], default_source: str) -> dict:
+    """Normalize an input row, raising ValueError if it can't be imported"""
+    if row is None:
+        raise ValueError("unparseable row")
+
+    contact_value = (row.get("contact_value") or "").strip()
+    if not contact_value:
+        raise ValueError("missing contact_value")
+
+    contact_type = (row.get("contact_type") or "").strip().lower()
+    if not contact_type:
+        contact_type = "email" if "@" in contact_value else "phone"
+
+    if contact_type == "email":
+        if "@" not in contact_value or "." not in contact_value.split("@")[-1]:
+            raise ValueError(f"invalid email: {contact_value}")
+    elif contact_type == "phone":
+        if not PHONE_PATTERN.match(contact_value):
+            raise ValueError(f"invalid phone: {contact_value}")
+    else:
+        raise ValueError(f"invalid contact_type: {contact_type}")
+
+    return {
+        "contact_type": contact_type,
+        "contact_value": contact_value,
+        "source": (row.get("source") or "").strip() or default_source,
+        "referred_by": (row.get("referred_by") or "").strip() or None,
+        "referral_count": 0,
+    }
+
+
+class WaitlistImporter:
+    """Accumulates validated rows and flushes them to the database in batches"""
+
+    def __init__(self, db, source: str = "import", batch_size: int = IMPORT_BATCH_SIZE):
+        self.db = db
+        self.source = source
+        self.batch_size = batch_size
+        self.batch = []
+        self.inserted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors = []
+        self.rows_seen = 0
+        self.started = time.perf_counter()
+
+    def _error(self, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def add(self, row: Optional[dict]):
+        self.rows_seen += 1
+        try:
+            self.batch.append(validate_row(row, self.source))
+        except ValueError as e:
+            self._error(f"row {self.rows_seen}: {e}")
+            return
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def add_all(self, rows: Iterable[Optional[dict]]):
+        for row in rows:
+            self.add(row)
+        self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+
+        # Dedupe within the batch, then against rows already in the table
+        unique = {}
+        for row in batch:
+            unique.setdefault(row["contact_value"], row)
+        existing = {
+            value for (value,) in self.db.query(WaitlistEntry.contact_value).filter(
+                WaitlistEntry.contact_value.in_(list(unique))
+            )
+        }
+        rows = [row for value, row in unique.items() if value not in existing]
+        self.skipped += len(batch) - len(rows)
+        if not rows:
+            return
+
+        table = WaitlistEntry.__table__
+        for _ in range(REFERRAL_CODE_ATTEMPTS):
+            for row in rows:
+                row["referral_code"] = generate_referral_code()
+            stmt = (
+                dialect_insert(self.db, table)
+                .on_conflict_do_nothing(index_elements=["contact_value"])
+                .returning(table.c.referred_by)
+            )
+            try:
+                inserted = self.db.execute(stmt, rows).all()
+            except IntegrityError:
+                # Referral code collision somewhere in the batch - regenerate codes
+                self.db.rollback()
+                continue
+
+            referrals = Counter(r.referred_by for r in inserted if r.referred_by)
+            if referrals:
+                self.db.execute(
+                    update(table)
+                    .where(table.c.referral_code == bindparam("code"))
+                    .values(referral_count=func.coalesce(table.c.referral_count, 0) + bindparam("n")),
+                    [{"code": code, "n": n} for code, n in referrals.items()]
+                )
+            if inserted:
+                publish(self.db, "waitlist_import", {"inserted": len(inserted)})
+            self.db.commit()
+
+            # Rows that lost a race with a concurrent signup were skipped by ON CONFLICT
+            self.inserted += len(inserted)
+            self.skipped += len(rows) - len(inserted)
+            return
+
+        self._error(f"batch of {len(rows)} rows: could not generate unique referral codes")
+        self.failed += len(rows) - 1
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows_seen,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_seen / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+def import_stream(db, stream: Iterable[str], fmt: str = "csv", source: str = "import",
+                  batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Import a CSV or NDJSON text stream, returning the import report"""
+    importer = WaitlistImporter(db, source=source, batch_size=batch_size)
+    rows = read_ndjson(stream) if fmt == "ndjson" else read_csv(stream)
+    importer.add_all(rows)
+    return importer.report()
+
+
+def import_binary_file(db, fileobj, fmt: str = "csv", source: str = "import",
+                       batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Import from a binary file object (e.g. an uploaded request body)"""
+    stream = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        return import_stream(db, stream, fmt=fmt, source=source, batch_size=batch_size)
+    finally:
+        stream.detach()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import contacts into the waitlist")
+    parser.add_argument("path", help="CSV or NDJSON file")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+    parser.add_argument("--source", default="import", help="Source for rows that don't set one")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from database import SessionLocal, init_db
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+
+    init_db()
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as f:
+            report = import_stream(db, f, fmt=fmt, source=args.source, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    print(f"[INFO] rows={report['rows']} inserted={report['inserted']} "
+          f"skipped={report['skipped']} failed={report['failed']}")
+    print(f"[INFO] {report['rows_per_second']} rows/sec in {report['elapsed_seconds']}s")
+    for error in report["errors"]:
+        print(f"[WARNING] {error}")
+
+
+if __name__ == "__main__":
+    main()